@@ -105,19 +105,21 @@ class AlgoStrategy(gamelib.AlgoCore):
         """
         gamelib.debug_write("Configuring your custom algo strategy...")
         self.config = config
+        self.registry = gamelib.get_registry(config)
         global WALL, SUPPORT, TURRET, SCOUT, DEMOLISHER, INTERCEPTOR, MP, SP
-        WALL = config["unitInformation"][0]["shorthand"]
-        SUPPORT = config["unitInformation"][1]["shorthand"]
-        TURRET = config["unitInformation"][2]["shorthand"]
-        SCOUT = config["unitInformation"][3]["shorthand"]
-        DEMOLISHER = config["unitInformation"][4]["shorthand"]
-        INTERCEPTOR = config["unitInformation"][5]["shorthand"]
+        WALL = self.registry.WALL
+        SUPPORT = self.registry.SUPPORT
+        TURRET = self.registry.TURRET
+        SCOUT = self.registry.SCOUT
+        DEMOLISHER = self.registry.DEMOLISHER
+        INTERCEPTOR = self.registry.INTERCEPTOR
         MP = 1
         SP = 0
         # This is a good place to do initial setup
         self.GAME_ROUND = 1
         self.upgrade_priority = []
         self.nonessential_structures = []
+        self.board = gamelib.BoardTracker(config)
 
     def on_turn(self, turn_state):
         """
@@ -127,7 +129,7 @@ class AlgoStrategy(gamelib.AlgoCore):
         unit deployments, and transmitting your intended deployments to the
         game engine.
         """
-        game_state = gamelib.GameState(self.config, turn_state)
+        game_state = self.board.update(turn_state)
         gamelib.debug_write(
             "Performing turn {} of your custom algo strategy".format(
                 game_state.turn_number
@@ -16,6 +16,19 @@ Investigating it is useful for advanced players interested in getting data from
 The Navigation class in navigation.py contains functions related to pathfinding, which are used by GameState in pathing related functions. 
 Investigating it is useful for advanced player who want to optimize the slow default pathing algorithm we provide. \n 
 
+The ConfigRegistry class in config_registry.py holds everything derived from a game config, such as unit type constants and costs. \n
+
+The BoardTracker class in board_tracker.py keeps one GameMap across turns and reports which tiles changed.
+generate_board() in board_generator.py builds seeded random turn messages for tests and benchmarks. \n
+
+The ActionSimulator class in simulator.py simulates the action phase locally, to compare attack options before committing to one. \n
+
+log.py, timing.py and counters.py are the debug log, per-turn timings and hot-path counters. AlgoCore.start turns them on. \n
+
+The numpy based modules and the development tools are not imported here, so importing gamelib stays cheap and needs neither numpy nor multiprocessing.
+Import them from their modules when you use them: unit_table, batch_simulator, benchmarks, fixtures, memory, precompute,
+profiling, replay, rollout, telemetry and tournament. \n
+
 util.py contains a small handful of functions that help with communication, including the debug-printing function, debug_write().
 """
 
@@ -24,5 +37,26 @@ from .util import debug_write
 from .game_state import GameState
 from .unit import GameUnit
 from .game_map import GameMap
-
-__all__ = ["algocore", "game_state", "game_map", "navigation", "unit", "util"]
+from .board_tracker import BoardTracker
+from .board_generator import generate_board
+from .config_registry import ConfigRegistry, get_registry
+from .simulator import ActionSimulator, SimulationResult
+from .log import Log
+from .timing import span, timed
+from . import counters
+
+__all__ = [
+    "algocore",
+    "board_generator",
+    "board_tracker",
+    "config_registry",
+    "counters",
+    "game_state",
+    "game_map",
+    "log",
+    "navigation",
+    "simulator",
+    "timing",
+    "unit",
+    "util",
+]
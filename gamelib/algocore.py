@@ -1,6 +1,14 @@
+import importlib
 import json
+import os
+import sys
+import time
 
+from . import counters, timing
+from .config_registry import ConfigRegistry
 from .game_state import GameState
+from .log import Log
+from .precompute import get_precomputed
 from .util import get_command, debug_write, BANNER_TEXT, send_command
 
 
@@ -45,39 +53,174 @@ class AlgoCore(object):
         """
         pass
 
-    def start(self):
+    def start(
+        self,
+        replay_path=None,
+        timing_output=None,
+        profiler=None,
+        memory_tracker=None,
+        debug_log=None,
+        telemetry=None,
+        precompute_cache=None,
+        hot_path_counters=False,
+    ):
         """
         Start the parsing loop.
         After starting the algo, it will wait until it recieves information from the game
         engine, proccess this information, and respond if needed to take it's turn.
         The algo continues this loop until it recieves the "End" turn message from the game.
+
+        Args:
+            replay_path: If given, every message received is recorded to this file with a ReplayWriter.
+                Defaults to the GAMELIB_REPLAY environment variable, so recording can be turned on from run.sh.
+            timing_output: If given, the time spent reading and decoding messages, building GameStates, in on_turn,
+                submit_turn, on_action_frame and in your own gamelib.span stages is summarized after every turn.
+                "stderr" writes the summaries with debug_write, anything else is the path of a file to append them to.
+                Defaults to the GAMELIB_TIMING environment variable.
+            profiler: If given, a TurnProfiler that profiles on_turn and keeps the slowest turns, writing them out when the game ends.
+                Defaults to TurnProfiler.from_environment(), so profiling can be turned on with GAMELIB_PROFILE.
+            memory_tracker: If given, a MemoryTracker that reports the peak memory, net growth by gamelib module and live
+                GameUnit and Node objects of every turn. Defaults to MemoryTracker.from_environment(), see GAMELIB_MEMORY.
+            debug_log: If given, a Log installed for the game. A buffered log collects gamelib warnings and debug_write output
+                and is flushed before and after every on_turn. Defaults to Log.from_environment(), see GAMELIB_LOG_LEVEL.
+            telemetry: If given, a TelemetryWriter that appends a JSON line per turn with the resources, health, structures,
+                handler times and breaches of the turn. Defaults to TelemetryWriter.from_environment(), see GAMELIB_TELEMETRY.
+            precompute_cache: If given, the file the tables derived from the config (edges, the board, range stencils and
+                idealness) are loaded from before on_game_start, or saved to if it was made for another config.
+                Relative paths are relative to the directory of the algo's script, usually next to algo_strategy.py.
+                Defaults to the GAMELIB_PRECOMPUTE_CACHE environment variable.
+            hot_path_counters: If True, the work done in the gamelib hot paths is counted, see GameState.get_counters.
+                The counters are reset before every turn. Defaults to the GAMELIB_COUNTERS environment variable being set.
         """
         debug_write(BANNER_TEXT)
+        replay_path = replay_path or os.environ.get("GAMELIB_REPLAY")
+        recorder = None
+        if replay_path:
+            from .replay import ReplayWriter
+
+            recorder = ReplayWriter(replay_path)
+        timing_output = timing_output or os.environ.get("GAMELIB_TIMING")
+        if timing_output:
+            timing.enable(timing_output)
+        hot_path_counters = hot_path_counters or bool(os.environ.get("GAMELIB_COUNTERS"))
+        if hot_path_counters:
+            counters.enable()
+        profiler = profiler or _from_environment(
+            "GAMELIB_PROFILE", ".profiling", "TurnProfiler"
+        )
+        memory_tracker = memory_tracker or _from_environment(
+            "GAMELIB_MEMORY", ".memory", "MemoryTracker"
+        )
+        debug_log = debug_log or Log.from_environment()
+        telemetry = telemetry or _from_environment(
+            "GAMELIB_TELEMETRY", ".telemetry", "TelemetryWriter"
+        )
+        precompute_cache = precompute_cache or os.environ.get("GAMELIB_PRECOMPUTE_CACHE")
+        if precompute_cache:
+            precompute_cache = os.path.join(
+                os.path.dirname(os.path.abspath(sys.argv[0])), precompute_cache
+            )
+        if debug_log is not None:
+            debug_log.install()
+        try:
+            self.__loop(
+                recorder, profiler, memory_tracker, debug_log, telemetry, precompute_cache
+            )
+        finally:
+            if telemetry is not None:
+                telemetry.close()
+            if memory_tracker is not None:
+                memory_tracker.close()
+            if profiler is not None:
+                profiler.close()
+            if timing_output:
+                timing.disable()
+            if hot_path_counters:
+                counters.disable()
+            if recorder is not None:
+                recorder.close()
+            if debug_log is not None:
+                debug_log.close()
 
+    def __loop(
+        self, recorder, profiler, memory_tracker, debug_log, telemetry, precompute_cache
+    ):
+        if recorder is not None:
+            from .replay import CONFIG, OTHER, STATE_KINDS
         while True:
             # Note: Python blocks and hangs on stdin. Can cause issues if connections aren't setup properly and may need to
             # manually kill this Python program.
+            started = timing.start_clock()
             game_state_string = get_command()
+            read = timing.stop_clock(started)
             if "replaySave" in game_state_string:
                 """
                 This means this must be the config file. So, load in the config file as a json and add it to your AlgoStrategy class.
                 """
+                if recorder is not None:
+                    recorder.write(game_state_string, CONFIG)
                 parsed_config = json.loads(game_state_string)
+                if precompute_cache:
+                    get_precomputed(
+                        parsed_config, ConfigRegistry.ARENA_SIZE, precompute_cache
+                    )
+                if telemetry is not None:
+                    telemetry.start_game(parsed_config)
                 self.on_game_start(parsed_config)
             elif "turnInfo" in game_state_string:
+                started = timing.start_clock()
                 state = json.loads(game_state_string)
+                decode = timing.stop_clock(started)
                 stateType = int(state.get("turnInfo")[0])
+                if recorder is not None:
+                    turn_info = state["turnInfo"]
+                    recorder.write(
+                        game_state_string,
+                        STATE_KINDS.get(stateType, OTHER),
+                        int(turn_info[1]),
+                        int(turn_info[2]),
+                    )
                 if stateType == 0:
                     """
                     This is the game turn game state message. Algo must now print to stdout 2 lines, one for build phase one for
                     deploy phase. Printing is handled by the provided functions.
                     """
-                    self.on_turn(game_state_string)
+                    counters.reset()
+                    if debug_log is not None:
+                        # Write what the last action phase logged before the turn starts
+                        debug_log.flush()
+                    if memory_tracker is not None:
+                        memory_tracker.begin_turn(int(state["turnInfo"][1]))
+                    timing.begin_turn(int(state["turnInfo"][1]))
+                    timing.add("read", read)
+                    timing.add("decode", decode)
+                    if telemetry is not None:
+                        telemetry.begin_turn(state)
+                    handler_started = time.perf_counter()
+                    with timing.span("on_turn"):
+                        if profiler is None:
+                            self.on_turn(game_state_string)
+                        else:
+                            profiler.run_turn(
+                                int(state["turnInfo"][1]), self.on_turn, game_state_string
+                            )
+                    if telemetry is not None:
+                        telemetry.add_turn_time(time.perf_counter() - handler_started)
+                    if debug_log is not None:
+                        debug_log.flush()
                 elif stateType == 1:
                     """
                     If stateType == 1, this game_state_string string represents a single frame of an action phase
                     """
-                    self.on_action_frame(game_state_string)
+                    timing.add("frame_decode", decode)
+                    handler_started = time.perf_counter()
+                    with timing.span("on_action_frame"):
+                        if profiler is None:
+                            self.on_action_frame(game_state_string)
+                        else:
+                            profiler.run_frame(self.on_action_frame, game_state_string)
+                    if telemetry is not None:
+                        telemetry.add_frame(state, time.perf_counter() - handler_started)
                 elif stateType == 2:
                     """
                     This is the end game message. This means the game is over so break and finish the program.
@@ -97,4 +240,15 @@ class AlgoCore(object):
                 """
                 Something is wrong? Received an incorrect or improperly formatted string.
                 """
+                if recorder is not None:
+                    recorder.write(game_state_string, OTHER)
                 debug_write("Got unexpected string : {}".format(game_state_string))
+
+
+def _from_environment(variable, module, name):
+    """Creates an instrument with its from_environment method if its environment variable is set.
+    Its module is only imported then, so algos that do not use it do not pay for the import at startup.
+    """
+    if not os.environ.get(variable):
+        return None
+    return getattr(importlib.import_module(module, __package__), name).from_environment()
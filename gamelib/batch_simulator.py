@@ -0,0 +1,449 @@
+import numpy as np
+
+from .simulator import ActionSimulator, SimulationResult, get_move_interval
+
+
+class BatchSimulator:
+    """Simulates many action phases from the same board at once, for comparing attack options.
+    Requires numpy.
+
+    Every scenario starts from the structures of the same GameState and gets its own deploy stacks.
+    Units of all scenarios are held in stacked (scenario, unit) arrays and advanced frame by frame together,
+    following the same rules as ActionSimulator and producing the same results.
+    Paths come from an ActionSimulator and are shared with it.
+
+    Attributes :
+        * game_state (:obj: GameState): The board the simulations start from
+        * simulator (:obj: ActionSimulator): Provides paths, edges and self destruct settings
+        * max_frames (int): Simulations stop after this many frames
+
+    """
+
+    def __init__(self, game_state, max_frames=1000, simulator=None):
+        """Prepares batched simulations of the action phase following a GameState
+
+        Args:
+            game_state: The GameState to simulate from. Its structures are the starting board.
+            max_frames: The maximum number of frames to simulate
+            simulator: An ActionSimulator of the same GameState to share paths with
+
+        """
+        self.game_state = game_state
+        self.simulator = simulator or ActionSimulator(game_state, max_frames)
+        self.max_frames = max_frames
+        self.__registry = self.simulator.registry
+        self.__path_ids = {}
+        self.__paths = []
+        self.__path_table = None
+
+        structures = self.simulator.structures
+        specs = [unit.spec for unit in structures]
+        self.__board = {
+            "x": np.array([unit.x for unit in structures], dtype=np.int64),
+            "y": np.array([unit.y for unit in structures], dtype=np.int64),
+            "player": np.array(
+                [unit.player_index for unit in structures], dtype=np.int64
+            ),
+            "health": np.array([unit.health for unit in structures], dtype=np.float64),
+            "damage_f": np.array([spec.damage_f for spec in specs], dtype=np.float64),
+            "damage_i": np.array([spec.damage_i for spec in specs], dtype=np.float64),
+            "attack_range": np.array(
+                [spec.attackRange for spec in specs], dtype=np.float64
+            ),
+            "shield_range": np.array(
+                [spec.shieldRange for spec in specs], dtype=np.float64
+            ),
+            "shield": np.array(
+                [spec.shieldPerUnit for spec in specs], dtype=np.float64
+            ),
+        }
+        board = self.__board
+        self.__attacking = np.nonzero(
+            (board["damage_f"] > 0) | (board["damage_i"] > 0)
+        )[0]
+        self.__supports = np.nonzero(
+            (board["shield_range"] > 0) & (board["shield"] > 0)
+        )[0]
+
+    def simulate(self, deploy_stacks, enemy_deploy_stacks=None):
+        """Simulates one action phase per scenario
+
+        Args:
+            deploy_stacks: A list with one deploy stack per scenario, each a list of (unit_type, x, y) mobile units you deploy
+            enemy_deploy_stacks: A list with one deploy stack per scenario for your opponent, or None if they deploy nothing
+
+        Returns:
+            A list with one SimulationResult per scenario
+
+        """
+        scenarios = len(deploy_stacks)
+        if enemy_deploy_stacks is None:
+            enemy_deploy_stacks = [[]] * scenarios
+        results = [SimulationResult() for _ in range(scenarios)]
+        destroyed = [frozenset()] * scenarios
+        mobiles = self.__deploy(deploy_stacks, enemy_deploy_stacks)
+        structures = {
+            "alive": np.ones((scenarios, len(self.__board["x"])), dtype=np.bool_),
+            "health": np.tile(self.__board["health"], (scenarios, 1)),
+        }
+        shielded = np.zeros(
+            (scenarios, len(self.__supports), mobiles["alive"].shape[1]), dtype=np.bool_
+        )
+        frames = np.zeros(scenarios, dtype=np.int64)
+
+        frame = 0
+        while frame < self.max_frames:
+            active = mobiles["alive"].any(axis=1)
+            if not active.any():
+                break
+            frame += 1
+            frames[active] = frame
+            self.__shield(mobiles, structures, shielded)
+            departed, self_destructing = self.__move(frame, mobiles, destroyed, results)
+            if departed.any():
+                self.__self_destruct_damage(
+                    self_destructing, mobiles, structures, results
+                )
+                self.__remove_dead(frame, mobiles, structures, destroyed, results)
+            self.__attack(active, mobiles, structures, results)
+            self.__remove_dead(frame, mobiles, structures, destroyed, results)
+
+        for k, result in enumerate(results):
+            result.frames = int(frames[k])
+        return results
+
+    def __deploy(self, deploy_stacks, enemy_deploy_stacks):
+        """Builds the (scenario, unit) arrays of the mobile units, yours first then your opponent's in each scenario"""
+        registry = self.__registry
+        stacks = [
+            [(0, entry) for entry in stack] + [(1, entry) for entry in enemy_stack]
+            for stack, enemy_stack in zip(deploy_stacks, enemy_deploy_stacks)
+        ]
+        shape = (len(stacks), max([len(stack) for stack in stacks] + [0]))
+        mobiles = {
+            "alive": np.zeros(shape, dtype=np.bool_),
+            "stale": np.ones(shape, dtype=np.bool_),
+            "types": [[None] * shape[1] for _ in stacks],
+        }
+        for name in ("health", "damage_f", "damage_i", "attack_range"):
+            mobiles[name] = np.zeros(shape, dtype=np.float64)
+        for name in ("x", "y", "player", "interval", "edge", "counter", "steps"):
+            mobiles[name] = np.zeros(shape, dtype=np.int64)
+        for name in ("path", "path_index"):
+            mobiles[name] = np.zeros(shape, dtype=np.int64)
+        for k, stack in enumerate(stacks):
+            for m, (player_index, (unit_type, x, y)) in enumerate(stack):
+                spec = registry.unit_specs[unit_type]
+                mobiles["alive"][k, m] = True
+                mobiles["types"][k][m] = unit_type
+                mobiles["x"][k, m] = int(x)
+                mobiles["y"][k, m] = int(y)
+                mobiles["player"][k, m] = player_index
+                mobiles["health"][k, m] = spec.max_health
+                mobiles["damage_f"][k, m] = spec.damage_f
+                mobiles["damage_i"][k, m] = spec.damage_i
+                mobiles["attack_range"][k, m] = spec.attackRange
+                mobiles["interval"][k, m] = get_move_interval(spec)
+                mobiles["edge"][k, m] = self.game_state.get_target_edge(
+                    [int(x), int(y)]
+                )
+        return mobiles
+
+    def __shield(self, mobiles, structures, shielded):
+        """Every support shields each friendly mobile unit in range once"""
+        if not len(self.__supports):
+            return
+        board = self.__board
+        supports = self.__supports
+        sx = board["x"][supports][None, :, None]
+        sy = board["y"][supports][None, :, None]
+        distance = np.sqrt(
+            (mobiles["x"][:, None, :] - sx) ** 2 + (mobiles["y"][:, None, :] - sy) ** 2
+        )
+        within = (
+            structures["alive"][:, supports][:, :, None]
+            & mobiles["alive"][:, None, :]
+            & (
+                board["player"][supports][None, :, None]
+                == mobiles["player"][:, None, :]
+            )
+            & ~shielded
+            & (
+                distance
+                < board["shield_range"][supports][None, :, None]
+                + self.__registry.get_hit_radius
+            )
+        )
+        mobiles["health"] += (within * board["shield"][supports][None, :, None]).sum(
+            axis=1
+        )
+        shielded |= within
+
+    def __move(self, frame, mobiles, destroyed, results):
+        """
+        Moves every mobile unit whose turn it is one step along its path and records breaches and self destructs.
+        Returns the masks of the units that left the board and of those that self destructed.
+        """
+        alive = mobiles["alive"]
+        walking = alive & (mobiles["interval"] > 0)
+        mobiles["counter"][walking] += 1
+        moving = walking & (mobiles["counter"] >= mobiles["interval"])
+        mobiles["counter"][moving] = 0
+        for k, m in zip(*np.nonzero(moving & mobiles["stale"])):
+            mobiles["path"][k, m] = self.__get_path_id(
+                (int(mobiles["x"][k, m]), int(mobiles["y"][k, m])),
+                int(mobiles["edge"][k, m]),
+                destroyed[k],
+            )
+            mobiles["path_index"][k, m] = 0
+            mobiles["stale"][k, m] = False
+
+        path_xy, path_length, path_breaches = self.__get_path_table()
+        path = mobiles["path"]
+        path_index = mobiles["path_index"]
+        advancing = moving & (path_index + 1 < path_length[path])
+        path_index[advancing] += 1
+        mobiles["x"][advancing] = path_xy[path[advancing], path_index[advancing], 0]
+        mobiles["y"][advancing] = path_xy[path[advancing], path_index[advancing], 1]
+        mobiles["steps"][advancing] += 1
+        breaching = (
+            advancing & (path_index + 1 == path_length[path]) & path_breaches[path]
+        )
+        self_destructing = moving & ~advancing
+        departed = breaching | self_destructing
+        if not departed.any():
+            return departed, self_destructing
+
+        alive &= ~departed
+        for k, m in zip(*np.nonzero(departed)):
+            unit_type = mobiles["types"][k][m]
+            player_index = int(mobiles["player"][k, m])
+            location = [int(mobiles["x"][k, m]), int(mobiles["y"][k, m])]
+            event = (frame, unit_type, location, player_index)
+            if breaching[k, m]:
+                spec = self.__registry.unit_specs[unit_type]
+                results[k].breaches.append(event)
+                results[k].breach_damage[player_index] += spec.type_config.get(
+                    "playerBreachDamage", 1
+                )
+            else:
+                results[k].self_destructs.append(event)
+        return departed, self_destructing
+
+    def __get_path_id(self, location, target_edge, destroyed):
+        """Gets the index of a path in the path table, adding it if it is new"""
+        path = self.simulator.get_path(location, target_edge, destroyed)
+        path_id = self.__path_ids.get(id(path))
+        if path_id is None:
+            path_id = len(self.__paths)
+            self.__path_ids[id(path)] = path_id
+            self.__paths.append(
+                (path, self.simulator.is_on_edge(path[-1], target_edge))
+            )
+            self.__path_table = None
+        return path_id
+
+    def __get_path_table(self):
+        """Pads every known path into arrays so units can advance along them together"""
+        if self.__path_table is None:
+            longest = max([len(path) for path, _ in self.__paths] + [1])
+            path_xy = np.zeros((max(len(self.__paths), 1), longest, 2), dtype=np.int64)
+            path_length = np.ones(len(path_xy), dtype=np.int64)
+            path_breaches = np.zeros(len(path_xy), dtype=np.bool_)
+            for path_id, (path, breaches) in enumerate(self.__paths):
+                path_xy[path_id, : len(path)] = path
+                path_length[path_id] = len(path)
+                path_breaches[path_id] = breaches
+            self.__path_table = (path_xy, path_length, path_breaches)
+        return self.__path_table
+
+    def __self_destruct_damage(self, self_destructing, mobiles, structures, results):
+        """Applies the damage of every unit that self destructed this frame"""
+        board = self.__board
+        hit_radius = self.__registry.get_hit_radius
+        s_damage = np.zeros_like(structures["health"])
+        m_damage = np.zeros_like(mobiles["health"])
+        for k, m in zip(*np.nonzero(self_destructing)):
+            steps_required, radius, damage_f, damage_i = (
+                self.simulator.get_self_destruct(mobiles["types"][k][m])
+            )
+            if mobiles["steps"][k, m] < steps_required:
+                continue
+            x, y = mobiles["x"][k, m], mobiles["y"][k, m]
+            player_index = mobiles["player"][k, m]
+            reach = radius + hit_radius
+            structures_hit = (
+                structures["alive"][k]
+                & (board["player"] != player_index)
+                & (np.sqrt((board["x"] - x) ** 2 + (board["y"] - y) ** 2) < reach)
+            )
+            mobiles_hit = (
+                mobiles["alive"][k]
+                & (mobiles["player"][k] != player_index)
+                & (
+                    np.sqrt((mobiles["x"][k] - x) ** 2 + (mobiles["y"][k] - y) ** 2)
+                    < reach
+                )
+            )
+            s_damage[k, structures_hit] += damage_f
+            m_damage[k, mobiles_hit] += damage_i
+        self.__apply_damage(s_damage, m_damage, mobiles, structures, results)
+
+    def __attack(self, active, mobiles, structures, results):
+        """Every unit attacks the target get_target would choose, all targets being chosen before damage is applied"""
+        board = self.__board
+        rows = np.nonzero(active)[0]
+        scenarios = len(rows)
+        structure_count = len(board["x"])
+        width = mobiles["alive"].shape[1]
+        total = structure_count + width
+        shape = (scenarios, structure_count)
+        candidates = {
+            name: np.concatenate(
+                [np.broadcast_to(board[name], shape), mobiles[name][rows]], axis=1
+            )
+            for name in ("x", "y", "player")
+        }
+        candidates["health"] = np.concatenate(
+            [structures["health"][rows], mobiles["health"][rows]], axis=1
+        )
+        candidates["alive"] = np.concatenate(
+            [structures["alive"][rows], mobiles["alive"][rows]], axis=1
+        )
+        candidates["stationary"] = np.arange(total) < structure_count
+        # The order get_locations_in_range visits the units in, which breaks the remaining ties
+        candidates["order"] = (
+            candidates["x"] * self.__registry.ARENA_SIZE + candidates["y"]
+        ) * total + np.arange(total)
+
+        s_damage = np.zeros_like(structures["health"])
+        m_damage = np.zeros_like(mobiles["health"])
+        attacking = self.__attacking
+        if len(attacking):
+            shape = (scenarios, len(attacking))
+            attackers = {
+                name: np.broadcast_to(board[name][attacking], shape)
+                for name in ("x", "y", "player", "damage_f", "damage_i", "attack_range")
+            }
+            attackers["alive"] = structures["alive"][rows][:, attacking]
+            if (board["damage_f"][attacking] > 0).any():
+                columns = np.arange(total)
+            else:
+                columns = np.arange(structure_count, total)
+            self.__resolve(attackers, candidates, columns, rows, s_damage, m_damage)
+        if width:
+            attackers = {
+                name: mobiles[name][rows]
+                for name in (
+                    "x",
+                    "y",
+                    "player",
+                    "damage_f",
+                    "damage_i",
+                    "attack_range",
+                    "alive",
+                )
+            }
+            columns = np.arange(total)
+            self.__resolve(attackers, candidates, columns, rows, s_damage, m_damage)
+        self.__apply_damage(s_damage, m_damage, mobiles, structures, results)
+
+    def __resolve(self, attackers, candidates, columns, rows, s_damage, m_damage):
+        """
+        Chooses the target of a block of (scenario, attacker) arrays among the given candidate columns,
+        and adds the damage to s_damage and m_damage. attackers and candidates only hold the given scenario rows.
+        """
+        x = attackers["x"][:, :, None]
+        y = attackers["y"][:, :, None]
+        c_x = candidates["x"][:, columns][:, None, :]
+        c_y = candidates["y"][:, columns][:, None, :]
+        distance = np.sqrt((x - c_x) ** 2 + (y - c_y) ** 2)
+        valid = (
+            attackers["alive"][:, :, None]
+            & candidates["alive"][:, columns][:, None, :]
+            & (
+                attackers["player"][:, :, None]
+                != candidates["player"][:, columns][:, None, :]
+            )
+            & np.where(
+                candidates["stationary"][columns][None, None, :],
+                attackers["damage_f"][:, :, None] > 0,
+                attackers["damage_i"][:, :, None] > 0,
+            )
+            & (
+                distance
+                < attackers["attack_range"][:, :, None] + self.__registry.get_hit_radius
+            )
+        )
+        k, a, c = np.nonzero(valid)
+        if not len(k):
+            return
+
+        # Sort the candidates of each attacker by get_target's priority and keep the first one
+        target = columns[c]
+        attacker = k * valid.shape[1] + a
+        y_sign = np.where(attackers["player"][k, a] == 0, 1, -1)
+        center = self.__registry.HALF_ARENA - 0.5
+        ranking = np.lexsort(
+            (
+                candidates["order"][k, target],
+                -np.abs(center - candidates["x"][k, target]),
+                y_sign * candidates["y"][k, target],
+                candidates["health"][k, target],
+                distance[k, a, c],
+                candidates["stationary"][target],
+                attacker,
+            )
+        )
+        first = np.ones(len(ranking), dtype=np.bool_)
+        first[1:] = attacker[ranking[1:]] != attacker[ranking[:-1]]
+        chosen = ranking[first]
+        k, a, target = k[chosen], a[chosen], target[chosen]
+
+        stationary = candidates["stationary"][target]
+        damage = np.where(
+            stationary, attackers["damage_f"][k, a], attackers["damage_i"][k, a]
+        )
+        structure_count = s_damage.shape[1]
+        np.add.at(
+            s_damage, (rows[k[stationary]], target[stationary]), damage[stationary]
+        )
+        np.add.at(
+            m_damage,
+            (rows[k[~stationary]], target[~stationary] - structure_count),
+            damage[~stationary],
+        )
+
+    def __apply_damage(self, s_damage, m_damage, mobiles, structures, results):
+        """Subtracts damage from living units and credits the damage they absorbed to the opposing player"""
+        s_alive, s_health = structures["alive"], structures["health"]
+        m_alive, m_health = mobiles["alive"], mobiles["health"]
+        s_dealt = np.where(s_alive & (s_damage > 0), np.minimum(s_damage, s_health), 0)
+        m_dealt = np.where(m_alive & (m_damage > 0), np.minimum(m_damage, m_health), 0)
+        if not (s_dealt.any() or m_dealt.any()):
+            return
+        for player_index in (0, 1):
+            credited = s_dealt[:, self.__board["player"] != player_index].sum(axis=1)
+            credited += np.where(mobiles["player"] != player_index, m_dealt, 0).sum(
+                axis=1
+            )
+            for k in np.nonzero(credited)[0]:
+                results[k].damage_dealt[player_index] += float(credited[k])
+        s_health -= np.where(s_alive, s_damage, 0)
+        m_health -= np.where(m_alive, m_damage, 0)
+
+    def __remove_dead(self, frame, mobiles, structures, destroyed, results):
+        """Removes destroyed units. Mobile units re-path on their next move if a structure of their scenario was destroyed."""
+        mobiles["alive"] &= mobiles["health"] > 0
+        dying = structures["alive"] & (structures["health"] <= 0)
+        if not dying.any():
+            return
+        structures["alive"] &= ~dying
+        for k, s in zip(*np.nonzero(dying)):
+            unit = self.simulator.structures[s]
+            results[k].structures_destroyed.append(
+                (frame, unit.unit_type, [unit.x, unit.y], unit.player_index)
+            )
+            results[k].structure_cost_lost[unit.player_index] += unit.spec.cost[0]
+            destroyed[k] = destroyed[k] | {(unit.x, unit.y)}
+            mobiles["stale"][k] = True
@@ -0,0 +1,313 @@
+"""
+Microbenchmarks of the gamelib hot paths on fixture boards.
+
+Run them with
+    python -m gamelib.benchmarks --output results.json
+and compare two runs with
+    python -m gamelib.benchmarks --output new.json --compare results.json
+"""
+
+import argparse
+import datetime
+import gc
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+from .board_generator import generate_board
+from .config_registry import get_registry
+from .fixtures import TEST_CONFIG, make_turn
+from .game_state import GameState
+from .navigation import ShortestPathFinder
+from .unit import GameUnit
+
+
+def _mirror(registry, units):
+    """Gives the enemy the same structures as you, rotated onto their half of the board"""
+    last = registry.ARENA_SIZE - 1
+    return {
+        type_index: [[last - x, last - y, health] for x, y, health in entries]
+        for type_index, entries in units.items()
+    }
+
+
+def _structures(registry, walls=(), supports=(), turrets=()):
+    units = {}
+    for unit_type, locations in (
+        (registry.WALL, walls),
+        (registry.SUPPORT, supports),
+        (registry.TURRET, turrets),
+    ):
+        if locations:
+            health = registry.unit_specs[unit_type].max_health
+            units[registry.UNIT_TYPE_TO_INDEX[unit_type]] = [
+                [x, y, health] for x, y in locations
+            ]
+    return units
+
+
+def empty_board(config):
+    """No units at all"""
+    return make_turn()
+
+
+def mid_game_board(config):
+    """A typical defense of turrets behind a wall line, with supports, on both sides"""
+    registry = get_registry(config)
+    size, half = registry.ARENA_SIZE, registry.HALF_ARENA
+    turrets = [[3, 12], [24, 12], [9, 10], [18, 10], [13, 10], [6, 11], [21, 11]]
+    walls = [[x, half - 1] for x in range(0, 6)]
+    walls += [[x, half - 1] for x in range(size - 6, size)]
+    walls += [[x, 11] for x in range(8, 20) if [x, 11] not in turrets]
+    supports = [[13, 4], [14, 4], [12, 5], [15, 5]]
+    units = _structures(registry, walls, supports, turrets)
+    return make_turn(units, _mirror(registry, units), turn_number=20)
+
+
+def dense_maze_board(config):
+    """Rows of walls with a single gap at alternating ends, so paths snake across the board"""
+    registry = get_registry(config)
+    walls = []
+    for row, y in enumerate(range(registry.HALF_ARENA - 2, 1, -2)):
+        xs = [
+            x
+            for x in range(registry.ARENA_SIZE)
+            if (x, y) in registry.my_side_locations
+        ]
+        gap = xs[-2:] if row % 2 == 0 else xs[:2]
+        walls += [[x, y] for x in xs if x not in gap]
+    units = _structures(registry, walls)
+    return make_turn(units, _mirror(registry, units), turn_number=40)
+
+
+def walled_pockets_board(config):
+    """Closed rings of walls on both sides, so units starting inside them self destruct"""
+    registry = get_registry(config)
+    walls = []
+    for left, bottom in ((4, 9), (11, 2), (19, 7)):
+        for x in range(left, left + 5):
+            for y in range(bottom, bottom + 5):
+                on_ring = x in (left, left + 4) or y in (bottom, bottom + 4)
+                if on_ring and (x, y) in registry.my_side_locations:
+                    walls.append([x, y])
+    units = _structures(registry, walls)
+    return make_turn(units, _mirror(registry, units), turn_number=40)
+
+
+def generated_board(config):
+    """A seeded random board mixing a partial maze, pockets, scattered structures and mobile units"""
+    return generate_board(
+        config,
+        seed=0,
+        density=0.15,
+        maze=0.5,
+        pockets=2,
+        units_per_player=(8, 8),
+        turn_number=40,
+    )
+
+
+# Each board is built from the game config
+BOARDS = {
+    "empty": empty_board,
+    "mid_game": mid_game_board,
+    "dense_maze": dense_maze_board,
+    "walled_pockets": walled_pockets_board,
+    "generated": generated_board,
+}
+
+# Start points on your edges plus points inside the pockets of walled_pockets_board
+PATH_STARTS = [[13, 0], [3, 10], [24, 10], [6, 11], [13, 4], [21, 9]]
+QUERY_LOCATIONS = [[x, y] for x in range(4, 24, 3) for y in range(6, 22, 3)]
+
+
+def _make_benchmarks(config, turn_string):
+    """Builds the benchmarked operations of one board, each a function doing one batch of work"""
+    game_state = GameState(config, turn_string)
+    game_state.suppress_warnings(True)
+    game_map = game_state.game_map
+    edges = game_map.get_edges()
+    starts = [
+        start for start in PATH_STARTS if not game_state.contains_stationary_unit(start)
+    ]
+    scout = get_registry(config).SCOUT
+    scouts = [
+        GameUnit(scout, config, 0, None, x, y)
+        for x, y in QUERY_LOCATIONS
+        if not game_state.contains_stationary_unit([x, y])
+    ]
+
+    def parse():
+        GameState(config, turn_string)
+
+    def navigate():
+        finder = ShortestPathFinder()
+        for start in starts:
+            finder.navigate_multiple_endpoints(
+                start, edges[game_state.get_target_edge(start)], game_state
+            )
+
+    def get_attackers():
+        for location in QUERY_LOCATIONS:
+            game_state.get_attackers(location, 0)
+
+    def get_locations_in_range():
+        for location in QUERY_LOCATIONS:
+            game_map.get_locations_in_range(location, 3.5)
+
+    def get_target():
+        for scout in scouts:
+            game_state.get_target(scout)
+
+    return {
+        "GameState": (parse, 1),
+        "navigate_multiple_endpoints": (navigate, len(starts)),
+        "get_attackers": (get_attackers, len(QUERY_LOCATIONS)),
+        "get_locations_in_range": (get_locations_in_range, len(QUERY_LOCATIONS)),
+        "get_target": (get_target, len(scouts)),
+    }
+
+
+def measure(function, ops_per_call, min_time=0.2, repeats=3):
+    """Times a function and measures what it allocates
+
+    Args:
+        function: Does ops_per_call operations per call
+        ops_per_call: The number of operations one call does
+        min_time: Each repeat calls the function for at least this many seconds
+        repeats: The number of timed repeats, the best one being reported
+
+    Returns:
+        A dict with ops_per_sec, and per operation the peak_bytes allocated and the retained_blocks left allocated, measured with tracemalloc
+
+    """
+    function()
+    best = None
+    for _ in range(repeats):
+        calls = 0
+        start = time.perf_counter()
+        while True:
+            function()
+            calls += 1
+            elapsed = time.perf_counter() - start
+            if elapsed >= min_time:
+                break
+        rate = calls * ops_per_call / elapsed
+        best = rate if best is None else max(best, rate)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        function()
+        peak = tracemalloc.get_traced_memory()[1] - baseline
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    blocks = sum(
+        stat.count_diff
+        for stat in after.compare_to(before, "filename")
+        if stat.count_diff > 0
+    )
+    ops = max(ops_per_call, 1)
+    return {
+        "ops_per_sec": best,
+        "peak_bytes": peak / ops,
+        "retained_blocks": blocks / ops,
+    }
+
+
+def run(boards=None, benchmarks=None, min_time=0.2, repeats=3):
+    """Runs the benchmarks
+
+    Args:
+        boards: The names of the BOARDS to run on, all of them if None
+        benchmarks: The names of the benchmarks to run, all of them if None
+        min_time: See measure
+        repeats: See measure
+
+    Returns:
+        A JSON serializable dict with the environment and one result per benchmark and board
+
+    """
+    config = json.loads(TEST_CONFIG)
+    results = []
+    for board in boards or BOARDS:
+        turn_string = BOARDS[board](config)
+        for name, (function, ops_per_call) in _make_benchmarks(
+            config, turn_string
+        ).items():
+            if benchmarks is not None and name not in benchmarks:
+                continue
+            result = {"benchmark": name, "board": board}
+            result.update(measure(function, ops_per_call, min_time, repeats))
+            results.append(result)
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "date": datetime.datetime.now().isoformat(timespec="seconds"),
+        "results": results,
+    }
+
+
+def compare(new, old):
+    """Matches the results of two runs
+
+    Returns:
+        A list of (benchmark, board, new ops_per_sec / old ops_per_sec) for every result both runs have
+
+    """
+    previous = {
+        (result["benchmark"], result["board"]): result for result in old["results"]
+    }
+    ratios = []
+    for result in new["results"]:
+        match = previous.get((result["benchmark"], result["board"]))
+        if match and match["ops_per_sec"]:
+            ratios.append(
+                (
+                    result["benchmark"],
+                    result["board"],
+                    result["ops_per_sec"] / match["ops_per_sec"],
+                )
+            )
+    return ratios
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks the gamelib hot paths")
+    parser.add_argument("--output", help="Save the results as JSON to this file")
+    parser.add_argument(
+        "--compare", help="A JSON file of a previous run to compare with"
+    )
+    parser.add_argument(
+        "--board", action="append", choices=list(BOARDS), help="Only run on this board"
+    )
+    parser.add_argument("--benchmark", action="append", help="Only run this benchmark")
+    parser.add_argument("--min-time", type=float, default=0.2)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    report = run(args.board, args.benchmark, args.min_time, args.repeats)
+    for result in report["results"]:
+        print(
+            "{benchmark:28} {board:15} {ops_per_sec:12.1f} ops/s {peak_bytes:10.0f} B/op {retained_blocks:8.1f} blocks/op".format(
+                **result
+            )
+        )
+    if args.compare:
+        with open(args.compare) as file:
+            for benchmark, board, ratio in compare(report, json.load(file)):
+                print("{:28} {:15} {:6.2f}x".format(benchmark, board, ratio))
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+    return report
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,161 @@
+import json
+import random
+
+from .config_registry import get_registry
+
+
+def generate_board(
+    config,
+    seed=None,
+    density=0.1,
+    maze=0.0,
+    pockets=0,
+    units_per_player=(0, 0),
+    damaged=0.25,
+    turn_number=1,
+):
+    """Generates a random but valid turn message, for benchmarks and stress tests.
+    The same arguments and seed always give the same message.
+
+    Each player's half is filled in this order, the enemy's half being generated like yours and rotated:
+        * pockets: closed rings of walls, whose inside is kept free so units starting there can only self destruct
+        * maze: rows of walls across the half, each with a gap at alternating ends, so paths snake between them
+        * density: random walls, turrets and supports on a fraction of the locations still free
+        * units: mobile units on random free locations
+
+    Args:
+        config: The game config
+        seed: Seeds the generator
+        density: The fraction of the free locations of each half that get a random structure
+        maze: Between 0 and 1, the fraction of the possible maze rows that are built
+        pockets: The number of pockets on each half
+        units_per_player: The number of mobile units of each player
+        damaged: The fraction of units that have lost some health
+        turn_number: The turn number of the message
+
+    Returns:
+        A turn message accepted by GameState
+
+    Raises ValueError when units_per_player asks for mobile units but structures cover the whole half.
+
+    """
+    registry = get_registry(config)
+    rng = random.Random(seed)
+    players = [
+        _generate_half(registry, rng, density, maze, pockets, units, damaged)
+        for units in units_per_player
+    ]
+    last = registry.ARENA_SIZE - 1
+    players[1] = [
+        (unit_type, last - x, last - y, health, upgraded)
+        for unit_type, x, y, health, upgraded in players[1]
+    ]
+
+    type_count = len(config["unitInformation"])
+    message = {
+        "turnInfo": [0, turn_number, -1],
+        "p1Stats": [30.0, 25.0, 5.0, 0],
+        "p2Stats": [30.0, 25.0, 5.0, 0],
+        "events": {
+            name: []
+            for name in (
+                "selfDestruct",
+                "breach",
+                "damage",
+                "shield",
+                "move",
+                "spawn",
+                "death",
+                "attack",
+                "melee",
+            )
+        },
+    }
+    unit_id = 0
+    for key, units in (("p1Units", players[0]), ("p2Units", players[1])):
+        entries = [[] for _ in range(type_count)]
+        for unit_type, x, y, health, upgraded in units:
+            unit_id += 1
+            entries[registry.UNIT_TYPE_TO_INDEX[unit_type]].append(
+                [x, y, health, str(unit_id)]
+            )
+            if upgraded:
+                entries[registry.UNIT_TYPE_TO_INDEX[registry.UPGRADE]].append(
+                    [x, y, 0, str(unit_id)]
+                )
+        message[key] = entries
+    return json.dumps(message)
+
+
+def _generate_half(registry, rng, density, maze, pockets, unit_count, damaged):
+    """Generates (unit_type, x, y, health, upgraded) for every unit on your half"""
+    half = registry.my_side_locations
+    structures = {}
+    reserved = set()
+
+    for _ in range(pockets):
+        for _ in range(100):
+            size = rng.choice((3, 4, 5))
+            left = rng.randrange(registry.ARENA_SIZE - size + 1)
+            bottom = rng.randrange(registry.HALF_ARENA - size + 1)
+            square = [
+                (x, y)
+                for x in range(left, left + size)
+                for y in range(bottom, bottom + size)
+            ]
+            if all(location in half for location in square) and not any(
+                location in structures or location in reserved for location in square
+            ):
+                break
+        else:
+            continue
+        for x, y in square:
+            if x in (left, left + size - 1) or y in (bottom, bottom + size - 1):
+                structures[x, y] = registry.WALL
+            else:
+                reserved.add((x, y))
+
+    rows = range(registry.HALF_ARENA - 2, 0, -2)
+    for row, y in enumerate(rows[: round(maze * len(rows))]):
+        xs = sorted(x for x, row_y in half if row_y == y)
+        # The end of a row is only reachable from the row below through its second location
+        gap_width = rng.choice((2, 3))
+        gap = xs[-gap_width:] if row % 2 == 0 else xs[:gap_width]
+        for x in xs:
+            if x not in gap and (x, y) not in reserved:
+                structures.setdefault((x, y), registry.WALL)
+
+    free = sorted(
+        location
+        for location in half
+        if location not in structures and location not in reserved
+    )
+    structure_types = [registry.WALL] * 6 + [registry.TURRET] * 3 + [registry.SUPPORT]
+    for location in rng.sample(free, round(density * len(free))):
+        structures[location] = rng.choice(structure_types)
+
+    units = []
+    for (x, y), unit_type in sorted(structures.items()):
+        upgraded = rng.random() < 0.2
+        spec = registry.unit_specs[unit_type]
+        max_health = spec.upgraded_spec.max_health if upgraded else spec.max_health
+        units.append((unit_type, x, y, _health(rng, max_health, damaged), upgraded))
+
+    free = sorted(location for location in half if location not in structures)
+    if unit_count and not free:
+        raise ValueError(
+            "No free location left for {} mobile units, lower density or maze".format(unit_count)
+        )
+    mobile_types = [registry.SCOUT, registry.DEMOLISHER, registry.INTERCEPTOR]
+    for _ in range(unit_count):
+        unit_type = rng.choice(mobile_types)
+        x, y = rng.choice(free)
+        max_health = registry.unit_specs[unit_type].max_health
+        units.append((unit_type, x, y, _health(rng, max_health, damaged), False))
+    return units
+
+
+def _health(rng, max_health, damaged):
+    if rng.random() < damaged:
+        return round(max_health * rng.uniform(0.1, 1), 1)
+    return max_health
@@ -0,0 +1,142 @@
+from .config_registry import get_registry
+from .game_map import GameMap
+from .game_state import GameState
+from .unit import GameUnit
+
+
+class BoardTracker:
+    """Keeps one GameMap alive for the whole game and applies only the difference
+    between consecutive turn messages to it, instead of rebuilding every unit each turn.
+
+    Changes made to the map through the GameState of the previous turn (attempt_spawn,
+    attempt_upgrade, add_unit, ...) are detected and reverted to what the new message describes.
+
+    Attributes :
+        * config (JSON): Contains information about the game
+        * registry (:obj: ConfigRegistry): The compiled form of config
+        * game_map (:obj: GameMap): The map that is kept in sync with the latest turn message
+        * game_state (:obj: GameState): The GameState built from the latest turn message, sharing game_map
+        * changed_tiles (set): (x, y) tuples of every tile whose units or unit health differ from the previous message or from the map before the last update
+        * blocking_changes (set): The subset of changed_tiles where a structure appeared or disappeared
+
+    """
+
+    def __init__(self, config):
+        """Initializes an empty board
+
+        Args:
+            config (JSON): Contains information about the game
+
+        """
+        self.config = config
+        self.game_map = GameMap(config)
+        self.game_state = None
+        self.changed_tiles = set()
+        self.blocking_changes = set()
+        self.__tiles = {}
+        self.registry = get_registry(config)
+
+    def update(self, serialized_string):
+        """Brings the tracked board up to date with a new turn message
+
+        Args:
+            serialized_string: The turn message as received from the game engine
+
+        Returns:
+            A GameState for the new turn that uses the tracked game_map
+
+        """
+        game_state = GameState(self.config, serialized_string, game_map=self.game_map)
+        # GameState has already decoded the message, so its raw unit lists are reused
+        p1_units, p2_units = game_state._raw_units
+        new_tiles = {}
+        self.__describe_units(p1_units, 0, new_tiles)
+        self.__describe_units(p2_units, 1, new_tiles)
+
+        candidates = set(self.__tiles)
+        candidates.update(new_tiles)
+        candidates.update(self.game_map.take_touched_locations())
+
+        changed_tiles = set()
+        blocking_changes = set()
+        for location in candidates:
+            described = new_tiles.get(location, [])
+            previous = self.__tiles.get(location, [])
+            units = self.game_map[location]
+            is_blocked = self.__is_blocked(described)
+            # The map may already hold our own spawns, so a tile that matches it can still
+            # differ from the last message and has to be compared with that as well
+            if previous != described:
+                changed_tiles.add(location)
+                if self.__is_blocked(previous) != is_blocked:
+                    blocking_changes.add(location)
+            if self.__same_units(units, described):
+                for index, entry in enumerate(described):
+                    if units[index].health != entry[2]:
+                        units = self.game_map.get_writable_units(location)
+                        units[index].health = entry[2]
+                        changed_tiles.add(location)
+                continue
+
+            was_blocked = any(unit.stationary for unit in units)
+            self.game_map[location] = self.__build_units(location, described)
+            changed_tiles.add(location)
+            if was_blocked != is_blocked:
+                blocking_changes.add(location)
+
+        self.game_map.take_touched_locations()
+        self.__tiles = new_tiles
+        self.changed_tiles = changed_tiles
+        self.blocking_changes = blocking_changes
+        self.game_state = game_state
+        return game_state
+
+    def __describe_units(self, units, player_number, tiles):
+        """
+        Collects [player_index, unit_type, health, upgraded, pending_removal] entries per tile.
+        Removal and upgrade markers are folded into the structure on their tile.
+        """
+        typedef = self.config["unitInformation"]
+        registry = self.registry
+        markers = []
+        for i, unit_types in enumerate(units):
+            unit_type = typedef[i].get("shorthand")
+            for uinfo in unit_types:
+                x, y = map(int, uinfo[:2])
+                if unit_type == registry.REMOVE or unit_type == registry.UPGRADE:
+                    markers.append((unit_type, (x, y)))
+                else:
+                    tiles.setdefault((x, y), []).append(
+                        [player_number, unit_type, float(uinfo[2]), False, False]
+                    )
+        for unit_type, location in markers:
+            for entry in tiles.get(location, []):
+                if registry.is_stationary(entry[1]):
+                    entry[3 if unit_type == registry.UPGRADE else 4] = True
+
+    def __is_blocked(self, described):
+        return any(self.registry.is_stationary(entry[1]) for entry in described)
+
+    def __same_units(self, units, described):
+        if len(units) != len(described):
+            return False
+        for unit, entry in zip(units, described):
+            if (
+                unit.player_index != entry[0]
+                or unit.unit_type != entry[1]
+                or unit.upgraded != entry[3]
+                or unit.pending_removal != entry[4]
+            ):
+                return False
+        return True
+
+    def __build_units(self, location, described):
+        x, y = location
+        units = []
+        for player_index, unit_type, health, upgraded, pending_removal in described:
+            unit = GameUnit(unit_type, self.config, player_index, health, x, y)
+            if upgraded:
+                unit.upgrade()
+            unit.pending_removal = pending_removal
+            units.append(unit)
+        return units
@@ -0,0 +1,333 @@
+import collections
+
+from . import counters
+from .precompute import get_precomputed, get_range_stencil
+
+
+class UnitSpec:
+    """Immutable statistics shared by every unit of one type and upgrade level.
+    Specs are compiled once per config by ConfigRegistry.
+
+    Attributes :
+        * unit_type (string): The type these statistics describe
+        * config (JSON): The config the spec was compiled from
+        * type_config (JSON): The entry of config["unitInformation"] for this type
+        * upgraded (bool): True if this spec describes the upgraded version of the type
+        * upgraded_spec (:obj: UnitSpec): The spec of the upgraded version, or itself if this spec is already upgraded
+        * stationary, speed, damage_f, damage_i, attackRange, shieldRange, max_health, shieldPerUnit: See GameUnit
+        * cost ((int, int)): The total resource costs as (SP, MP)
+        * changes (tuple): None for the specs of a registry. For a spec made by replace, the steps that lead to it
+          from the base spec of its type: (name, value) pairs for replaced statistics and None for an upgrade.
+
+    """
+
+    __slots__ = (
+        "unit_type",
+        "config",
+        "type_config",
+        "upgraded",
+        "upgraded_spec",
+        "stationary",
+        "speed",
+        "damage_f",
+        "damage_i",
+        "attackRange",
+        "shieldRange",
+        "max_health",
+        "shieldPerUnit",
+        "cost",
+        "changes",
+    )
+
+    def __init__(self, unit_type, config, type_config, base=None):
+        """Compiles the base spec of a type, or the upgraded spec if base is given"""
+        values = {
+            "unit_type": unit_type,
+            "config": config,
+            "type_config": type_config,
+            "upgraded": base is not None,
+            "upgraded_spec": None,
+            "stationary": (
+                type_config["unitCategory"] == 0 if base is None else base.stationary
+            ),
+            "changes": None,
+        }
+        if base is None:
+            values.update(
+                speed=type_config.get("speed", 0),
+                damage_f=type_config.get("attackDamageTower", 0),
+                damage_i=type_config.get("attackDamageWalker", 0),
+                attackRange=type_config.get("attackRange", 0),
+                shieldRange=type_config.get("shieldRange", 0),
+                max_health=type_config.get("startHealth", 0),
+                shieldPerUnit=type_config.get("shieldPerUnit", 0),
+                cost=(type_config.get("cost1", 0), type_config.get("cost2", 0)),
+            )
+        else:
+            upgrade = type_config.get("upgrade", {})
+            values.update(
+                speed=upgrade.get("speed", base.speed),
+                damage_f=upgrade.get("attackDamageTower", base.damage_f),
+                damage_i=upgrade.get("attackDamageWalker", base.damage_i),
+                attackRange=upgrade.get("attackRange", base.attackRange),
+                shieldRange=upgrade.get("shieldRange", base.shieldRange),
+                max_health=upgrade.get("startHealth", base.max_health),
+                shieldPerUnit=upgrade.get("shieldPerUnit", base.shieldPerUnit),
+                cost=(
+                    upgrade.get("cost1", 0) + base.cost[0],
+                    upgrade.get("cost2", 0) + base.cost[1],
+                ),
+            )
+        for name, value in values.items():
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("UnitSpec is immutable")
+
+    def __reduce__(self):
+        # Specs are pickled by reference to their registry, so unpickled units keep sharing one spec per type
+        if self.changes is not None:
+            return _get_changed_unit_spec, (self.config, self.unit_type, self.changes)
+        return _get_unit_spec, (self.config, self.unit_type, self.upgraded)
+
+    def replace(self, name, value):
+        """Creates a copy of this spec with one statistic replaced, for a unit whose statistic was assigned.
+        If this spec is not upgraded, the upgraded version of the copy applies the upgrade on top of the new value.
+
+        Args:
+            name: The name of the statistic, such as attackRange
+            value: Its new value
+
+        Returns:
+            A new UnitSpec
+
+        """
+        if self.changes is not None:
+            changes = self.changes
+        else:
+            changes = (None,) if self.upgraded else ()
+        changes += ((name, value),)
+        spec = UnitSpec.__new__(UnitSpec)
+        for slot in UnitSpec.__slots__:
+            object.__setattr__(spec, slot, getattr(self, slot))
+        object.__setattr__(spec, name, value)
+        object.__setattr__(spec, "changes", changes)
+        if self.upgraded:
+            upgraded = spec
+        else:
+            upgraded = UnitSpec(self.unit_type, self.config, self.type_config, spec)
+            object.__setattr__(upgraded, "changes", changes + (None,))
+        object.__setattr__(spec, "upgraded_spec", upgraded)
+        object.__setattr__(upgraded, "upgraded_spec", upgraded)
+        return spec
+
+    @classmethod
+    def compile(cls, unit_type, config, type_config):
+        """Compiles the base spec of a type and links it to its upgraded spec"""
+        base = cls(unit_type, config, type_config)
+        upgraded = cls(unit_type, config, type_config, base)
+        object.__setattr__(base, "upgraded_spec", upgraded)
+        object.__setattr__(upgraded, "upgraded_spec", upgraded)
+        return base
+
+
+class ConfigRegistry:
+    """Everything derived from a game config, compiled once and shared by GameState,
+    GameMap, GameUnit and ShortestPathFinder. Use get_registry to obtain the registry of a config.
+
+    Attributes :
+        * config (JSON): The config this registry was compiled from
+        * WALL, SUPPORT, TURRET, SCOUT, DEMOLISHER, INTERCEPTOR, REMOVE, UPGRADE (str): The unit type shorthands
+        * UNIT_TYPE_TO_INDEX (dict): Maps a unit type to its index in config["unitInformation"]
+        * STRUCTURE_TYPES (list): The structure unit types
+        * ALL_UNITS (list): Every unit type that can be spawned
+        * ARENA_SIZE (int): The size of the arena
+        * HALF_ARENA (int): Half the size of the arena
+        * my_side_locations (frozenset): (x, y) tuples of every location on your half of the board
+        * my_edge_locations (frozenset): (x, y) tuples of the bottom left and bottom right edges
+        * unit_specs (dict): Maps a unit type to its base UnitSpec
+        * costs (dict): Maps a unit type to its [SP, MP] cost
+        * upgrade_costs (dict): Maps an upgradable unit type to the [SP, MP] cost of upgrading it
+        * max_attack_range (float): The largest attackRange of any unit, upgraded or not
+        * get_hit_radius (float): The getHitRadius used for range queries
+        * bits_per_round, bit_growth_rate, turn_interval_for_bit_schedule, bit_decay_per_round (float): The MP schedule
+        * cores_per_round (float): The SP gained every round
+        * MP_decay_factor (float): The fraction of MP kept from one round to the next
+        * precomputed (:obj: Precomputed): The edges, board, range stencils and idealness tables shared by every config with the same unit information
+
+    """
+
+    ARENA_SIZE = 28
+
+    def __init__(self, config):
+        """Compiles the registry
+
+        Args:
+            config (JSON): A json object containing information about the game
+
+        """
+        self.config = config
+        unit_information = config["unitInformation"]
+        (
+            self.WALL,
+            self.SUPPORT,
+            self.TURRET,
+            self.SCOUT,
+            self.DEMOLISHER,
+            self.INTERCEPTOR,
+            self.REMOVE,
+            self.UPGRADE,
+        ) = [unit["shorthand"] for unit in unit_information[:8]]
+        self.UNIT_TYPE_TO_INDEX = {
+            unit["shorthand"]: index for index, unit in enumerate(unit_information)
+        }
+        self.STRUCTURE_TYPES = [self.WALL, self.SUPPORT, self.TURRET]
+        self.ALL_UNITS = [
+            self.SCOUT,
+            self.DEMOLISHER,
+            self.INTERCEPTOR,
+            self.WALL,
+            self.SUPPORT,
+            self.TURRET,
+        ]
+        self.HALF_ARENA = int(self.ARENA_SIZE / 2)
+
+        self.my_side_locations = frozenset(
+            (x, y)
+            for x in range(self.ARENA_SIZE)
+            for y in range(self.HALF_ARENA)
+            if self.HALF_ARENA - 1 - y <= x <= self.HALF_ARENA + y
+        )
+        self.my_edge_locations = frozenset(
+            [(self.HALF_ARENA - 1 - num, num) for num in range(self.HALF_ARENA)]
+            + [(self.HALF_ARENA + num, num) for num in range(self.HALF_ARENA)]
+        )
+
+        self.unit_specs = {}
+        self.costs = {}
+        self.upgrade_costs = {}
+        for unit in unit_information:
+            shorthand = unit["shorthand"]
+            cost = [unit.get("cost1", 0), unit.get("cost2", 0)]
+            self.costs[shorthand] = cost
+            if "upgrade" in unit:
+                self.upgrade_costs[shorthand] = [
+                    unit["upgrade"].get("cost1", cost[0]),
+                    unit["upgrade"].get("cost2", cost[1]),
+                ]
+            # Removal and upgrade are actions, not units
+            if "unitCategory" in unit:
+                self.unit_specs[shorthand] = UnitSpec.compile(shorthand, config, unit)
+
+        self.max_attack_range = 0
+        for spec in self.unit_specs.values():
+            self.max_attack_range = max(
+                self.max_attack_range,
+                spec.attackRange,
+                spec.upgraded_spec.attackRange,
+            )
+        self.get_hit_radius = unit_information[0]["getHitRadius"]
+
+        resources = config["resources"]
+        self.bits_per_round = resources["bitsPerRound"]
+        self.bit_growth_rate = resources["bitGrowthRate"]
+        self.turn_interval_for_bit_schedule = resources["turnIntervalForBitSchedule"]
+        self.bit_decay_per_round = resources["bitDecayPerRound"]
+        self.cores_per_round = resources.get("coresPerRound", 0)
+        self.MP_decay_factor = 1 - self.bit_decay_per_round
+        self.__MP_income = []
+        self.precomputed = get_precomputed(config, self.ARENA_SIZE)
+        self.__range_stencils = dict(self.precomputed.range_stencils)
+
+    def get_MP_income(self, turn_number):
+        """The MP each player gains at the start of a turn, from a schedule computed once per game
+
+        Args:
+            turn_number: The turn on which the MP is gained
+
+        Returns:
+            The MP gained on that turn, before rounding
+
+        """
+        schedule = self.__MP_income
+        while len(schedule) <= turn_number:
+            ramp_ups = len(schedule) // self.turn_interval_for_bit_schedule
+            schedule.append(self.bits_per_round + self.bit_growth_rate * ramp_ups)
+        return schedule[turn_number]
+
+    def get_range_stencil(self, radius):
+        """The offsets of every location within a radius of a unit, as used by GameMap.get_locations_in_range.
+        Stencils are computed once per radius and ordered by distance, then x, then y, so a scan can stop at the first distance that holds a target.
+
+        Args:
+            radius: The range of the unit
+
+        Returns:
+            A tuple of (distance, dx, dy) tuples
+
+        """
+        stencil = self.__range_stencils.get(radius)
+        counters.record_lookup("range_stencils", stencil is not None)
+        if stencil is None:
+            stencil = get_range_stencil(radius, self.get_hit_radius)
+            self.__range_stencils[radius] = stencil
+        return stencil
+
+    def __reduce__(self):
+        return get_registry, (self.config,)
+
+    def is_stationary(self, unit_type):
+        """
+        Args:
+            unit_type: A unit type
+
+        Returns:
+            Boolean, True if the unit is stationary, False otherwise.
+        """
+        return unit_type in self.STRUCTURE_TYPES
+
+
+# The number of configs whose registries are kept. Registries hold their config, so the cache is
+# bounded to let the configs of finished games be freed. Only configs in use at once need to fit.
+REGISTRY_CACHE_SIZE = 16
+# Maps id(config) to its registry, least recently used first
+_registries = collections.OrderedDict()
+
+
+def get_registry(config):
+    """Gets the ConfigRegistry of a config, compiling it the first time the config is seen.
+    The config should not be modified after its registry has been compiled.
+    The registries of the REGISTRY_CACHE_SIZE most recently used configs are kept.
+
+    Args:
+        config (JSON): A json object containing information about the game
+
+    Returns:
+        The ConfigRegistry shared by everything built from this config
+
+    """
+    key = id(config)
+    cached = _registries.get(key)
+    if cached is not None and cached.config is config:
+        _registries.move_to_end(key)
+        return cached
+    registry = ConfigRegistry(config)
+    _registries[key] = registry
+    _registries.move_to_end(key)
+    while len(_registries) > REGISTRY_CACHE_SIZE:
+        _registries.popitem(last=False)
+    return registry
+
+
+def _get_unit_spec(config, unit_type, upgraded):
+    """Unpickles a UnitSpec by looking it up in the registry of its config"""
+    spec = get_registry(config).unit_specs[unit_type]
+    return spec.upgraded_spec if upgraded else spec
+
+
+def _get_changed_unit_spec(config, unit_type, changes):
+    """Unpickles a UnitSpec made by replace by replaying its changes on the spec of its type"""
+    spec = get_registry(config).unit_specs[unit_type]
+    for change in changes:
+        spec = spec.upgraded_spec if change is None else spec.replace(*change)
+    return spec
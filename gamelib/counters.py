@@ -0,0 +1,99 @@
+import threading
+
+# The number of threads with counters enabled, checked first so disabled counters cost a single global lookup
+_active = 0
+# Counts are kept per thread, so algos playing each other in the threads of a LocalEngine are counted apart
+_local = threading.local()
+
+HITS = ".hits"
+MISSES = ".misses"
+
+
+def enable():
+    """Enables the counters in the calling thread. AlgoCore.start calls this when counters are requested."""
+    global _active
+    if getattr(_local, "counts", None) is None:
+        _active += 1
+    _local.counts = {}
+
+
+def disable():
+    """Disables the counters in the calling thread and discards their values"""
+    global _active
+    if getattr(_local, "counts", None) is None:
+        return
+    _local.counts = None
+    _active -= 1
+
+
+def is_enabled():
+    return bool(_active) and getattr(_local, "counts", None) is not None
+
+
+def increment(name, amount=1):
+    """Adds to a counter of the calling thread. Counters start at 0 and do nothing while disabled.
+
+    Args:
+        name: The name of the counter, for example "navigate_multiple_endpoints"
+        amount: The amount to add
+
+    """
+    if not _active:
+        return
+    counts = getattr(_local, "counts", None)
+    if counts is not None:
+        counts[name] = counts.get(name, 0) + amount
+
+
+def record_lookup(name, hit):
+    """Counts a lookup in a cache, so its hit rate can be read with get_hit_rate
+
+    Args:
+        name: The name of the cache, for example "simulator.paths"
+        hit: True if the cache held the value
+
+    """
+    if _active:
+        increment(name + HITS if hit else name + MISSES)
+
+
+def get_count(name):
+    """
+    Returns:
+        The value of a counter of the calling thread, 0 if it was never incremented
+    """
+    return (getattr(_local, "counts", None) or {}).get(name, 0)
+
+
+def get_hit_rate(name):
+    """
+    Args:
+        name: The name of a cache counted with record_lookup
+
+    Returns:
+        The fraction of lookups that were hits, or None if there were none
+    """
+    hits = get_count(name + HITS)
+    lookups = hits + get_count(name + MISSES)
+    return hits / lookups if lookups else None
+
+
+def get_counts():
+    """
+    Returns:
+        A copy of every counter of the calling thread, as a dict mapping names to values, empty while disabled
+    """
+    return dict(getattr(_local, "counts", None) or {})
+
+
+def reset():
+    """Sets every counter of the calling thread back to 0. AlgoCore.start calls this before every turn.
+
+    Returns:
+        The counters as they were before the reset
+    """
+    counts = getattr(_local, "counts", None)
+    if counts is None:
+        return {}
+    _local.counts = {}
+    return counts
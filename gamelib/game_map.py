@@ -1,6 +1,10 @@
+import itertools
 import math
+from . import counters, log
 from .unit import GameUnit
-from .util import debug_write
+from .config_registry import get_registry
+
+_versions = itertools.count()
 
 
 class GameMap:
@@ -12,6 +16,7 @@ class GameMap:
 
     Attributes :
         * config (JSON): Contains information about the current game rules
+        * registry (:obj: ConfigRegistry): The compiled form of config
         * enable_warnings (bool): If true, debug messages for game_map functions will print out
         * ARENA_SIZE (int): The size of the arena.
         * HALF_ARENA (int): Half of the size of the arena.
@@ -19,6 +24,9 @@ class GameMap:
         * TOP_LEFT (int): A constant that represents the top left edge
         * BOTTOM_LEFT (int): Hidden challenge! Can you guess what this constant represents???
         * BOTTOM_RIGHT (int): A constant that represents the bottom right edge
+        * OCCUPIED_MOBILE (int): Occupancy mask value of a location holding only deferred mobile units
+        * OCCUPIED_STRUCTURE (int): Occupancy mask value of a location holding a deferred structure
+        * version (int): Changes every time units are added, removed or modified through the map
 
     """
 
@@ -30,19 +38,31 @@ class GameMap:
 
         """
         self.config = config
+        self.registry = get_registry(config)
         self.enable_warnings = True
-        self.ARENA_SIZE = 28
-        self.HALF_ARENA = int(self.ARENA_SIZE / 2)
+        self.ARENA_SIZE = self.registry.ARENA_SIZE
+        self.HALF_ARENA = self.registry.HALF_ARENA
         self.TOP_RIGHT = 0
         self.TOP_LEFT = 1
         self.BOTTOM_LEFT = 2
         self.BOTTOM_RIGHT = 3
+        self.OCCUPIED_MOBILE = 1
+        self.OCCUPIED_STRUCTURE = 2
         self.__map = self.__empty_grid()
         self.__start = [13, 0]
+        self._touched = set()
+        self._pending = {}
+        self._resolved = set()
+        self._occupancy = bytearray(self.ARENA_SIZE * self.ARENA_SIZE)
+        # Locations whose unit lists are not shared with a fork. None until the map is forked.
+        self._owned = None
+        self.version = next(_versions)
 
     def __getitem__(self, location):
         if len(location) == 2 and self.in_arena_bounds(location):
             x, y = location
+            if self._pending and (x, y) in self._pending:
+                self.__materialize(x, y)
             return self.__map[x][y]
         self._invalid_coordinates(location)
 
@@ -52,7 +72,11 @@ class GameMap:
             and len(location) == 2
             and self.in_arena_bounds(location)
         ):
+            self.__discard_pending(location[0], location[1])
             self.__map[location[0]][location[1]] = val
+            self.__own(location[0], location[1])
+            self._touched.add(location)
+            self.version = next(_versions)
             return
         self._invalid_coordinates(location)
 
@@ -81,8 +105,176 @@ class GameMap:
                 grid[x].append([])
         return grid
 
+    def defer_units(self, location, entries, has_structure):
+        """Registers units at a location without creating their GameUnit objects.
+        The units are created the first time the location is accessed.
+
+        Args:
+            location: The [x, y] location of the units. The location should be empty.
+            entries: A list of [unit_type, player_index, health, upgraded, pending_removal] lists
+            has_structure: True if one of the entries is a structure
+
+        """
+        x, y = location
+        if self._owned is not None:
+            self._pending = dict(self._pending)
+            self._occupancy = bytearray(self._occupancy)
+        self._pending[x, y] = entries
+        self._occupancy[x * self.ARENA_SIZE + y] = (
+            self.OCCUPIED_STRUCTURE if has_structure else self.OCCUPIED_MOBILE
+        )
+
+    def deferred_occupancy(self, location):
+        """Reads the occupancy mask of a location whose units have not been created yet
+
+        Args:
+            location: A map location
+
+        Returns:
+            OCCUPIED_STRUCTURE or OCCUPIED_MOBILE if the location still holds deferred units, 0 otherwise
+
+        """
+        x, y = location
+        if (x, y) not in self._pending or (x, y) in self._resolved:
+            return 0
+        return self._occupancy[x * self.ARENA_SIZE + y]
+
+    def occupancy(self, location):
+        """Checks what occupies a location without creating deferred units
+
+        Args:
+            location: A map location
+
+        Returns:
+            OCCUPIED_STRUCTURE if there is a structure, OCCUPIED_MOBILE if there are only mobile units, 0 if the location is empty or out of bounds
+
+        """
+        if not self.in_arena_bounds(location):
+            return 0
+        x, y = location
+        if self._pending and (x, y) in self._pending and (x, y) not in self._resolved:
+            return self._occupancy[x * self.ARENA_SIZE + y]
+        units = self.__map[x][y]
+        for unit in units:
+            if unit.stationary:
+                return self.OCCUPIED_STRUCTURE
+        return self.OCCUPIED_MOBILE if units else 0
+
+    def get_writable_units(self, location):
+        """Gets the list of units at a location so that it and its units can be modified in place.
+        If the list is shared with a fork of this map, it is copied first.
+
+        Args:
+            location: The location of the units
+
+        Returns:
+            The list of GameUnits at the location, owned by this map only
+
+        """
+        if not self.in_arena_bounds(location):
+            self._invalid_coordinates(location)
+            return
+        x, y = location
+        self._touched.add((x, y))
+        self.version = next(_versions)
+        return self.__writable(x, y)
+
+    def save_location(self, location):
+        """Captures the units at a location so that restore_location can undo later changes to it.
+
+        Args:
+            location: The location to capture
+
+        Returns:
+            An opaque value to pass to restore_location
+
+        """
+        x, y = location
+        units = self[x, y]
+        states = [
+            (unit, unit.spec, unit.upgraded, unit.health, unit.pending_removal)
+            for unit in units
+        ]
+        return x, y, states
+
+    def restore_location(self, saved):
+        """Puts back the units captured by save_location, undoing any change made to the location since.
+        Once the map has been forked, the captured units may be shared with a fork taken after save_location,
+        so the location gets restored copies of them instead of having them modified in place.
+
+        Args:
+            saved: A value returned by save_location
+
+        """
+        x, y, states = saved
+        shared = self._owned is not None
+        units = []
+        for unit, spec, upgraded, health, pending_removal in states:
+            if shared:
+                unit = unit.__copy__()
+            unit.spec = spec
+            unit.upgraded = upgraded
+            unit.health = health
+            unit.pending_removal = pending_removal
+            units.append(unit)
+        self.__map[x][y] = units
+        self.__own(x, y)
+        self._touched.add((x, y))
+        self.version = next(_versions)
+
+    def fork(self):
+        """Creates a copy of this map that shares the unit lists of every location with it.
+        A location is only copied when either map modifies it, so forking does not depend on the number of units.
+
+        Returns:
+            A new GameMap with the same units
+
+        """
+        child = GameMap.__new__(GameMap)
+        child.__dict__.update(self.__dict__)
+        child.__map = [column[:] for column in self.__map]
+        child._touched = set()
+        child._resolved = set(self._resolved)
+        child._owned = set()
+        self._owned = set()
+        return child
+
+    def __writable(self, x, y):
+        if self._pending and (x, y) in self._pending:
+            self.__materialize(x, y)
+        if self._owned is None or (x, y) in self._owned:
+            return self.__map[x][y]
+        units = [unit.__copy__() for unit in self.__map[x][y]]
+        self.__map[x][y] = units
+        self._owned.add((x, y))
+        return units
+
+    def __own(self, x, y):
+        if self._owned is not None:
+            self._owned.add((x, y))
+
+    def __materialize(self, x, y):
+        if (x, y) in self._resolved:
+            return
+        self._resolved.add((x, y))
+        units = []
+        for unit_type, player_index, health, upgraded, pending_removal in self._pending[
+            x, y
+        ]:
+            unit = GameUnit(unit_type, self.config, player_index, health, x, y)
+            if upgraded:
+                unit.upgrade()
+            unit.pending_removal = pending_removal
+            units.append(unit)
+        self.__map[x][y] = units
+        self.__own(x, y)
+
+    def __discard_pending(self, x, y):
+        if self._pending and (x, y) in self._pending:
+            self._resolved.add((x, y))
+
     def _invalid_coordinates(self, location):
-        self.warn("{} is out of bounds.".format(str(location)))
+        self.warn("{} is out of bounds.", location)
 
     def in_arena_bounds(self, location):
         """Checks if the given location is inside the diamond shaped game board.
@@ -95,19 +287,7 @@ class GameMap:
 
         """
         x, y = location
-        half_board = self.HALF_ARENA
-
-        row_size = y + 1
-        startx = half_board - row_size
-        endx = startx + (2 * row_size) - 1
-        top_half_check = y < self.HALF_ARENA and x >= startx and x <= endx
-
-        row_size = (self.ARENA_SIZE - 1 - y) + 1
-        startx = half_board - row_size
-        endx = startx + (2 * row_size) - 1
-        bottom_half_check = y >= self.HALF_ARENA and x >= startx and x <= endx
-
-        return bottom_half_check or top_half_check
+        return (x, y) in self.registry.precomputed.arena_locations
 
     def get_edge_locations(self, quadrant_description):
         """Takes in an edge description and returns a list of locations.
@@ -126,9 +306,8 @@ class GameMap:
             self.BOTTOM_RIGHT,
         ]:
             self.warn(
-                "Passed invalid quadrant_description '{}'. See the documentation for valid inputs for get_edge_locations.".format(
-                    quadrant_description
-                )
+                "Passed invalid quadrant_description '{}'. See the documentation for valid inputs for get_edge_locations.",
+                quadrant_description,
             )
             return
 
@@ -142,27 +321,8 @@ class GameMap:
             A list with four lists inside of it of locations corresponding to the four edges.
             [0] = top_right, [1] = top_left, [2] = bottom_left, [3] = bottom_right.
         """
-        top_right = []
-        for num in range(0, self.HALF_ARENA):
-            x = self.HALF_ARENA + num
-            y = self.ARENA_SIZE - 1 - num
-            top_right.append([int(x), int(y)])
-        top_left = []
-        for num in range(0, self.HALF_ARENA):
-            x = self.HALF_ARENA - 1 - num
-            y = self.ARENA_SIZE - 1 - num
-            top_left.append([int(x), int(y)])
-        bottom_left = []
-        for num in range(0, self.HALF_ARENA):
-            x = self.HALF_ARENA - 1 - num
-            y = num
-            bottom_left.append([int(x), int(y)])
-        bottom_right = []
-        for num in range(0, self.HALF_ARENA):
-            x = self.HALF_ARENA + num
-            y = num
-            bottom_right.append([int(x), int(y)])
-        return [top_right, top_left, bottom_left, bottom_right]
+        # The locations are precomputed once per config, but callers get lists they can modify
+        return [[[x, y] for x, y in edge] for edge in self.registry.precomputed.edges]
 
     def add_unit(self, unit_type, location, player_index=0):
         """Add a single GameUnit to the map at the given location.
@@ -180,9 +340,8 @@ class GameMap:
             self._invalid_coordinates(location)
         if player_index < 0 or player_index > 1:
             self.warn(
-                "Player index {} is invalid. Player index should be 0 or 1.".format(
-                    player_index
-                )
+                "Player index {} is invalid. Player index should be 0 or 1.",
+                player_index,
             )
 
         x, y = location
@@ -190,9 +349,13 @@ class GameMap:
             unit_type, self.config, player_index, None, location[0], location[1]
         )
         if not new_unit.stationary:
-            self.__map[x][y].append(new_unit)
+            self.__writable(x, y).append(new_unit)
         else:
+            self.__discard_pending(x, y)
             self.__map[x][y] = [new_unit]
+            self.__own(x, y)
+        self._touched.add((x, y))
+        self.version = next(_versions)
 
     def remove_unit(self, location):
         """Remove all units on the map in the given location.
@@ -207,7 +370,34 @@ class GameMap:
             self._invalid_coordinates(location)
 
         x, y = location
+        self.__discard_pending(x, y)
         self.__map[x][y] = []
+        self.__own(x, y)
+        self._touched.add((x, y))
+        self.version = next(_versions)
+
+    def get_all_units(self):
+        """Gets every unit on the map, location by location, without walking the map iterator
+
+        Returns:
+            A list of GameUnits
+
+        """
+        if self._pending:
+            for x, y in list(self._pending):
+                self.__materialize(x, y)
+        return [unit for column in self.__map for units in column for unit in units]
+
+    def take_touched_locations(self):
+        """Returns the locations modified through add_unit, remove_unit or item assignment
+        since the last call, and resets the record.
+
+        Returns:
+            A set of (x, y) tuples
+        """
+        touched = self._touched
+        self._touched = set()
+        return touched
 
     def get_locations_in_range(self, location, radius):
         """Gets locations in a circular area around a location
@@ -222,9 +412,9 @@ class GameMap:
         """
         if radius < 0 or radius > self.ARENA_SIZE:
             self.warn(
-                "Radius {} was passed to get_locations_in_range. Expected integer between 0 and {}".format(
-                    radius, self.ARENA_SIZE
-                )
+                "Radius {} was passed to get_locations_in_range. Expected integer between 0 and {}",
+                radius,
+                self.ARENA_SIZE,
             )
         if not self.in_arena_bounds(location):
             self._invalid_coordinates(location)
@@ -232,7 +422,9 @@ class GameMap:
         x, y = location
         locations = []
         search_radius = math.ceil(radius)
-        getHitRadius = self.config["unitInformation"][0]["getHitRadius"]
+        counters.increment("get_locations_in_range")
+        counters.increment("get_locations_in_range_cells", (2 * search_radius + 1) ** 2)
+        getHitRadius = self.registry.get_hit_radius
         for i in range(int(x - search_radius), int(x + search_radius + 1)):
             for j in range(int(y - search_radius), int(y + search_radius + 1)):
                 new_location = [i, j]
@@ -261,9 +453,12 @@ class GameMap:
 
         return math.sqrt((x1 - x2) ** 2 + (y1 - y2) ** 2)
 
-    def warn(self, message):
+    def warn(self, message, *args):
         """
-        Used internally by game_map to print out default messaging
+        Used internally by game_map to print out default messaging.
+        The args are only formatted into the message if warnings are enabled.
         """
         if self.enable_warnings:
-            debug_write(message)
+            log.warning(message, *args)
+        else:
+            log.get_log().count_suppressed()
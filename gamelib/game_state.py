@@ -1,11 +1,47 @@
+import contextlib
+import copy
+import itertools
 import math
 import json
 import sys
 
 from .navigation import ShortestPathFinder
-from .util import send_command, debug_write
+from .util import send_command
 from .unit import GameUnit
 from .game_map import GameMap
+from .config_registry import get_registry
+from . import counters, log, timing
+
+LEGACY_GLOBALS = [
+    "WALL",
+    "SUPPORT",
+    "TURRET",
+    "SCOUT",
+    "DEMOLISHER",
+    "INTERCEPTOR",
+    "REMOVE",
+    "UPGRADE",
+    "STRUCTURE_TYPES",
+    "ALL_UNITS",
+    "UNIT_TYPE_TO_INDEX",
+]
+MP = 1
+SP = 0
+_published_registry = None
+
+
+def _publish_legacy_globals(registry):
+    """
+    Keeps the module level unit constants available for code that imports them.
+    They describe the config of the most recently compiled GameState and are only rewritten when that config changes.
+    GameState itself reads its own registry instead.
+    """
+    global _published_registry
+    if registry is _published_registry:
+        return
+    _published_registry = registry
+    for name in LEGACY_GLOBALS:
+        globals()[name] = getattr(registry, name)
 
 
 def is_stationary(unit_type):
@@ -46,60 +82,52 @@ class GameState:
         * my_time (int): The time you took to submit your previous turn
         * enemy_health (int): Your opponents current remaining health
         * enemy_time (int): Your opponents current remaining time
+        * lazy (bool): Whether GameUnit objects are created on demand
+        * unit_table (:obj: UnitTable): Columnar numpy view of all units, built on first access
 
     """
 
-    def __init__(self, config, serialized_string):
+    def __init__(self, config, serialized_string, game_map=None, lazy=False):
         """Setup a turns variables using arguments passed
 
         Args:
             * config (JSON): A json object containing information about the game
             * serialized_string (string): A string containing information about the game state at the start of this turn
+            * game_map (:obj: GameMap): An already populated map to use instead of parsing the units in serialized_string. Used by BoardTracker.
+            * lazy (bool): If True, GameUnit objects are only created for a location when it is first accessed through game_map or contains_stationary_unit.
 
         """
+        started = timing.start_clock()
         self.serialized_string = serialized_string
         self.config = config
         self.enable_warnings = True
+        self.lazy = lazy
+
+        self.registry = get_registry(config)
+        _publish_legacy_globals(self.registry)
+        for name in LEGACY_GLOBALS:
+            setattr(self, name, getattr(self.registry, name))
 
-        global WALL, SUPPORT, TURRET, SCOUT, DEMOLISHER, INTERCEPTOR, REMOVE, UPGRADE, STRUCTURE_TYPES, ALL_UNITS, UNIT_TYPE_TO_INDEX
-        UNIT_TYPE_TO_INDEX = {}
-        WALL = config["unitInformation"][0]["shorthand"]
-        UNIT_TYPE_TO_INDEX[WALL] = 0
-        SUPPORT = config["unitInformation"][1]["shorthand"]
-        UNIT_TYPE_TO_INDEX[SUPPORT] = 1
-        TURRET = config["unitInformation"][2]["shorthand"]
-        UNIT_TYPE_TO_INDEX[TURRET] = 2
-        SCOUT = config["unitInformation"][3]["shorthand"]
-        UNIT_TYPE_TO_INDEX[SCOUT] = 3
-        DEMOLISHER = config["unitInformation"][4]["shorthand"]
-        UNIT_TYPE_TO_INDEX[DEMOLISHER] = 4
-        INTERCEPTOR = config["unitInformation"][5]["shorthand"]
-        UNIT_TYPE_TO_INDEX[INTERCEPTOR] = 5
-        REMOVE = config["unitInformation"][6]["shorthand"]
-        UNIT_TYPE_TO_INDEX[REMOVE] = 6
-        UPGRADE = config["unitInformation"][7]["shorthand"]
-        UNIT_TYPE_TO_INDEX[UPGRADE] = 7
-
-        ALL_UNITS = [SCOUT, DEMOLISHER, INTERCEPTOR, WALL, SUPPORT, TURRET]
-        STRUCTURE_TYPES = [WALL, SUPPORT, TURRET]
-
-        self.ARENA_SIZE = 28
-        self.HALF_ARENA = int(self.ARENA_SIZE / 2)
+        self.ARENA_SIZE = self.registry.ARENA_SIZE
+        self.HALF_ARENA = self.registry.HALF_ARENA
         self.MP = 1
         self.SP = 0
-        global MP, SP
-        MP = self.MP
-        SP = self.SP
 
-        self.game_map = GameMap(self.config)
+        self._reuse_map = game_map is not None
+        self.game_map = game_map if self._reuse_map else GameMap(self.config)
         self._shortest_path_finder = ShortestPathFinder()
         self._build_stack = []
         self._deploy_stack = []
+        self._unit_table = None
+        self._unit_table_shared = False
+        self._journal = None
+        self._spawn_masks = None
         self._player_resources = [
             {"SP": 0, "MP": 0},  # player 0, which is you
             {"SP": 0, "MP": 0},
         ]  # player 1, which is the opponent
         self.__parse_state(serialized_string)
+        timing.add("GameState", timing.stop_clock(started))
 
     def __parse_state(self, state_line):
         """
@@ -126,10 +154,187 @@ class GameState:
 
         p1units = state["p1Units"]
         p2units = state["p2Units"]
+        self._raw_units = [p1units, p2units]
+
+        if self._reuse_map:
+            return
 
+        if self.lazy:
+            self.__defer_parsed_units()
+            return
         self.__create_parsed_units(p1units, 0)
         self.__create_parsed_units(p2units, 1)
 
+    @property
+    def unit_table(self):
+        """A UnitTable holding the units of this turn in numpy arrays, for vectorized queries.
+        Built on first access and kept in sync with attempt_spawn and attempt_upgrade. Requires numpy.
+        """
+        if self._unit_table is None:
+            from .unit_table import UnitTable
+
+            table = UnitTable.from_raw_units(self.registry, self._raw_units)
+            for unit_type, x, y in self._build_stack + self._deploy_stack:
+                if unit_type == self.UPGRADE:
+                    table.upgrade([x, y])
+                elif unit_type != self.REMOVE:
+                    table.add(unit_type, [x, y], 0)
+            if self._journal is not None:
+                # Rolling back past this point drops the table, which holds the actions taken so far
+                self._journal.append(("unit_table", None))
+            self._unit_table = table
+        return self._unit_table
+
+    def __writable_unit_table(self):
+        if self._unit_table_shared and self._journal is not None:
+            self._journal.append(("unit_table", self._unit_table))
+        return self.__unshared_unit_table()
+
+    def __add_to_unit_table(self, unit_type, x, y):
+        table = self.__writable_unit_table()
+        if self._journal is not None:
+            self._journal.append(("unit_table_size", len(table)))
+        table.add(unit_type, [x, y], 0)
+
+    def __upgrade_in_unit_table(self, x, y):
+        table = self.__writable_unit_table()
+        if self._journal is not None:
+            self._journal.append(("unit_table_row", table.save_row([x, y])))
+        table.upgrade([x, y])
+
+    def __save_location(self, x, y):
+        if self._journal is not None:
+            self._journal.append(("location", self.game_map.save_location([x, y])))
+
+    def __push_action(self, stack, action):
+        if self._journal is not None:
+            self._journal.append(("stack", stack, len(stack)))
+        stack.append(action)
+
+    def savepoint(self):
+        """Starts recording every change made by attempt_spawn, attempt_upgrade and attempt_remove,
+        so they can be undone with rollback. Savepoints can be nested.
+
+        Returns:
+            A savepoint to pass to rollback or release
+
+        """
+        if self._journal is None:
+            self._journal = []
+        return len(self._journal)
+
+    def rollback(self, savepoint):
+        """Undoes every change made since the given savepoint. The savepoint stays valid.
+        Takes time proportional to the number of changes undone.
+
+        Args:
+            savepoint: A value returned by savepoint
+
+        """
+        journal = self._journal
+        while journal is not None and len(journal) > savepoint:
+            entry = journal.pop()
+            kind = entry[0]
+            if kind == "resource":
+                self._player_resources[entry[1]][entry[2]] = entry[3]
+            elif kind == "stack":
+                del entry[1][entry[2] :]
+            elif kind == "location":
+                self.game_map.restore_location(entry[1])
+            elif kind == "unit_table":
+                self._unit_table = entry[1]
+                self._unit_table_shared = entry[1] is not None
+            elif kind == "unit_table_size":
+                self.__unshared_unit_table().truncate(entry[1])
+            elif kind == "unit_table_row":
+                self.__unshared_unit_table().restore_row(entry[1])
+
+    def __unshared_unit_table(self):
+        """Helper function for rollback. Copies the unit table, without recording it, if a fork shares it."""
+        if self._unit_table_shared:
+            self._unit_table = self._unit_table.copy()
+            self._unit_table_shared = False
+        return self._unit_table
+
+    def release(self, savepoint):
+        """Keeps the changes made since the given savepoint.
+        Releasing the first savepoint stops recording changes.
+
+        Args:
+            savepoint: A value returned by savepoint
+
+        """
+        if savepoint == 0:
+            self._journal = None
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """Context manager around savepoint. Changes made inside the block are kept if it completes
+        and rolled back if it raises. Call rollback with the yielded savepoint to discard them explicitly.
+        """
+        savepoint = self.savepoint()
+        try:
+            yield savepoint
+        except BaseException:
+            self.rollback(savepoint)
+            self.release(savepoint)
+            raise
+        self.release(savepoint)
+
+    def fork(self):
+        """Creates an independent copy of this GameState, for trying out actions and throwing them away.
+
+        The fork shares everything that is not modified (config, unit statistics, untouched map locations)
+        with this GameState, so its cost does not depend on the number of units on the board.
+        Resources and the build and deploy stacks are copied, and map locations are copied when either state changes them.
+
+        Returns:
+            A new GameState
+
+        """
+        child = copy.copy(self)
+        child.game_map = self.game_map.fork()
+        child._shortest_path_finder = ShortestPathFinder()
+        child._build_stack = list(self._build_stack)
+        child._deploy_stack = list(self._deploy_stack)
+        child._player_resources = [
+            dict(resources) for resources in self._player_resources
+        ]
+        child._journal = None
+        if self._unit_table is not None:
+            self._unit_table_shared = True
+            child._unit_table_shared = True
+        return child
+
+    def __defer_parsed_units(self):
+        """
+        Helper function for __parse_state in lazy mode. Groups the raw units by location
+        and hands them to the map, which creates the GameUnits when a location is accessed.
+        """
+        typedef = self.config.get("unitInformation")
+        locations = {}
+        structures = set()
+        for player_number, units in enumerate(self._raw_units):
+            for i, unit_types in enumerate(units):
+                unit_type = typedef[i].get("shorthand")
+                for uinfo in unit_types:
+                    x, y = map(int, uinfo[:2])
+                    # This depends on RM and UP always being the last types to be processed
+                    if unit_type == self.REMOVE or unit_type == self.UPGRADE:
+                        if (x, y) in structures:
+                            for entry in locations[x, y]:
+                                if self.registry.is_stationary(entry[0]):
+                                    entry[3 if unit_type == self.UPGRADE else 4] = True
+                                    break
+                        continue
+                    locations.setdefault((x, y), []).append(
+                        [unit_type, player_number, float(uinfo[2]), False, False]
+                    )
+                    if self.registry.is_stationary(unit_type):
+                        structures.add((x, y))
+        for location, entries in locations.items():
+            self.game_map.defer_units(location, entries, location in structures)
+
     def __create_parsed_units(self, units, player_number):
         """
         Helper function for __parse_state to add units to the map.
@@ -142,11 +347,11 @@ class GameState:
                 x, y = map(int, [sx, sy])
                 hp = float(shp)
                 # This depends on RM and UP always being the last types to be processed
-                if unit_type == REMOVE:
+                if unit_type == self.REMOVE:
                     # Quick fix will deploy engine fix soon
                     if self.contains_stationary_unit([x, y]):
                         self.game_map[x, y][0].pending_removal = True
-                elif unit_type == UPGRADE:
+                elif unit_type == self.UPGRADE:
                     if self.contains_stationary_unit([x, y]):
                         self.game_map[x, y][0].upgrade()
                 else:
@@ -154,7 +359,7 @@ class GameState:
                     self.game_map[x, y].append(unit)
 
     def __resource_required(self, unit_type):
-        return self.SP if is_stationary(unit_type) else self.MP
+        return self.SP if self.registry.is_stationary(unit_type) else self.MP
 
     def __set_resource(self, resource_type, amount, player_index=0):
         """
@@ -167,26 +372,30 @@ class GameState:
         elif resource_type == self.SP:
             resource_key = "SP"
         held_resource = self.get_resource(resource_type, player_index)
+        if self._journal is not None:
+            self._journal.append(
+                ("resource", player_index, resource_key, held_resource)
+            )
         self._player_resources[player_index][resource_key] = held_resource + amount
 
     def _invalid_player_index(self, index):
         self.warn(
-            "Invalid player index {} passed, player index should always be 0 (yourself) or 1 (your opponent)".format(
-                index
-            )
+            "Invalid player index {} passed, player index should always be 0 (yourself) or 1 (your opponent)",
+            index,
         )
 
     def _invalid_unit(self, unit):
-        self.warn("Invalid unit {}".format(unit))
+        self.warn("Invalid unit {}", unit)
 
     def submit_turn(self):
         """Submit and end your turn.
         Must be called at the end of your turn or the algo will hang.
         """
-        build_string = json.dumps(self._build_stack)
-        deploy_string = json.dumps(self._deploy_stack)
-        send_command(build_string)
-        send_command(deploy_string)
+        with timing.span("submit_turn"):
+            build_string = json.dumps(self._build_stack)
+            deploy_string = json.dumps(self._deploy_stack)
+            send_command(build_string)
+            send_command(deploy_string)
 
     def get_resource(self, resource_type, player_index=0):
         """Gets a players resources
@@ -204,9 +413,7 @@ class GameState:
             return
         if not resource_type == self.MP and not resource_type == self.SP:
             self.warn(
-                "Invalid resource_type '{}'. Please use MP (0) or SP (1)".format(
-                    resource_type
-                )
+                "Invalid resource_type '{}'. Please use MP (0) or SP (1)", resource_type
             )
             return
 
@@ -246,21 +453,21 @@ class GameState:
             The number of units affordable of the given unit_type.
 
         """
-        if unit_type not in ALL_UNITS:
+        if unit_type not in self.ALL_UNITS:
             self._invalid_unit(unit_type)
             return
 
         costs = self.type_cost(unit_type)
         player_held = self.get_resources()
-        if costs[MP] > 0 and costs[SP] > 0:
+        if costs[self.MP] > 0 and costs[self.SP] > 0:
             return min(
-                math.floor(player_held[SP] / costs[SP]),
-                math.floor(player_held[MP] / costs[MP]),
+                math.floor(player_held[self.SP] / costs[self.SP]),
+                math.floor(player_held[self.MP] / costs[self.MP]),
             )
-        elif costs[MP] > 0:
-            return math.floor(player_held[MP] / costs[MP])
-        elif costs[SP] > 0:
-            return math.floor(player_held[SP] / costs[SP])
+        elif costs[self.MP] > 0:
+            return math.floor(player_held[self.MP] / costs[self.MP])
+        elif costs[self.SP] > 0:
+            return math.floor(player_held[self.SP] / costs[self.SP])
         else:
             self.warn(
                 "Invalid costs for unit, cost is 0 for both resources, returning 0"
@@ -282,32 +489,75 @@ class GameState:
 
         if turns_in_future < 1 or turns_in_future > 99:
             self.warn(
-                "Invalid turns in future used ({}). Turns in future should be between 1 and 99".format(
-                    turns_in_future
-                )
+                "Invalid turns in future used ({}). Turns in future should be between 1 and 99",
+                turns_in_future,
             )
         if not player_index == 1 and not player_index == 0:
             self._invalid_player_index(player_index)
         if type(current_MP) == int and current_MP < 0:
             self.warn(
-                "Invalid current MP ({}). Current MP cannot be negative.".format(
-                    current_MP
-                )
+                "Invalid current MP ({}). Current MP cannot be negative.", current_MP
             )
 
         MP = self.get_resource(self.MP, player_index) if not current_MP else current_MP
-        for increment in range(1, turns_in_future + 1):
-            current_turn = self.turn_number + increment
-            MP *= 1 - self.config["resources"]["bitDecayPerRound"]
-            MP_per_round = self.config["resources"]["bitsPerRound"]
-            MP_ramp_ups = (
-                current_turn // self.config["resources"]["turnIntervalForBitSchedule"]
-            )
-            MP_per_round_growth = self.config["resources"]["bitGrowthRate"]
-            MP_gained = MP_per_round + (MP_per_round_growth * MP_ramp_ups)
-            MP += MP_gained
-            MP = round(MP, 1)
-        return MP
+        trajectory = self.__project_MP(MP, turns_in_future)
+        return trajectory[-1] if trajectory else MP
+
+    def __project_MP(self, MP, turns_in_future):
+        """
+        Helper function for project_future_MP and project_MP_trajectory.
+        Returns the MP held after each of the next turns_in_future turns, rounded like the game engine.
+        """
+        registry = self.registry
+        decay_factor = registry.MP_decay_factor
+        trajectory = []
+        for turn in range(self.turn_number + 1, self.turn_number + turns_in_future + 1):
+            MP = round(MP * decay_factor + registry.get_MP_income(turn), 1)
+            trajectory.append(MP)
+        return trajectory
+
+    def project_MP_trajectory(self, turns_in_future, current_MP=None):
+        """Predicts the MP of both players on every turn up to a future turn, in one call
+
+        Args:
+            turns_in_future: The number of turns in the future to predict
+            current_MP: If given, a [player 0, player 1] list of values to use instead of the current MP of each player
+
+        Returns:
+            A list with one trajectory per player, where trajectory[i] is the MP that player will have after i + 1 turns
+
+        """
+        trajectories = []
+        for player_index in (0, 1):
+            MP = self.get_resource(self.MP, player_index)
+            if current_MP is not None and current_MP[player_index]:
+                MP = current_MP[player_index]
+            trajectories.append(self.__project_MP(MP, turns_in_future))
+        return trajectories
+
+    def project_SP_trajectory(self, turns_in_future, current_SP=None):
+        """Predicts the SP of both players on every turn up to a future turn, assuming nothing is spent or refunded
+
+        Args:
+            turns_in_future: The number of turns in the future to predict
+            current_SP: If given, a [player 0, player 1] list of values to use instead of the current SP of each player
+
+        Returns:
+            A list with one trajectory per player, where trajectory[i] is the SP that player will have after i + 1 turns
+
+        """
+        income = self.registry.cores_per_round
+        trajectories = []
+        for player_index in (0, 1):
+            SP = self.get_resource(self.SP, player_index)
+            if current_SP is not None:
+                SP = current_SP[player_index]
+            trajectory = []
+            for _ in range(turns_in_future):
+                SP = round(SP + income, 1)
+                trajectory.append(SP)
+            trajectories.append(trajectory)
+        return trajectories
 
     def type_cost(self, unit_type, upgrade=False):
         """Gets the cost of a unit based on its type
@@ -319,19 +569,13 @@ class GameState:
             The units costs as a list [SP, MP]
 
         """
-        if unit_type == REMOVE:
+        if unit_type == self.REMOVE:
             self._invalid_unit(unit_type)
             return
 
-        unit_def = self.config["unitInformation"][UNIT_TYPE_TO_INDEX[unit_type]]
-        cost_base = [unit_def.get("cost1", 0), unit_def.get("cost2", 0)]
-        if upgrade:
-            return [
-                unit_def.get("upgrade", {}).get("cost1", cost_base[SP]),
-                unit_def.get("upgrade", {}).get("cost2", cost_base[MP]),
-            ]
-
-        return cost_base
+        if upgrade and unit_type in self.registry.upgrade_costs:
+            return list(self.registry.upgrade_costs[unit_type])
+        return list(self.registry.costs[unit_type])
 
     def can_spawn(self, unit_type, location, num=1):
         """Check if we can spawn a unit at a location.
@@ -349,29 +593,25 @@ class GameState:
             True if we can spawn the unit(s)
 
         """
-        if unit_type not in ALL_UNITS:
+        if unit_type not in self.ALL_UNITS:
             self._invalid_unit(unit_type)
             return
 
         if not self.game_map.in_arena_bounds(location):
-            if self.enable_warnings:
-                self.warn(
-                    "Could not spawn {} at location {}. Location invalid.".format(
-                        unit_type, location
-                    )
-                )
+            self.warn(
+                "Could not spawn {} at location {}. Location invalid.",
+                unit_type,
+                location,
+            )
             return False
 
         affordable = self.number_affordable(unit_type) >= num
-        stationary = is_stationary(unit_type)
+        stationary = self.registry.is_stationary(unit_type)
         blocked = self.contains_stationary_unit(location) or (
             stationary and len(self.game_map[location[0], location[1]]) > 0
         )
         correct_territory = location[1] < self.HALF_ARENA
-        on_edge = location in (
-            self.game_map.get_edge_locations(self.game_map.BOTTOM_LEFT)
-            + self.game_map.get_edge_locations(self.game_map.BOTTOM_RIGHT)
-        )
+        on_edge = (location[0], location[1]) in self.registry.my_edge_locations
 
         if self.enable_warnings:
             fail_reason = ""
@@ -387,10 +627,16 @@ class GameState:
                 )
             if len(fail_reason) > 0:
                 self.warn(
-                    "Could not spawn {} at location {}.{}".format(
-                        unit_type, location, fail_reason
-                    )
+                    "Could not spawn {} at location {}.{}",
+                    unit_type,
+                    location,
+                    fail_reason,
                 )
+        elif not (affordable and correct_territory and not blocked) or not (
+            stationary or on_edge
+        ):
+            # The fail reason is not worth building, but the suppressed warning is still counted
+            log.get_log().count_suppressed()
 
         return (
             affordable
@@ -400,6 +646,140 @@ class GameState:
             and (not stationary or num == 1)
         )
 
+    def get_spawn_mask(self, unit_type):
+        """Gets every location where a unit of the given type could be spawned right now, ignoring resources.
+        Structures need an empty location on your side of the board, mobile units need one of your edges without a structure.
+        The masks are computed once and reused until the map changes.
+
+        Args:
+            unit_type: The type of the unit
+
+        Returns:
+            A frozenset of (x, y) tuples
+
+        """
+        game_map = self.game_map
+        if self._spawn_masks is None or self._spawn_masks[0] != game_map.version:
+            free = []
+            unblocked_edges = []
+            for location in self.registry.my_side_locations:
+                occupancy = game_map.occupancy(location)
+                if occupancy == 0:
+                    free.append(location)
+                if (
+                    occupancy != game_map.OCCUPIED_STRUCTURE
+                    and location in self.registry.my_edge_locations
+                ):
+                    unblocked_edges.append(location)
+            self._spawn_masks = (
+                game_map.version,
+                frozenset(free),
+                frozenset(unblocked_edges),
+            )
+        if self.registry.is_stationary(unit_type):
+            return self._spawn_masks[1]
+        return self._spawn_masks[2]
+
+    def __plan_spawns(self, unit_type, locations, counts):
+        """
+        Helper function for can_spawn_many and attempt_spawn_many. Plans the whole batch in one pass instead of calling can_spawn per unit.
+        Legality is a membership test against the cached spawn mask, and resources go to the locations in order through a running total.
+        This is plain Python over sets and lists: numpy stays optional, so nothing here is vectorized in the numpy sense.
+        """
+        if isinstance(counts, int):
+            counts = [counts] * len(locations)
+        mask = self.get_spawn_mask(unit_type)
+        keys = [(location[0], location[1]) for location in locations]
+        wanted = [
+            count if count >= 1 and key in mask else 0
+            for key, count in zip(keys, counts)
+        ]
+        if self.registry.is_stationary(unit_type):
+            # At most one structure per location, where it is first asked for
+            first = {}
+            for index, (key, count) in enumerate(zip(keys, wanted)):
+                if count:
+                    first.setdefault(key, index)
+            wanted = [
+                1 if count and first[key] == index else 0
+                for index, (key, count) in enumerate(zip(keys, wanted))
+            ]
+        # Each location gets what is left of the affordable units after the locations before it
+        affordable = self.number_affordable(unit_type)
+        granted = [
+            min(total, affordable) for total in itertools.accumulate(wanted, initial=0)
+        ]
+        planned = [after - before for before, after in zip(granted, granted[1:])]
+        return planned, counts
+
+    def can_spawn_many(self, unit_type, locations, counts=1):
+        """Checks a whole spawn plan at once.
+        Locations are considered in order, so resources needed by earlier locations are not available to later ones,
+        and a structure location that appears twice is blocked the second time.
+
+        Args:
+            unit_type: The type of the units
+            locations: A list of locations
+            counts: The number of units wanted at each location, as a single number or a list matching locations
+
+        Returns:
+            A list of booleans, True where all of the requested units can be spawned
+
+        """
+        if unit_type not in self.ALL_UNITS:
+            self._invalid_unit(unit_type)
+            return
+        planned, counts = self.__plan_spawns(unit_type, locations, counts)
+        return [
+            planned_count > 0 and planned_count == count
+            for planned_count, count in zip(planned, counts)
+        ]
+
+    def attempt_spawn_many(self, unit_type, locations, counts=1):
+        """Spawns units at many locations, validating the plan and paying for it in one step.
+        Each location gets as many of its units as can be afforded, and at most one structure, like attempt_spawn.
+
+        Args:
+            unit_type: The type of the units
+            locations: A list of locations
+            counts: The number of units wanted at each location, as a single number or a list matching locations
+
+        Returns:
+            A list with the number of units spawned at each location
+
+        """
+        if unit_type not in self.ALL_UNITS:
+            self._invalid_unit(unit_type)
+            return
+        planned, counts = self.__plan_spawns(unit_type, locations, counts)
+        total = sum(planned)
+        requested = sum(count for count in counts if count > 0)
+        if total < requested:
+            self.warn(
+                "Could only spawn {} of {} {} units.", total, requested, unit_type
+            )
+        if total == 0:
+            return planned
+
+        costs = self.type_cost(unit_type)
+        self.__set_resource(self.SP, 0 - costs[self.SP] * total)
+        self.__set_resource(self.MP, 0 - costs[self.MP] * total)
+        if self.registry.is_stationary(unit_type):
+            stack = self._build_stack
+        else:
+            stack = self._deploy_stack
+        for location, count in zip(locations, planned):
+            if count == 0:
+                continue
+            x, y = map(int, location)
+            self.__save_location(x, y)
+            for _ in range(count):
+                self.game_map.add_unit(unit_type, [x, y], 0)
+                if self._unit_table is not None:
+                    self.__add_to_unit_table(unit_type, x, y)
+                self.__push_action(stack, (unit_type, x, y))
+        return planned
+
     def attempt_spawn(self, unit_type, locations, num=1):
         """Attempts to spawn new units with the type given in the given locations.
 
@@ -412,11 +792,11 @@ class GameState:
             The number of units successfully spawned
 
         """
-        if unit_type not in ALL_UNITS:
+        if unit_type not in self.ALL_UNITS:
             self._invalid_unit(unit_type)
             return
         if num < 1:
-            self.warn("Attempted to spawn fewer than one units! ({})".format(num))
+            self.warn("Attempted to spawn fewer than one units! ({})", num)
             return
 
         if type(locations[0]) == int:
@@ -427,13 +807,16 @@ class GameState:
                 if self.can_spawn(unit_type, location, 1):
                     x, y = map(int, location)
                     costs = self.type_cost(unit_type)
-                    self.__set_resource(SP, 0 - costs[SP])
-                    self.__set_resource(MP, 0 - costs[MP])
+                    self.__set_resource(self.SP, 0 - costs[self.SP])
+                    self.__set_resource(self.MP, 0 - costs[self.MP])
+                    self.__save_location(x, y)
                     self.game_map.add_unit(unit_type, location, 0)
-                    if is_stationary(unit_type):
-                        self._build_stack.append((unit_type, x, y))
+                    if self._unit_table is not None:
+                        self.__add_to_unit_table(unit_type, x, y)
+                    if self.registry.is_stationary(unit_type):
+                        self.__push_action(self._build_stack, (unit_type, x, y))
                     else:
-                        self._deploy_stack.append((unit_type, x, y))
+                        self.__push_action(self._deploy_stack, (unit_type, x, y))
                     spawned_units += 1
                 else:
                     break
@@ -457,13 +840,12 @@ class GameState:
                 location
             ):
                 x, y = map(int, location)
-                self._build_stack.append((REMOVE, x, y))
+                self.__push_action(self._build_stack, (self.REMOVE, x, y))
                 removed_units += 1
             else:
                 self.warn(
-                    "Could not remove a unit from {}. Location has no structures or is enemy territory.".format(
-                        location
-                    )
+                    "Could not remove a unit from {}. Location has no structures or is enemy territory.",
+                    location,
                 )
         return removed_units
 
@@ -493,24 +875,28 @@ class GameState:
 
                 if (
                     not existing_unit.upgraded
-                    and self.config["unitInformation"][
-                        UNIT_TYPE_TO_INDEX[existing_unit.unit_type]
-                    ].get("upgrade", None)
-                    is not None
+                    and existing_unit.unit_type in self.registry.upgrade_costs
                 ):
                     costs = self.type_cost(existing_unit.unit_type, True)
                     resources = self.get_resources()
-                    if resources[SP] >= costs[SP] and resources[MP] >= costs[MP]:
-                        self.__set_resource(SP, 0 - costs[SP])
-                        self.__set_resource(MP, 0 - costs[MP])
-                        existing_unit.upgrade()
-                        self._build_stack.append((UPGRADE, x, y))
+                    if (
+                        resources[self.SP] >= costs[self.SP]
+                        and resources[self.MP] >= costs[self.MP]
+                    ):
+                        self.__set_resource(self.SP, 0 - costs[self.SP])
+                        self.__set_resource(self.MP, 0 - costs[self.MP])
+                        self.__save_location(x, y)
+                        for unit in self.game_map.get_writable_units([x, y]):
+                            if unit.stationary:
+                                unit.upgrade()
+                        if self._unit_table is not None:
+                            self.__upgrade_in_unit_table(x, y)
+                        self.__push_action(self._build_stack, (self.UPGRADE, x, y))
                         spawned_units += 1
             else:
                 self.warn(
-                    "Could not upgrade a unit from {}. Location has no structures or is enemy territory.".format(
-                        location
-                    )
+                    "Could not upgrade a unit from {}. Location has no structures or is enemy territory.",
+                    location,
                 )
         return spawned_units
 
@@ -552,9 +938,8 @@ class GameState:
         """
         if self.contains_stationary_unit(start_location):
             self.warn(
-                "Attempted to perform pathing from blocked starting location {}".format(
-                    start_location
-                )
+                "Attempted to perform pathing from blocked starting location {}",
+                start_location,
             )
             return
 
@@ -580,16 +965,26 @@ class GameState:
             self.warn("Checked for stationary unit outside of arena bounds")
             return False
         x, y = map(int, location)
+        if (
+            self.lazy
+            and self.game_map.deferred_occupancy([x, y])
+            == self.game_map.OCCUPIED_MOBILE
+        ):
+            return False
         for unit in self.game_map[x, y]:
             if unit.stationary:
                 return unit
         return False
 
-    def warn(self, message):
-        """Used internally by game_state to print warnings"""
+    def warn(self, message, *args):
+        """Used internally by game_state to print warnings.
+        The args are only formatted into the message if warnings are enabled, and suppressed warnings are counted by the log.
+        """
 
         if self.enable_warnings:
-            debug_write(message)
+            log.warning(message, *args)
+        else:
+            log.get_log().count_suppressed()
 
     def suppress_warnings(self, suppress):
         """Suppress all warnings
@@ -602,6 +997,37 @@ class GameState:
         self.enable_warnings = not suppress
         self.game_map.enable_warnings = not suppress
 
+    def get_counters(self):
+        """Gets how much work gamelib did since the counters were last reset, which AlgoCore does before every turn.
+        Counters are off by default. Pass hot_path_counters=True to AlgoCore.start, set GAMELIB_COUNTERS, or call counters.enable().
+        Counts include navigate_multiple_endpoints calls, the nodes expanded by idealness_search and validate,
+        get_locations_in_range calls and the cells they scanned, get_attackers calls and GameUnit objects created.
+        Caches count their lookups as name.hits and name.misses, see get_hit_rate.
+
+        Returns:
+            A dict mapping counter names to values
+
+        """
+        return counters.get_counts()
+
+    def get_hit_rate(self, name):
+        """
+        Args:
+            name: The name of a cache, for example "simulator.paths" or "range_stencils"
+
+        Returns:
+            The fraction of lookups in that cache that were hits since the counters were last reset, or None if there were none
+        """
+        return counters.get_hit_rate(name)
+
+    def reset_counters(self):
+        """Sets every counter back to 0
+
+        Returns:
+            The counters as they were before the reset
+        """
+        return counters.reset()
+
     def get_target(self, attacking_unit):
         """Returns target of given unit based on current map of the game board.
         A Unit can often have many other units in range, and Units that attack do so once each frame.
@@ -619,9 +1045,8 @@ class GameState:
 
         if not isinstance(attacking_unit, GameUnit):
             self.warn(
-                "Passed a {} to get_target as attacking_unit. Expected a GameUnit.".format(
-                    type(attacking_unit)
-                )
+                "Passed a {} to get_target as attacking_unit. Expected a GameUnit.",
+                type(attacking_unit),
             )
             return
 
@@ -640,10 +1065,13 @@ class GameState:
             for unit in self.game_map[location]:
                 if (
                     unit.player_index == attacking_unit.player_index
-                    or (attacking_unit.damage_f == 0 and is_stationary(unit.unit_type))
+                    or (
+                        attacking_unit.damage_f == 0
+                        and self.registry.is_stationary(unit.unit_type)
+                    )
                     or (
                         attacking_unit.damage_i == 0
-                        and not (is_stationary(unit.unit_type))
+                        and not (self.registry.is_stationary(unit.unit_type))
                     )
                 ):
                     continue
@@ -696,6 +1124,75 @@ class GameState:
                     target_x_distance = unit_x_distance
         return target
 
+    def get_targets(self, attackers=None, units=None):
+        """Resolves the targets of many units at once, following the same priority as get_target.
+        Candidate units are bucketed by owner, category and location once, and each attacker
+        scans a precomputed range stencil outward from its own location.
+
+        Args:
+            attackers: A list of GameUnits, or None for every unit in units that can deal damage
+            units: The units that can be targeted, or None for every unit on the board
+
+        Returns:
+            A list of (attacker, target) tuples in the order of attackers, where target is None if nothing is in range
+
+        """
+        buckets = [[{}, {}], [{}, {}]]
+        if units is None:
+            units = self.game_map.get_all_units()
+        for unit in units:
+            buckets[unit.player_index][unit.stationary].setdefault(
+                (unit.x, unit.y), []
+            ).append(unit)
+        if attackers is None:
+            attackers = [
+                unit for unit in units if unit.damage_f > 0 or unit.damage_i > 0
+            ]
+
+        registry = self.registry
+        center = self.HALF_ARENA - 0.5
+        targets = []
+        for attacker in attackers:
+            enemy_buckets = buckets[1 - attacker.player_index]
+            stencil = registry.get_range_stencil(attacker.attackRange)
+            target = None
+            if attacker.damage_i > 0:
+                target = self.__best_target(
+                    enemy_buckets[False], stencil, attacker, center
+                )
+            if target is None and attacker.damage_f > 0:
+                target = self.__best_target(
+                    enemy_buckets[True], stencil, attacker, center
+                )
+            targets.append((attacker, target))
+        return targets
+
+    def __best_target(self, bucket, stencil, attacker, center):
+        """
+        Helper function for get_targets. Finds the best target among units of one category.
+        Ties are kept by the first unit seen in get_locations_in_range order, as in get_target.
+        """
+        if not bucket:
+            return None
+        x, y = attacker.x, attacker.y
+        y_sign = 1 if attacker.player_index == 0 else -1
+        target = None
+        target_key = None
+        target_distance = None
+        for distance, dx, dy in stencil:
+            if target is not None and distance > target_distance:
+                break
+            units = bucket.get((x + dx, y + dy))
+            if units is None:
+                continue
+            for unit in units:
+                key = (unit.health, y_sign * unit.y, -abs(center - unit.x))
+                if target is None or key < target_key:
+                    target = unit
+                    target_key = key
+                    target_distance = distance
+        return target
+
     def get_attackers(self, location, player_index):
         """Gets the stationary units threatening a given location
 
@@ -708,19 +1205,17 @@ class GameState:
 
         """
 
+        counters.increment("get_attackers")
         if not player_index == 0 and not player_index == 1:
             self._invalid_player_index(player_index)
         if not self.game_map.in_arena_bounds(location):
-            self.warn("Location {} is not in the arena bounds.".format(location))
+            self.warn("Location {} is not in the arena bounds.", location)
 
         attackers = []
         """
         Get locations in the range of TURRET units
         """
-        max_range = 0
-        for unit in self.config["unitInformation"]:
-            if unit.get("attackRange", 0) >= max_range:
-                max_range = unit.get("attackRange", 0)
+        max_range = self.registry.max_attack_range
         possible_locations = self.game_map.get_locations_in_range(location, max_range)
         for location_unit in possible_locations:
             for unit in self.game_map[location_unit]:
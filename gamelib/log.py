@@ -0,0 +1,221 @@
+import collections
+import os
+import threading
+
+from .util import get_debug_stream, set_debug_stream
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+LEVEL_NAMES = {DEBUG: "DEBUG", INFO: "INFO", WARNING: "WARNING", ERROR: "ERROR"}
+
+# The Log installed in each thread, if any
+_local = threading.local()
+
+
+class _BufferStream:
+    """Stands in for the debug stream while a buffered Log is installed, so debug_write output is buffered too"""
+
+    def __init__(self, log):
+        self.__log = log
+
+    def write(self, text):
+        self.__log.append(text)
+
+    def flush(self):
+        pass
+
+
+class Log:
+    """A leveled debug log for one algo.
+
+    Messages below the level are not formatted, only counted, and so are warnings that a GameState
+    was told to suppress. A buffered log keeps messages in a ring buffer instead of writing and flushing
+    stderr for each one. It is flushed by AlgoCore at turn boundaries, by a background thread every
+    flush_interval seconds if one is given, and when it is closed. While it is installed, debug_write
+    output goes through the same buffer so everything stays in order.
+
+    Attributes :
+        * level (int): Messages below this level, one of DEBUG, INFO, WARNING or ERROR, are counted but not written
+        * capacity (int): The number of messages buffered, 0 to write every message at once
+        * flush_interval (float): If given, the seconds between flushes from a background thread
+        * suppressed (Counter): Maps each level to the number of messages of that level that were not written
+        * dropped (int): The number of messages lost because the buffer was full, since the last flush
+
+    """
+
+    def __init__(self, level=WARNING, capacity=1024, flush_interval=None):
+        self.level = level
+        self.capacity = capacity
+        self.flush_interval = flush_interval
+        self.suppressed = collections.Counter()
+        self.dropped = 0
+        self.__buffer = collections.deque(maxlen=capacity or None)
+        self.__stream = None
+        self.__previous = None
+        self.__previous_stream = None
+        self.__installed = False
+        self.__stopped = threading.Event()
+        self.__flusher = None
+
+    @classmethod
+    def from_environment(cls, environ=None):
+        """Creates a log from environment variables, or returns None if none of them is set
+
+        Variables :
+            * GAMELIB_LOG_LEVEL: DEBUG, INFO, WARNING or ERROR, WARNING by default
+            * GAMELIB_LOG_BUFFER: The capacity of the buffer, 1024 by default, 0 to write every message at once
+            * GAMELIB_LOG_FLUSH_INTERVAL: The seconds between flushes from a background thread
+
+        """
+        environ = os.environ if environ is None else environ
+        level = environ.get("GAMELIB_LOG_LEVEL")
+        capacity = environ.get("GAMELIB_LOG_BUFFER")
+        interval = environ.get("GAMELIB_LOG_FLUSH_INTERVAL")
+        if level is None and capacity is None and interval is None:
+            return None
+        levels = {name: number for number, name in LEVEL_NAMES.items()}
+        return cls(
+            levels[(level or "WARNING").upper()],
+            1024 if capacity is None else int(capacity),
+            float(interval) if interval else None,
+        )
+
+    def install(self):
+        """Makes this the log of the calling thread, used by the module level functions, GameState and GameMap"""
+        self.__previous = getattr(_local, "log", None)
+        _local.log = self
+        self.__stream = get_debug_stream()
+        if self.capacity:
+            self.__previous_stream = set_debug_stream(_BufferStream(self))
+            if self.flush_interval:
+                self.__stopped.clear()
+                self.__flusher = threading.Thread(target=self.__flush_loop, daemon=True)
+                self.__flusher.start()
+        self.__installed = True
+        return self
+
+    def close(self):
+        """Writes the buffered messages and a count of the suppressed ones, then uninstalls the log"""
+        if not self.__installed:
+            return
+        if self.__flusher is not None:
+            self.__stopped.set()
+            self.__flusher.join()
+            self.__flusher = None
+        if self.capacity:
+            set_debug_stream(self.__previous_stream)
+        self.flush()
+        summary = self.get_suppressed_summary()
+        if summary:
+            self.__write(summary + "\n")
+        _local.log = self.__previous
+        self.__installed = False
+
+    def __flush_loop(self):
+        while not self.__stopped.wait(self.flush_interval):
+            self.flush()
+
+    def log(self, level, message, *args):
+        """Logs a message. It is only formatted, with message.format(*args), if level is enabled.
+
+        Args:
+            level: DEBUG, INFO, WARNING or ERROR
+            message: The message, with {} fields for args
+            args: Values formatted into the message
+
+        """
+        if level < self.level:
+            self.suppressed[level] += 1
+            return
+        if args:
+            message = message.format(*args)
+        self.append(str(message).strip() + "\n")
+
+    def count_suppressed(self, level=WARNING):
+        """Counts a message that was suppressed before reaching the log, such as a warning of a GameState with warnings suppressed"""
+        self.suppressed[level] += 1
+
+    def append(self, text):
+        """Adds a line of text, ending with a newline, to the buffer, or writes it at once if the log is not buffered"""
+        if not self.capacity:
+            self.__write(text)
+            return
+        if len(self.__buffer) == self.capacity:
+            self.dropped += 1
+        self.__buffer.append(text)
+
+    def flush(self):
+        """Writes and flushes everything buffered in a single write"""
+        buffer = self.__buffer
+        lines = []
+        try:
+            while True:
+                lines.append(buffer.popleft())
+        except IndexError:
+            pass
+        if self.dropped:
+            lines.insert(
+                0,
+                "{} log messages were dropped, the buffer was full\n".format(
+                    self.dropped
+                ),
+            )
+            self.dropped = 0
+        if lines:
+            self.__write("".join(lines))
+
+    def __write(self, text):
+        stream = self.__stream if self.__installed else get_debug_stream()
+        stream.write(text)
+        stream.flush()
+
+    def get_suppressed_summary(self):
+        """
+        Returns:
+            A line counting the suppressed messages of each level, or None if there were none
+        """
+        if not self.suppressed:
+            return None
+        return "Suppressed log messages: " + ", ".join(
+            "{} {}".format(count, LEVEL_NAMES.get(level, level))
+            for level, count in sorted(self.suppressed.items(), reverse=True)
+        )
+
+
+_DEFAULT = Log(WARNING, capacity=0)
+
+
+def get_log():
+    """
+    Returns:
+        The Log installed in the calling thread, or a shared unbuffered log writing warnings and errors
+    """
+    return getattr(_local, "log", None) or _DEFAULT
+
+
+def log(level, message, *args):
+    """Logs a message to the log of the calling thread, see Log.log"""
+    get_log().log(level, message, *args)
+
+
+def debug(message, *args):
+    get_log().log(DEBUG, message, *args)
+
+
+def info(message, *args):
+    get_log().log(INFO, message, *args)
+
+
+def warning(message, *args):
+    get_log().log(WARNING, message, *args)
+
+
+def error(message, *args):
+    get_log().log(ERROR, message, *args)
+
+
+def flush():
+    """Flushes the log of the calling thread"""
+    get_log().flush()
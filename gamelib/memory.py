@@ -0,0 +1,164 @@
+import gc
+import os
+import tracemalloc
+
+from .navigation import Node
+from .unit import GameUnit
+from .util import debug_write
+
+_GAMELIB = os.path.dirname(os.path.abspath(__file__))
+# Allocations made by the tracker itself are left out of the reports
+_IGNORED = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, os.path.abspath(__file__)),
+)
+
+
+class TurnMemory:
+    """The memory used during one turn and the action phase that follows it
+
+    Attributes :
+        * turn_number (int): The turn
+        * peak (int): The most bytes traced at any point of the turn, above what was traced when it started
+        * net (int): The bytes traced when the turn ended minus the bytes traced when it started
+        * retained (list): (module, bytes) for the gamelib modules that held the most more memory at the end of the turn than at its start,
+          largest first. This is net retained growth: memory a module allocates and frees within the turn, such as pathfinding grids,
+          shows up in peak but not here, since tracemalloc only sees the allocations alive when a snapshot is taken.
+          Allocations are counted against the innermost gamelib frame that made them, or "other" if none did.
+        * live_units (int): The number of GameUnit objects alive when the turn ended
+        * live_nodes (int): The number of pathfinding Node objects alive when the turn ended
+
+    """
+
+    def __init__(self, turn_number, peak, net, retained, live_units, live_nodes):
+        self.turn_number = turn_number
+        self.peak = peak
+        self.net = net
+        self.retained = retained
+        self.live_units = live_units
+        self.live_nodes = live_nodes
+
+    def __str__(self):
+        parts = [
+            "memory turn {}: peak={:.1f}KB net={:+.1f}KB GameUnit={} Node={}".format(
+                self.turn_number,
+                self.peak / 1024,
+                self.net / 1024,
+                self.live_units,
+                self.live_nodes,
+            )
+        ]
+        parts += [
+            "retained {}={:+.1f}KB".format(module, size / 1024)
+            for module, size in self.retained
+        ]
+        return " ".join(parts)
+
+
+class MemoryTracker:
+    """Traces the memory allocated while an algo handles each turn, with tracemalloc.
+    AlgoCore.start creates one when the GAMELIB_MEMORY environment variable is set, or uses the one it is given.
+
+    Tracing slows allocations down a lot, so only use it to find and verify memory reductions,
+    never in a game that counts. A one line summary, see TurnMemory, is written after every turn.
+
+    Attributes :
+        * output (str): "stderr" to write the summaries with debug_write, or the path of a file to append them to
+        * top (int): The number of gamelib modules listed per turn, see TurnMemory.retained
+        * frames (int): The number of frames tracemalloc keeps per allocation, enough to reach the gamelib frame that caused it
+        * turns (list): The TurnMemory of every finished turn
+
+    """
+
+    def __init__(self, output="stderr", top=5, frames=10):
+        self.output = output
+        self.top = top
+        self.frames = frames
+        self.turns = []
+        self.__turn_number = None
+        self.__snapshot = None
+        self.__baseline = 0
+        self.__started_tracing = False
+
+    @classmethod
+    def from_environment(cls, environ=None):
+        """Creates a tracker writing to GAMELIB_MEMORY ("stderr" or a file path), or returns None if it is not set"""
+        environ = os.environ if environ is None else environ
+        output = environ.get("GAMELIB_MEMORY")
+        return cls(output) if output else None
+
+    def begin_turn(self, turn_number):
+        """Reports the previous turn and starts tracing a new one"""
+        self.end_turn()
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self.__started_tracing = True
+        self.__turn_number = turn_number
+        self.__snapshot = tracemalloc.take_snapshot().filter_traces(_IGNORED)
+        tracemalloc.reset_peak()
+        self.__baseline = tracemalloc.get_traced_memory()[0]
+
+    def end_turn(self):
+        """Reports the current turn, if any
+
+        Returns:
+            The TurnMemory of the turn, or None
+
+        """
+        if self.__turn_number is None:
+            return None
+        current, peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot().filter_traces(_IGNORED)
+        sizes = {}
+        for stat in snapshot.compare_to(self.__snapshot, "traceback"):
+            module = _get_module(stat.traceback)
+            sizes[module] = sizes.get(module, 0) + stat.size_diff
+        retained = sorted(sizes.items(), key=lambda item: item[1], reverse=True)
+        units, nodes = _count_live()
+        turn = TurnMemory(
+            self.__turn_number,
+            peak - self.__baseline,
+            current - self.__baseline,
+            retained[: self.top],
+            units,
+            nodes,
+        )
+        self.__turn_number = None
+        self.__snapshot = None
+        self.turns.append(turn)
+        if self.output == "stderr":
+            debug_write(str(turn))
+        else:
+            with open(self.output, "a") as file:
+                file.write(str(turn) + "\n")
+        return turn
+
+    def close(self):
+        """Reports the current turn and stops tracing, unless tracing was already on before the first turn"""
+        self.end_turn()
+        if self.__started_tracing:
+            tracemalloc.stop()
+            self.__started_tracing = False
+
+
+def _get_module(traceback):
+    """The gamelib file closest to an allocation in its traceback, or "other" """
+    for frame in reversed(traceback):
+        if os.path.dirname(os.path.abspath(frame.filename)) == _GAMELIB:
+            return os.path.basename(frame.filename)
+    return "other"
+
+
+def _count_live():
+    """
+    Returns:
+        The number of live GameUnit and Node objects, found through the garbage collector
+    """
+    units = nodes = 0
+    for item in gc.get_objects():
+        kind = type(item)
+        if kind is GameUnit:
+            units += 1
+        elif kind is Node:
+            nodes += 1
+    return units, nodes
@@ -2,6 +2,8 @@ import heapq
 import math
 import sys
 import queue
+from . import counters
+from .precompute import get_idealness
 from .util import debug_write
 
 
@@ -39,6 +41,7 @@ class ShortestPathFinder:
 
         * game_state (:obj: GameState): The current gamestate
         * game_map (:obj: GameMap): The current gamemap
+        * registry (:obj: ConfigRegistry): The compiled config of the current gamestate
 
     """
 
@@ -56,9 +59,10 @@ class ShortestPathFinder:
         # Initialize map
         self.initialized = True
         self.game_state = game_state
+        self.registry = game_state.registry
         self.game_map = [
-            [Node() for x in range(self.game_state.ARENA_SIZE)]
-            for y in range(self.game_state.ARENA_SIZE)
+            [Node() for x in range(self.registry.ARENA_SIZE)]
+            for y in range(self.registry.ARENA_SIZE)
         ]
 
     def navigate_multiple_endpoints(self, start_point, end_points, game_state):
@@ -74,6 +78,7 @@ class ShortestPathFinder:
             Note that this path can change if a tower is destroyed during pathing, or if you or your enemy places structures.
 
         """
+        counters.increment("navigate_multiple_endpoints")
         if game_state.contains_stationary_unit(start_point):
             return
 
@@ -98,9 +103,11 @@ class ShortestPathFinder:
         best_idealness = self._get_idealness(start, end_points)
         self.game_map[start[0]][start[1]].visited_idealness = True
         most_ideal = start
+        expanded = 0
 
         while not current.empty():
             search_location = current.get()
+            expanded += 1
             for neighbor in self._get_neighbors(search_location):
                 if (
                     not self.game_state.game_map.in_arena_bounds(neighbor)
@@ -122,6 +129,7 @@ class ShortestPathFinder:
                     self.game_map[x][y].visited_idealness = True
                     current.put(neighbor)
 
+        counters.increment("idealness_search_nodes", expanded)
         return most_ideal
 
     def _get_neighbors(self, location):
@@ -142,9 +150,9 @@ class ShortestPathFinder:
         point = end_points[0]
         x, y = point
         direction = [1, 1]
-        if x < self.game_state.HALF_ARENA:
+        if x < self.registry.HALF_ARENA:
             direction[0] = -1
-        if y < self.game_state.HALF_ARENA:
+        if y < self.registry.HALF_ARENA:
             direction[1] = -1
         return direction
 
@@ -158,18 +166,12 @@ class ShortestPathFinder:
         if location in end_points:
             return sys.maxsize
 
-        direction = self._get_direction_from_endpoints(end_points)
-
-        idealness = 0
-        if direction[1] == 1:
-            idealness += 28 * location[1]
-        else:
-            idealness += 28 * (27 - location[1])
-        if direction[0] == 1:
-            idealness += location[0]
-        else:
-            idealness += 27 - location[0]
-
+        direction = tuple(self._get_direction_from_endpoints(end_points))
+        idealness = self.registry.precomputed.idealness[direction].get(
+            (location[0], location[1])
+        )
+        if idealness is None:
+            return get_idealness(direction, location, self.registry.ARENA_SIZE)
         return idealness
 
     def _validate(self, ideal_tile, end_points):
@@ -189,8 +191,10 @@ class ShortestPathFinder:
             self.game_map[ideal_tile[0]][ideal_tile[1]].visited_validate = True
 
         # While current is not empty
+        expanded = 0
         while not current.empty():
             current_location = current.get()
+            expanded += 1
             current_node = self.game_map[current_location[0]][current_location[1]]
             for neighbor in self._get_neighbors(current_location):
                 if (
@@ -205,6 +209,7 @@ class ShortestPathFinder:
                     neighbor_node.visited_validate = True
                     current.put(neighbor)
 
+        counters.increment("validate_nodes", expanded)
         # debug_write("Print after validate")
         # self.print_map()
         return
@@ -329,9 +334,10 @@ class ShortestPathFinder:
             )
             return
 
-        for y in range(28):
-            for x in range(28):
-                node = self.game_map[x][28 - y - 1]
+        arena_size = self.registry.ARENA_SIZE
+        for y in range(arena_size):
+            for x in range(arena_size):
+                node = self.game_map[x][arena_size - y - 1]
                 if not node.blocked and not node.pathlength == -1:
                     self._print_justified(node.pathlength)
                 else:
@@ -0,0 +1,219 @@
+import hashlib
+import json
+import math
+import os
+
+# Bump when the contents of Precomputed change, so older cache files are rebuilt
+VERSION = 1
+# The directions of the four edges, as used by ShortestPathFinder, in the order of GameMap.get_edges
+EDGE_DIRECTIONS = ((1, 1), (-1, 1), (-1, -1), (1, -1))
+
+_precomputed = {}
+
+
+def get_key(config, arena_size):
+    """
+    Returns:
+        A hash of the unit information of a config and the arena size, which is all Precomputed depends on
+    """
+    text = json.dumps(config["unitInformation"], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256("{}:{}".format(arena_size, text).encode()).hexdigest()
+
+
+def get_idealness(direction, location, arena_size):
+    """How much a unit heading for the edge in a direction wants to reach a location, see ShortestPathFinder._get_idealness"""
+    idealness = 0
+    if direction[1] == 1:
+        idealness += arena_size * location[1]
+    else:
+        idealness += arena_size * (arena_size - 1 - location[1])
+    if direction[0] == 1:
+        idealness += location[0]
+    else:
+        idealness += arena_size - 1 - location[0]
+    return idealness
+
+
+def get_range_stencil(radius, get_hit_radius):
+    """The offsets of every location within a radius, see ConfigRegistry.get_range_stencil"""
+    search_radius = math.ceil(radius)
+    offsets = []
+    for dx in range(-search_radius, search_radius + 1):
+        for dy in range(-search_radius, search_radius + 1):
+            distance = math.sqrt(dx**2 + dy**2)
+            if distance < radius + get_hit_radius:
+                offsets.append((distance, dx, dy))
+    return tuple(sorted(offsets))
+
+
+class Precomputed:
+    """The tables that only depend on the unit information of a config and the arena size.
+    They are built once per distinct config, shared by every registry of that config, and can be saved to a cache file.
+
+    Attributes :
+        * key (str): See get_key
+        * arena_size (int): The size of the arena
+        * arena_locations (frozenset): (x, y) tuples of every location on the board, for GameMap.in_arena_bounds
+        * edges (tuple): The (x, y) locations of the top right, top left, bottom left and bottom right edges
+        * range_stencils (dict): Maps every distinct attackRange, upgraded or not, to its range stencil
+        * idealness (dict): Maps each edge direction to a dict mapping every (x, y) of the arena's square to its idealness
+
+    """
+
+    def __init__(self, key, arena_size, edges, range_stencils, idealness):
+        """
+        Args:
+            idealness: Maps each edge direction to a grid where grid[x][y] is the idealness of that location
+        """
+        self.key = key
+        self.arena_size = arena_size
+        self.edges = edges
+        self.range_stencils = range_stencils
+        self.idealness = {
+            direction: {
+                (x, y): value
+                for x, column in enumerate(grid)
+                for y, value in enumerate(column)
+            }
+            for direction, grid in idealness.items()
+        }
+        self.arena_locations = frozenset(
+            location for row in self.__rows() for location in row
+        )
+
+    def __rows(self):
+        """Yields the locations of each row of the board"""
+        half = self.arena_size // 2
+        for y in range(self.arena_size):
+            row_size = y + 1 if y < half else self.arena_size - y
+            start = half - row_size
+            yield [(x, y) for x in range(start, start + 2 * row_size)]
+
+    @classmethod
+    def build(cls, config, arena_size, key=None):
+        """Builds the tables of a config"""
+        half = arena_size // 2
+        edges = (
+            tuple((half + num, arena_size - 1 - num) for num in range(half)),
+            tuple((half - 1 - num, arena_size - 1 - num) for num in range(half)),
+            tuple((half - 1 - num, num) for num in range(half)),
+            tuple((half + num, num) for num in range(half)),
+        )
+        unit_information = config["unitInformation"]
+        get_hit_radius = unit_information[0]["getHitRadius"]
+        ranges = set()
+        for unit in unit_information:
+            for source in (unit, unit.get("upgrade", {})):
+                if "attackRange" in source:
+                    ranges.add(source["attackRange"])
+        range_stencils = {
+            radius: get_range_stencil(radius, get_hit_radius) for radius in ranges
+        }
+        idealness = {
+            direction: [
+                [
+                    get_idealness(direction, (x, y), arena_size)
+                    for y in range(arena_size)
+                ]
+                for x in range(arena_size)
+            ]
+            for direction in EDGE_DIRECTIONS
+        }
+        return cls(
+            key or get_key(config, arena_size),
+            arena_size,
+            edges,
+            range_stencils,
+            idealness,
+        )
+
+    def to_json(self):
+        return {
+            "version": VERSION,
+            "key": self.key,
+            "arena_size": self.arena_size,
+            "edges": self.edges,
+            "range_stencils": [
+                [radius, stencil] for radius, stencil in self.range_stencils.items()
+            ],
+            "idealness": [
+                [
+                    direction,
+                    [
+                        [
+                            self.idealness[direction][x, y]
+                            for y in range(self.arena_size)
+                        ]
+                        for x in range(self.arena_size)
+                    ],
+                ]
+                for direction in EDGE_DIRECTIONS
+            ],
+        }
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(
+            data["key"],
+            data["arena_size"],
+            tuple(
+                tuple(tuple(location) for location in edge) for edge in data["edges"]
+            ),
+            {
+                radius: tuple(tuple(offset) for offset in stencil)
+                for radius, stencil in data["range_stencils"]
+            },
+            {tuple(direction): table for direction, table in data["idealness"]},
+        )
+
+
+def get_precomputed(config, arena_size, cache_path=None):
+    """Gets the precomputed tables of a config, building them the first time a config with this unit information is seen.
+    ConfigRegistry calls this when it is compiled, and AlgoCore.start calls it with a cache file before on_game_start.
+
+    Args:
+        config: The game config
+        arena_size: The size of the arena
+        cache_path: If given, the tables are loaded from this file when it holds the same key,
+            and otherwise built and saved to it, so the next game with this config starts faster
+
+    Returns:
+        A Precomputed
+
+    """
+    key = get_key(config, arena_size)
+    precomputed = _precomputed.get(key)
+    loaded = None
+    if cache_path is not None:
+        loaded = _load(cache_path, key)
+        precomputed = precomputed or loaded
+    if precomputed is None:
+        precomputed = Precomputed.build(config, arena_size, key)
+    if cache_path is not None and loaded is None:
+        _save(cache_path, precomputed)
+    _precomputed[key] = precomputed
+    return precomputed
+
+
+def _load(path, key):
+    """Reads the tables saved in a cache file, or returns None if it is missing, unreadable or made for another config"""
+    try:
+        with open(path) as file:
+            data = json.load(file)
+        if data.get("version") != VERSION or data.get("key") != key:
+            return None
+        return Precomputed.from_json(data)
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def _save(path, precomputed):
+    """Writes a cache file, replacing it at once so a reader never sees half of it. Failures are ignored, the cache being optional."""
+    temporary = "{}.{}.tmp".format(path, os.getpid())
+    try:
+        with open(temporary, "w") as file:
+            json.dump(precomputed.to_json(), file, separators=(",", ":"))
+        os.replace(temporary, path)
+    except OSError:
+        if os.path.exists(temporary):
+            os.remove(temporary)
@@ -0,0 +1,254 @@
+import collections
+import cProfile
+import heapq
+import os
+import sys
+import threading
+import time
+
+from .util import debug_write
+
+CPROFILE = "cprofile"
+SAMPLE = "sample"
+
+
+class _TurnProfile:
+    """What was collected while handling one turn"""
+
+    __slots__ = ("turn_number", "elapsed", "profile", "samples")
+
+    def __init__(self, turn_number):
+        self.turn_number = turn_number
+        self.elapsed = 0.0
+        self.profile = None
+        self.samples = collections.Counter()
+
+    def __lt__(self, other):
+        return (self.elapsed, self.turn_number) < (other.elapsed, other.turn_number)
+
+
+class _Sampler:
+    """Samples the stack of one thread from a background thread while a handler has been running for longer than a delay.
+    Handlers that finish within the delay are never sampled, so fast turns are not slowed down.
+    """
+
+    def __init__(self, thread_id, interval, delay):
+        self.__thread_id = thread_id
+        self.__interval = interval
+        self.__delay = delay
+        self.__condition = threading.Condition()
+        self.__started = None
+        self.__samples = None
+        self.__closed = False
+        self.__thread = threading.Thread(target=self.__run, daemon=True)
+        self.__thread.start()
+
+    def begin(self, samples):
+        """Starts counting the stacks of the sampled thread into samples, once the delay has passed"""
+        with self.__condition:
+            self.__started = time.perf_counter()
+            self.__samples = samples
+            self.__condition.notify()
+
+    def end(self):
+        with self.__condition:
+            self.__started = None
+            self.__samples = None
+
+    def close(self):
+        with self.__condition:
+            self.__closed = True
+            self.__condition.notify()
+        self.__thread.join()
+
+    def __run(self):
+        while True:
+            with self.__condition:
+                while self.__started is None and not self.__closed:
+                    self.__condition.wait()
+                if self.__closed:
+                    return
+                started = self.__started
+                wait = started + self.__delay - time.perf_counter()
+                if wait > 0:
+                    self.__condition.wait(wait)
+                    continue
+            frame = sys._current_frames().get(self.__thread_id)
+            stack = _collapse(frame)
+            del frame
+            with self.__condition:
+                if self.__started == started and stack:
+                    self.__samples[stack] += 1
+            time.sleep(self.__interval)
+
+
+def _collapse(frame):
+    """The stack of a frame as "file:function;file:function", outermost call first"""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append("{}:{}".format(os.path.basename(code.co_filename), code.co_name))
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class TurnProfiler:
+    """Profiles the handlers of an algo and keeps the profiles of the slowest turns.
+    AlgoCore.start creates one when the GAMELIB_PROFILE environment variable is set, or uses the one it is given.
+
+    Two modes are available:
+        * "cprofile": every handler call is profiled with cProfile. Results are exact but every turn runs slower.
+        * "sample": a background thread samples the stack every interval seconds, starting only once a handler has run for longer than threshold.
+          Turns faster than the threshold are not slowed down at all, which suits catching the turns that time out in production.
+
+    Nothing is written to stdout. When the game ends, close writes the kept turns to the output directory,
+    as turn_<turn>.prof files for pstats or snakeviz in cprofile mode, and turn_<turn>.collapsed files
+    of "stack count" lines for flamegraph tools in sample mode.
+
+    Attributes :
+        * directory (str): Where profiles are written
+        * mode (str): "cprofile" or "sample"
+        * slowest (int): The number of turns kept
+        * threshold (float): Turns that took fewer seconds than this are not kept, and in sample mode not sampled
+        * frames (bool): Whether on_action_frame calls are profiled too, as part of the turn they follow
+        * interval (float): The seconds between samples in sample mode
+
+    """
+
+    def __init__(
+        self,
+        directory,
+        mode=CPROFILE,
+        slowest=5,
+        threshold=0.0,
+        frames=False,
+        interval=0.001,
+    ):
+        if mode not in (CPROFILE, SAMPLE):
+            raise ValueError("Unknown profiling mode {}".format(mode))
+        self.directory = directory
+        self.mode = mode
+        self.slowest = slowest
+        self.threshold = threshold
+        self.frames = frames
+        self.interval = interval
+        self.__kept = []
+        self.__current = None
+        self.__sampler = None
+
+    @classmethod
+    def from_environment(cls, environ=None):
+        """Creates a profiler from environment variables, or returns None if GAMELIB_PROFILE is not set
+
+        Variables :
+            * GAMELIB_PROFILE: The output directory
+            * GAMELIB_PROFILE_MODE: "cprofile" or "sample", cprofile by default
+            * GAMELIB_PROFILE_TURNS: The number of slowest turns kept, 5 by default
+            * GAMELIB_PROFILE_THRESHOLD: The threshold in milliseconds, 0 by default
+            * GAMELIB_PROFILE_FRAMES: Set to 1 to profile on_action_frame too
+
+        """
+        environ = os.environ if environ is None else environ
+        directory = environ.get("GAMELIB_PROFILE")
+        if not directory:
+            return None
+        return cls(
+            directory,
+            mode=environ.get("GAMELIB_PROFILE_MODE", CPROFILE),
+            slowest=int(environ.get("GAMELIB_PROFILE_TURNS", 5)),
+            threshold=float(environ.get("GAMELIB_PROFILE_THRESHOLD", 0)) / 1000,
+            frames=environ.get("GAMELIB_PROFILE_FRAMES", "0") not in ("", "0"),
+        )
+
+    def run_turn(self, turn_number, handler, *args):
+        """Calls on_turn, starting the profile of a new turn"""
+        self.__end_turn()
+        self.__current = _TurnProfile(turn_number)
+        return self.__run(handler, args)
+
+    def run_frame(self, handler, *args):
+        """Calls on_action_frame, adding it to the profile of the current turn if frames are profiled"""
+        if not self.frames or self.__current is None:
+            return handler(*args)
+        return self.__run(handler, args)
+
+    def __run(self, handler, args):
+        current = self.__current
+        start = time.perf_counter()
+        if self.mode == CPROFILE:
+            if current.profile is None:
+                current.profile = cProfile.Profile()
+            current.profile.enable()
+            try:
+                return handler(*args)
+            finally:
+                current.profile.disable()
+                current.elapsed += time.perf_counter() - start
+
+        if self.__sampler is None:
+            self.__sampler = _Sampler(
+                threading.get_ident(), self.interval, self.threshold
+            )
+        self.__sampler.begin(current.samples)
+        try:
+            return handler(*args)
+        finally:
+            self.__sampler.end()
+            current.elapsed += time.perf_counter() - start
+
+    def __end_turn(self):
+        """Keeps the current turn if it is slow enough and among the slowest"""
+        current = self.__current
+        self.__current = None
+        if current is None or current.elapsed < self.threshold or self.slowest < 1:
+            return
+        if self.mode == SAMPLE and not current.samples:
+            return
+        if len(self.__kept) < self.slowest:
+            heapq.heappush(self.__kept, current)
+        else:
+            heapq.heappushpop(self.__kept, current)
+
+    def get_kept_turns(self):
+        """
+        Returns:
+            A list of (turn number, seconds spent in the profiled handlers) for the kept turns, slowest first
+        """
+        return [
+            (kept.turn_number, kept.elapsed)
+            for kept in sorted(self.__kept, reverse=True)
+        ]
+
+    def close(self):
+        """Stops profiling and writes the kept turns to the output directory
+
+        Returns:
+            The paths of the files written
+
+        """
+        self.__end_turn()
+        if self.__sampler is not None:
+            self.__sampler.close()
+            self.__sampler = None
+        paths = []
+        if self.__kept:
+            os.makedirs(self.directory, exist_ok=True)
+        for kept in sorted(self.__kept, reverse=True):
+            name = os.path.join(self.directory, "turn_{}".format(kept.turn_number))
+            if kept.profile is not None:
+                path = name + ".prof"
+                kept.profile.dump_stats(path)
+            else:
+                path = name + ".collapsed"
+                with open(path, "w") as file:
+                    for stack, count in kept.samples.most_common():
+                        file.write("{} {}\n".format(stack, count))
+            paths.append(path)
+        self.__kept = []
+        if paths:
+            debug_write(
+                "Wrote profiles of the {} slowest turns to {}".format(
+                    len(paths), self.directory
+                )
+            )
+        return paths
@@ -0,0 +1,419 @@
+import io
+import json
+import math
+import mmap
+import random
+import struct
+import time
+import zlib
+
+from .util import redirect_streams
+
+CONFIG = 0
+TURN = 1
+FRAME = 2
+END = 3
+OTHER = 4
+# Maps the first entry of turnInfo to the kind of message
+STATE_KINDS = {0: TURN, 1: FRAME, 2: END}
+
+_MAGIC = b"GLRP"
+_INDEX_MAGIC = b"GLRI"
+_VERSION = 1
+# magic, version, compressed
+_HEADER = struct.Struct("<4sBB")
+# kind, turn, frame, payload length
+_RECORD = struct.Struct("<BiiI")
+# offset of the record header, kind, turn, frame
+_INDEX_ENTRY = struct.Struct("<QBii")
+# offset of the index, number of entries, magic
+_FOOTER = struct.Struct("<QI4s")
+
+
+def get_message_kind(message):
+    """Works out what a message from the game engine is, the same way AlgoCore.start does
+
+    Args:
+        message: A message from the game engine
+
+    Returns:
+        (kind, turn, frame), kind being one of CONFIG, TURN, FRAME, END or OTHER and turn and frame being -1 when unknown
+
+    """
+    if "replaySave" in message:
+        return CONFIG, -1, -1
+    if "turnInfo" not in message:
+        return OTHER, -1, -1
+    turn_info = json.loads(message)["turnInfo"]
+    kind = STATE_KINDS.get(int(turn_info[0]), OTHER)
+    return kind, int(turn_info[1]), int(turn_info[2])
+
+
+class ReplayWriter:
+    """Records the messages of a game to a compact binary log that ReplayReader can read back.
+
+    The log starts with a small header, followed by one length-prefixed record per message,
+    each compressed on its own with zlib if compress is set. close writes an index of record offsets
+    at the end of the file. A log that was never closed, for example because the algo was killed, can still be read.
+
+    Attributes :
+        * path (str): The file being written
+        * compress (bool): Whether messages are compressed
+        * count (int): The number of messages written so far
+
+    """
+
+    def __init__(self, path, compress=True):
+        """Creates the log, replacing any file at path
+
+        Args:
+            path: Where to write the log
+            compress: Compress every message with zlib
+
+        """
+        self.path = path
+        self.compress = compress
+        self.count = 0
+        self.__file = open(path, "wb")
+        self.__file.write(_HEADER.pack(_MAGIC, _VERSION, int(compress)))
+        self.__index = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def write(self, message, kind=None, turn=-1, frame=-1):
+        """Appends a message to the log
+
+        Args:
+            message: The message as received from the game engine
+            kind: CONFIG, TURN, FRAME, END or OTHER. If None it is worked out from the message with get_message_kind.
+            turn: The turn number of the message
+            frame: The frame number of the message
+
+        """
+        if kind is None:
+            kind, turn, frame = get_message_kind(message)
+        payload = message.rstrip("\n").encode()
+        if self.compress:
+            payload = zlib.compress(payload, 1)
+        self.__index.append((self.__file.tell(), kind, turn, frame))
+        self.__file.write(_RECORD.pack(kind, turn, frame, len(payload)))
+        self.__file.write(payload)
+        self.count += 1
+        if kind != FRAME:
+            # Keep everything up to the last turn if the algo gets killed
+            self.__file.flush()
+
+    def close(self):
+        """Writes the index and closes the log"""
+        if self.__file.closed:
+            return
+        index_offset = self.__file.tell()
+        for entry in self.__index:
+            self.__file.write(_INDEX_ENTRY.pack(*entry))
+        self.__file.write(_FOOTER.pack(index_offset, len(self.__index), _INDEX_MAGIC))
+        self.__file.close()
+
+
+class ReplayReader:
+    """Random access to a log written by ReplayWriter.
+
+    The log is memory mapped and only the index is read when it is opened.
+    Messages are decoded when they are asked for, so any turn or frame of a long game can be read directly.
+
+    Attributes :
+        * path (str): The log being read
+        * compressed (bool): Whether the messages of the log are compressed
+        * turns (list): The turn numbers that have a turn message, in order
+
+    """
+
+    def __init__(self, path):
+        """Opens a log
+
+        Args:
+            path: The log written by ReplayWriter
+
+        """
+        self.path = path
+        self.__file = open(path, "rb")
+        self.__map = mmap.mmap(self.__file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, compressed = _HEADER.unpack_from(self.__map, 0)
+        if magic != _MAGIC or version != _VERSION:
+            self.close()
+            raise ValueError("{} is not a replay log".format(path))
+        self.compressed = bool(compressed)
+        self.__index = self.__read_index()
+        self.__turns = {}
+        self.__frames = {}
+        self.__config = None
+        for position, (_, kind, turn, frame) in enumerate(self.__index):
+            if kind == TURN:
+                self.__turns[turn] = position
+            elif kind == FRAME:
+                self.__frames.setdefault(turn, []).append((frame, position))
+            elif kind == CONFIG and self.__config is None:
+                self.__config = position
+        self.turns = list(self.__turns)
+
+    def __read_index(self):
+        """Reads the index from the footer, or rebuilds it from the record headers if the log was not closed"""
+        size = len(self.__map)
+        if size >= _HEADER.size + _FOOTER.size:
+            index_offset, count, magic = _FOOTER.unpack_from(
+                self.__map, size - _FOOTER.size
+            )
+            if (
+                magic == _INDEX_MAGIC
+                and index_offset + count * _INDEX_ENTRY.size + _FOOTER.size == size
+            ):
+                return [
+                    _INDEX_ENTRY.unpack_from(
+                        self.__map, index_offset + position * _INDEX_ENTRY.size
+                    )
+                    for position in range(count)
+                ]
+
+        index = []
+        offset = _HEADER.size
+        while offset + _RECORD.size <= size:
+            kind, turn, frame, length = _RECORD.unpack_from(self.__map, offset)
+            if offset + _RECORD.size + length > size:
+                break
+            index.append((offset, kind, turn, frame))
+            offset += _RECORD.size + length
+        return index
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return len(self.__index)
+
+    def __getitem__(self, position):
+        """Gets the message at a position in the log"""
+        offset = self.__index[position][0]
+        length = _RECORD.unpack_from(self.__map, offset)[3]
+        start = offset + _RECORD.size
+        payload = self.__map[start : start + length]
+        if self.compressed:
+            payload = zlib.decompress(payload)
+        return payload.decode()
+
+    def close(self):
+        self.__map.close()
+        self.__file.close()
+
+    def get_kind(self, position):
+        """
+        Args:
+            position: The position of a message in the log
+
+        Returns:
+            (kind, turn, frame) of the message
+        """
+        return self.__index[position][1:]
+
+    def messages(self):
+        """Yields (kind, turn, frame, message) for every message, in the order they were received"""
+        for position, (_, kind, turn, frame) in enumerate(self.__index):
+            yield kind, turn, frame, self[position]
+
+    def get_config(self):
+        """
+        Returns:
+            The config message, or None if the log has none
+        """
+        return None if self.__config is None else self[self.__config]
+
+    def get_turn(self, turn_number):
+        """
+        Args:
+            turn_number: A turn number
+
+        Returns:
+            The turn message of that turn
+        """
+        return self[self.__turns[turn_number]]
+
+    def frame_count(self, turn_number):
+        """
+        Args:
+            turn_number: A turn number
+
+        Returns:
+            The number of action frames recorded after that turn
+        """
+        return len(self.__frames.get(turn_number, []))
+
+    def get_frame(self, turn_number, index):
+        """
+        Args:
+            turn_number: A turn number
+            index: The position of the frame in the action phase of that turn, negative values counting from the end
+
+        Returns:
+            The action frame message
+        """
+        return self[self.__frames[turn_number][index][1]]
+
+
+class ReplayReport:
+    """The handler timings and commands of an algo replaying a game
+
+    Attributes :
+        * turn_latencies (dict): Maps each turn number to the seconds on_turn took
+        * frame_latencies (list): (turn, frame, seconds) for every call to on_action_frame
+        * commands (dict): Maps each turn number to the lines the algo sent, usually [build stack, deploy stack] as JSON
+        * game_start_latency (float): The seconds on_game_start took
+
+    """
+
+    def __init__(self):
+        self.turn_latencies = {}
+        self.frame_latencies = []
+        self.commands = {}
+        self.game_start_latency = 0.0
+
+    def __str__(self):
+        frames = [seconds for _, _, seconds in self.frame_latencies]
+        lines = []
+        for name, latencies in (
+            ("on_turn", list(self.turn_latencies.values())),
+            ("on_action_frame", frames),
+        ):
+            lines.append(
+                "{}: {} calls, p50 {:.2f}ms p95 {:.2f}ms max {:.2f}ms".format(
+                    name,
+                    len(latencies),
+                    1000 * self.percentile(latencies, 50),
+                    1000 * self.percentile(latencies, 95),
+                    1000 * self.percentile(latencies, 100),
+                )
+            )
+        return "\n".join(lines)
+
+    @staticmethod
+    def percentile(latencies, percentile):
+        """
+        Args:
+            latencies: A list of latencies
+            percentile: Between 0 and 100
+
+        Returns:
+            The latency that the given percentage of calls did not exceed, or 0 if there are none
+        """
+        ordered = sorted(latencies)
+        if not ordered:
+            return 0.0
+        return ordered[max(0, math.ceil(percentile / 100 * len(ordered)) - 1)]
+
+    def get_turn_summary(self):
+        """The time spent handling each turn, slowest turns first
+
+        Returns:
+            A list of (turn, on_turn seconds, frames handled, total on_action_frame seconds, slowest on_action_frame seconds)
+
+        """
+        frames = {}
+        for turn, _, seconds in self.frame_latencies:
+            frames.setdefault(turn, []).append(seconds)
+        summary = [
+            (
+                turn,
+                seconds,
+                len(frames.get(turn, [])),
+                sum(frames.get(turn, [])),
+                max(frames.get(turn, [0.0])),
+            )
+            for turn, seconds in self.turn_latencies.items()
+        ]
+        return sorted(summary, key=lambda row: row[1], reverse=True)
+
+    def diff_commands(self, other):
+        """Compares the commands of two replays of the same game, to check that a change did not alter the algo's behavior
+
+        Args:
+            other: Another ReplayReport
+
+        Returns:
+            The sorted turn numbers where the commands differ, including turns only one of the replays has
+
+        """
+        turns = set(self.commands) | set(other.commands)
+        return sorted(
+            turn
+            for turn in turns
+            if self.commands.get(turn) != other.commands.get(turn)
+        )
+
+
+class ReplayDriver:
+    """Feeds a recorded game into an AlgoCore subclass without the game engine, for latency benchmarking.
+
+    Messages are dispatched to on_game_start, on_turn and on_action_frame the way AlgoCore.start does,
+    and every handler call is timed. What the algo sends with send_command is captured instead of written to stdout.
+
+    Attributes :
+        * source: A ReplayReader, the path of a log, or a list of messages as received from the game engine
+        * quiet (bool): Whether debug_write output is discarded while replaying
+
+    """
+
+    def __init__(self, source, quiet=True):
+        self.source = source
+        self.quiet = quiet
+
+    def run(self, algo, seed=None):
+        """Replays the game into an algo
+
+        Args:
+            algo: An AlgoCore instance, freshly created
+            seed: If given, the random module is seeded with it before replaying, for algos that use it
+
+        Returns:
+            A ReplayReport
+
+        """
+        if seed is not None:
+            random.seed(seed)
+        report = ReplayReport()
+        output = io.StringIO()
+        redirect_streams(None, output, io.StringIO() if self.quiet else None)
+        try:
+            for kind, turn, frame, message in self.__messages():
+                start = time.perf_counter()
+                if kind == CONFIG:
+                    algo.on_game_start(json.loads(message))
+                    report.game_start_latency = time.perf_counter() - start
+                elif kind == TURN:
+                    algo.on_turn(message)
+                    report.turn_latencies[turn] = time.perf_counter() - start
+                    report.commands[turn] = output.getvalue().splitlines()
+                    output.seek(0)
+                    output.truncate()
+                elif kind == FRAME:
+                    algo.on_action_frame(message)
+                    report.frame_latencies.append(
+                        (turn, frame, time.perf_counter() - start)
+                    )
+        finally:
+            redirect_streams()
+        return report
+
+    def __messages(self):
+        """Yields (kind, turn, frame, message) for every message of the source"""
+        if isinstance(self.source, ReplayReader):
+            yield from self.source.messages()
+        elif isinstance(self.source, str):
+            with ReplayReader(self.source) as reader:
+                yield from reader.messages()
+        else:
+            for message in self.source:
+                yield get_message_kind(message) + (message,)
@@ -0,0 +1,295 @@
+import math
+import multiprocessing
+import pickle
+import random
+import time
+
+from .simulator import ActionSimulator
+
+
+class RandomDeployPolicy:
+    """An enemy policy that spends the whole budget on a few random groups of mobile units.
+
+    A policy is any picklable callable taking (game_state, budget, rng) and returning the enemy
+    deploy stack as a list of (unit_type, x, y). rng is a random.Random seeded for the rollout,
+    and it must be the only source of randomness for the rollout to be reproducible.
+
+    Attributes :
+        * unit_types (list): The mobile unit types to choose from, defaulting to every mobile unit
+        * max_groups (int): The largest number of distinct (unit_type, location) groups in a deploy stack
+
+    """
+
+    def __init__(self, unit_types=None, max_groups=3):
+        self.unit_types = unit_types
+        self.max_groups = max_groups
+
+    def __call__(self, game_state, budget, rng):
+        registry = game_state.registry
+        unit_types = self.unit_types or [
+            registry.SCOUT,
+            registry.DEMOLISHER,
+            registry.INTERCEPTOR,
+        ]
+        game_map = game_state.game_map
+        locations = [
+            location
+            for edge in (game_map.TOP_LEFT, game_map.TOP_RIGHT)
+            for location in game_map.get_edge_locations(edge)
+            if not game_state.contains_stationary_unit(location)
+        ]
+        if not locations:
+            return []
+
+        groups = [
+            (rng.choice(unit_types), rng.choice(locations))
+            for _ in range(rng.randint(1, self.max_groups))
+        ]
+        deploy_stack = []
+        while True:
+            affordable = [
+                group
+                for group in groups
+                if registry.costs[group[0]][game_state.MP] <= budget
+            ]
+            if not affordable:
+                return deploy_stack
+            unit_type, (x, y) = rng.choice(affordable)
+            deploy_stack.append((unit_type, x, y))
+            budget -= registry.costs[unit_type][game_state.MP]
+
+
+class RolloutDistribution:
+    """The outcomes of a set of rollouts, in the order of their seeds
+
+    Attributes :
+        * budget (float): The MP the enemy policy was allowed to spend
+        * requested (int): The number of rollouts asked for
+        * elapsed (float): The wall-clock time the rollouts took, in seconds
+        * outcomes (list): (seed, enemy_deploy_stack, SimulationResult) for every completed rollout
+        * breaches (list): The number of enemy units that breached in each rollout
+        * damage_taken (list): The damage dealt to your health in each rollout
+        * SP_lost (list): The SP cost of the structures you lost in each rollout
+
+    """
+
+    def __init__(self, budget, requested):
+        self.budget = budget
+        self.requested = requested
+        self.elapsed = 0.0
+        self.outcomes = []
+        self.breaches = []
+        self.damage_taken = []
+        self.SP_lost = []
+
+    def __len__(self):
+        return len(self.outcomes)
+
+    def __str__(self):
+        return "rollouts: {}/{} expected breaches: {:.2f} expected SP lost: {:.2f} in {:.2f}s".format(
+            len(self),
+            self.requested,
+            self.expected_breaches(),
+            self.expected_SP_lost(),
+            self.elapsed,
+        )
+
+    def add(self, seed, enemy_deploy_stack, result):
+        """Records the outcome of one rollout"""
+        self.outcomes.append((seed, enemy_deploy_stack, result))
+        self.breaches.append(result.count_breaches(1))
+        self.damage_taken.append(result.breach_damage[1])
+        self.SP_lost.append(result.structure_cost_lost[0])
+
+    @property
+    def complete(self):
+        """True if every requested rollout finished within the time budget"""
+        return len(self) == self.requested
+
+    def expected_breaches(self):
+        """
+        Returns:
+            The mean number of enemy breaches, or 0 if no rollout completed
+        """
+        return sum(self.breaches) / len(self) if self.outcomes else 0.0
+
+    def expected_SP_lost(self):
+        """
+        Returns:
+            The mean SP cost of the structures you lost, or 0 if no rollout completed
+        """
+        return sum(self.SP_lost) / len(self) if self.outcomes else 0.0
+
+    def breach_distribution(self):
+        """
+        Returns:
+            A dict mapping a number of enemy breaches to the fraction of rollouts that ended with it
+        """
+        counts = {}
+        for breaches in self.breaches:
+            counts[breaches] = counts.get(breaches, 0) + 1
+        return {breaches: counts[breaches] / len(self) for breaches in sorted(counts)}
+
+    def quantile(self, values, q):
+        """Gets a quantile of one of the outcome lists, for example the 90% worst case of SP lost
+
+        Args:
+            values: breaches, damage_taken or SP_lost
+            q: The quantile, between 0 and 1
+
+        Returns:
+            The smallest value that at least a fraction q of the rollouts do not exceed, or None if no rollout completed
+
+        """
+        if not values:
+            return None
+        ordered = sorted(values)
+        return ordered[max(0, math.ceil(q * len(ordered)) - 1)]
+
+
+class RolloutEngine:
+    """Estimates how a planned turn holds up against plausible enemy deployments.
+
+    Each rollout samples an enemy deploy stack from a policy, bounded by the MP project_future_MP
+    predicts for the enemy, and simulates it with ActionSimulator against your planned board and deploy stack.
+    Rollouts run in a process pool. Every rollout has its own seed derived from the seed given to run,
+    so the same seed gives the same outcomes whatever the number of processes.
+
+    Attributes :
+        * game_state (:obj: GameState): Your planned board, after your attempt_spawn, attempt_upgrade and attempt_remove calls
+        * policy (callable): Samples enemy deploy stacks, see RandomDeployPolicy
+        * deploy_stack (list): The (unit_type, x, y) mobile units you deploy
+        * budget (float): The MP the enemy policy may spend
+        * processes (int): The number of worker processes, 0 to run every rollout in this process
+        * max_frames (int): Simulations stop after this many frames
+
+    """
+
+    def __init__(
+        self,
+        game_state,
+        policy=None,
+        deploy_stack=None,
+        turns_in_future=1,
+        processes=None,
+        max_frames=1000,
+    ):
+        """Prepares rollouts of a planned turn
+
+        Args:
+            game_state: Your planned board
+            policy: The enemy policy, defaulting to RandomDeployPolicy()
+            deploy_stack: Your deploy stack, defaulting to the deploy stack of game_state
+            turns_in_future: The enemy budget is project_future_MP(turns_in_future, player_index=1), or their current MP if 0
+            processes: The number of worker processes, defaulting to the number of CPUs
+            max_frames: The maximum number of frames to simulate
+
+        """
+        self.game_state = game_state
+        self.policy = policy or RandomDeployPolicy()
+        if deploy_stack is None:
+            deploy_stack = game_state._deploy_stack
+        self.deploy_stack = list(deploy_stack)
+        if turns_in_future:
+            self.budget = game_state.project_future_MP(turns_in_future, player_index=1)
+        else:
+            self.budget = game_state.get_resource(game_state.MP, 1)
+        self.processes = multiprocessing.cpu_count() if processes is None else processes
+        self.max_frames = max_frames
+
+    def run(self, rollouts, seed=None, time_budget=None, chunk_size=4):
+        """Runs rollouts until they are all done or the time budget runs out
+
+        Args:
+            rollouts: The number of rollouts to run
+            seed: Seeds the rollouts. None uses a random seed, so the outcomes are not reproducible.
+            time_budget: The wall-clock time in seconds after which no more rollouts are collected, or None for no limit
+            chunk_size: The number of rollouts each worker runs at a time
+
+        Returns:
+            A RolloutDistribution. With a time budget it holds the first rollouts that finished in time.
+
+        """
+        start = time.perf_counter()
+        deadline = None if time_budget is None else start + time_budget
+        seeder = random.Random(seed)
+        seeds = [seeder.getrandbits(64) for _ in range(rollouts)]
+        chunks = [
+            seeds[index : index + chunk_size]
+            for index in range(0, rollouts, chunk_size)
+        ]
+        distribution = RolloutDistribution(self.budget, rollouts)
+        payload = pickle.dumps(
+            (
+                self.game_state,
+                self.policy,
+                self.deploy_stack,
+                self.budget,
+                self.max_frames,
+            )
+        )
+
+        if self.processes == 0:
+            _init_worker(payload)
+            for chunk in chunks:
+                if deadline is not None and time.perf_counter() >= deadline:
+                    break
+                self.__collect(distribution, _run_chunk(chunk))
+        else:
+            pool = multiprocessing.Pool(self.processes, _init_worker, (payload,))
+            try:
+                results = pool.imap(_run_chunk, chunks)
+                for _ in chunks:
+                    if deadline is None:
+                        self.__collect(distribution, results.next())
+                        continue
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        break
+                    try:
+                        self.__collect(distribution, results.next(remaining))
+                    except multiprocessing.TimeoutError:
+                        break
+            finally:
+                pool.terminate()
+                pool.join()
+
+        distribution.elapsed = time.perf_counter() - start
+        return distribution
+
+    def __collect(self, distribution, outcomes):
+        for seed, enemy_deploy_stack, result in outcomes:
+            distribution.add(seed, enemy_deploy_stack, result)
+
+
+_worker = None
+
+
+def _init_worker(payload):
+    """Unpickles the planned turn once per worker process, so its simulator caches paths across rollouts"""
+    global _worker
+    game_state, policy, deploy_stack, budget, max_frames = pickle.loads(payload)
+    game_state.suppress_warnings(True)
+    _worker = (
+        ActionSimulator(game_state, max_frames),
+        game_state,
+        policy,
+        deploy_stack,
+        budget,
+    )
+
+
+def _run_chunk(seeds):
+    """Runs the rollouts of a list of seeds in the current worker"""
+    simulator, game_state, policy, deploy_stack, budget = _worker
+    outcomes = []
+    for seed in seeds:
+        enemy_deploy_stack = policy(game_state, budget, random.Random(seed))
+        outcomes.append(
+            (
+                seed,
+                enemy_deploy_stack,
+                simulator.simulate(deploy_stack, enemy_deploy_stack),
+            )
+        )
+    return outcomes
@@ -0,0 +1,371 @@
+import math
+
+from . import counters
+from .config_registry import get_registry
+
+
+class SimulationResult:
+    """The outcome of one simulated action phase
+
+    Attributes :
+        * frames (int): The number of frames simulated
+        * breaches (list): (frame, unit_type, [x, y], player_index) for every unit that reached its target edge
+        * breach_damage ([float, float]): The damage each player dealt to the other player's health
+        * damage_dealt ([float, float]): The damage each player's units dealt to enemy units
+        * structures_destroyed (list): (frame, unit_type, [x, y], player_index) for every structure destroyed, player_index being its owner
+        * structure_cost_lost ([float, float]): The SP cost of the structures each player lost
+        * self_destructs (list): (frame, unit_type, [x, y], player_index) for every unit that self destructed
+
+    """
+
+    def __init__(self):
+        self.frames = 0
+        self.breaches = []
+        self.breach_damage = [0.0, 0.0]
+        self.damage_dealt = [0.0, 0.0]
+        self.structures_destroyed = []
+        self.structure_cost_lost = [0.0, 0.0]
+        self.self_destructs = []
+
+    def __str__(self):
+        return (
+            "frames: {} breaches: {} damage dealt: {} structures destroyed: {}".format(
+                self.frames,
+                [self.count_breaches(0), self.count_breaches(1)],
+                self.damage_dealt,
+                len(self.structures_destroyed),
+            )
+        )
+
+    def count_breaches(self, player_index=0):
+        """
+        Args:
+            player_index: The player who scored the breaches
+
+        Returns:
+            The number of units of the given player that reached their target edge
+        """
+        return sum(1 for breach in self.breaches if breach[3] == player_index)
+
+
+def get_move_interval(spec):
+    """
+    Args:
+        spec: The UnitSpec of a mobile unit
+
+    Returns:
+        The number of frames between two moves of the unit, or 0 if it never moves
+    """
+    if not spec.speed:
+        return 0
+    return max(1, round(1 / spec.speed))
+
+
+class _SimUnit:
+    """A unit during simulation. Uses the same attribute names as GameUnit so GameState.get_targets accepts it."""
+
+    __slots__ = (
+        "unit_type",
+        "player_index",
+        "x",
+        "y",
+        "health",
+        "spec",
+        "stationary",
+        "damage_f",
+        "damage_i",
+        "attackRange",
+        "target_edge",
+        "path",
+        "path_index",
+        "move_interval",
+        "frames_since_move",
+        "steps_moved",
+        "shielded_by",
+    )
+
+    def __init__(self, spec, player_index, x, y, health):
+        self.unit_type = spec.unit_type
+        self.player_index = player_index
+        self.x = x
+        self.y = y
+        self.health = health
+        self.spec = spec
+        self.stationary = spec.stationary
+        self.damage_f = spec.damage_f
+        self.damage_i = spec.damage_i
+        self.attackRange = spec.attackRange
+
+
+class ActionSimulator:
+    """Simulates the action phase that follows a turn, as a local stand-in for the game engine.
+
+    Each frame supports shield friendly mobile units in range, mobile units move one step along
+    the path ShortestPathFinder gives them, every unit attacks the target get_target would choose,
+    and destroyed units are removed. Mobile units that reach their target edge breach, and units
+    that cannot go further self destruct. Paths are recomputed whenever a structure is destroyed.
+
+    Within a frame all units move before self destructs deal damage, and all targets are chosen
+    before any attack damage is applied. Paths are cached per set of destroyed structures, so
+    simulating many attack options against the same board reuses them.
+
+    Attributes :
+        * game_state (:obj: GameState): The board the simulations start from
+        * registry (:obj: ConfigRegistry): The compiled config of the game
+        * max_frames (int): Simulations stop after this many frames
+        * structures (list): The structures of game_state, which every simulation starts with
+
+    """
+
+    def __init__(self, game_state, max_frames=1000):
+        """Prepares simulations of the action phase following a GameState
+
+        Args:
+            game_state: The GameState to simulate from. Its structures are the starting board.
+            max_frames: The maximum number of frames to simulate
+
+        """
+        self.game_state = game_state
+        self.registry = get_registry(game_state.config)
+        self.max_frames = max_frames
+        self.structures = [
+            unit for unit in game_state.game_map.get_all_units() if unit.stationary
+        ]
+        self.__paths = {}
+        self.__boards = {}
+        self.__edges = {}
+        self.__self_destruct = {}
+
+    def simulate(self, deploy_stack=None, enemy_deploy_stack=None, on_frame=None):
+        """Simulates one action phase
+
+        Args:
+            deploy_stack: A list of (unit_type, x, y) mobile units you deploy, defaulting to the deploy stack of the GameState
+            enemy_deploy_stack: A list of (unit_type, x, y) mobile units your opponent deploys
+            on_frame: If given, called at the end of every frame with (frame, units, result), units being every unit still alive
+
+        Returns:
+            A SimulationResult
+
+        """
+        if deploy_stack is None:
+            deploy_stack = self.game_state._deploy_stack
+        registry = self.registry
+        result = SimulationResult()
+        destroyed = frozenset()
+
+        structures = []
+        for unit in self.structures:
+            structures.append(
+                _SimUnit(unit.spec, unit.player_index, unit.x, unit.y, unit.health)
+            )
+        supports = [
+            unit
+            for unit in structures
+            if unit.spec.shieldRange > 0 and unit.spec.shieldPerUnit > 0
+        ]
+        mobiles = []
+        for player_index, stack in ((0, deploy_stack), (1, enemy_deploy_stack or [])):
+            for unit_type, x, y in stack:
+                spec = registry.unit_specs[unit_type]
+                unit = _SimUnit(spec, player_index, int(x), int(y), spec.max_health)
+                unit.target_edge = self.game_state.get_target_edge([unit.x, unit.y])
+                unit.path = None
+                unit.path_index = 0
+                unit.move_interval = get_move_interval(spec)
+                unit.frames_since_move = 0
+                unit.steps_moved = 0
+                unit.shielded_by = set()
+                mobiles.append(unit)
+
+        frame = 0
+        while mobiles and frame < self.max_frames:
+            frame += 1
+            self.__shield(supports, mobiles)
+
+            departed = []
+            self_destructing = []
+            for unit in mobiles:
+                if unit.move_interval == 0:
+                    continue
+                unit.frames_since_move += 1
+                if unit.frames_since_move < unit.move_interval:
+                    continue
+                unit.frames_since_move = 0
+                if unit.path is None:
+                    unit.path = self.get_path(
+                        (unit.x, unit.y), unit.target_edge, destroyed
+                    )
+                    unit.path_index = 0
+                if unit.path_index + 1 < len(unit.path):
+                    unit.path_index += 1
+                    unit.x, unit.y = unit.path[unit.path_index]
+                    unit.steps_moved += 1
+                    if unit.path_index + 1 < len(unit.path) or not self.is_on_edge(
+                        (unit.x, unit.y), unit.target_edge
+                    ):
+                        continue
+                    result.breaches.append(
+                        (frame, unit.unit_type, [unit.x, unit.y], unit.player_index)
+                    )
+                    result.breach_damage[
+                        unit.player_index
+                    ] += unit.spec.type_config.get("playerBreachDamage", 1)
+                else:
+                    result.self_destructs.append(
+                        (frame, unit.unit_type, [unit.x, unit.y], unit.player_index)
+                    )
+                    self_destructing.append(unit)
+                departed.append(unit)
+
+            if departed:
+                mobiles = [unit for unit in mobiles if unit not in departed]
+                for unit in self_destructing:
+                    self.__self_destruct_damage(unit, structures + mobiles, result)
+                structures, supports, mobiles, destroyed = self.__remove_dead(
+                    frame, structures, supports, mobiles, destroyed, result
+                )
+
+            for attacker, target in self.game_state.get_targets(
+                None, structures + mobiles
+            ):
+                if target is None or target.health <= 0:
+                    continue
+                damage = attacker.damage_f if target.stationary else attacker.damage_i
+                result.damage_dealt[attacker.player_index] += min(damage, target.health)
+                target.health -= damage
+            structures, supports, mobiles, destroyed = self.__remove_dead(
+                frame, structures, supports, mobiles, destroyed, result
+            )
+            if on_frame is not None:
+                on_frame(frame, structures + mobiles, result)
+
+        result.frames = frame
+        return result
+
+    def get_path(self, location, target_edge, destroyed=frozenset()):
+        """Gets the path a unit at a location would take once some structures are destroyed.
+        Paths are computed with ShortestPathFinder and cached.
+
+        Args:
+            location: The (x, y) location of the unit
+            target_edge: The edge the unit is trying to reach
+            destroyed: A frozenset of (x, y) locations of structures that have been destroyed
+
+        Returns:
+            A list of (x, y) tuples starting at location. If the last one is not on the target edge, the unit self destructs there.
+
+        """
+        key = (destroyed, location[0], location[1], target_edge)
+        path = self.__paths.get(key)
+        counters.record_lookup("simulator.paths", path is not None)
+        if path is None:
+            board = self.__boards.get(destroyed)
+            if board is None:
+                board = self.game_state.fork()
+                board.suppress_warnings(True)
+                for x, y in destroyed:
+                    board.game_map.remove_unit([x, y])
+                self.__boards[destroyed] = board
+            found = board.find_path_to_edge([location[0], location[1]], target_edge)
+            if found:
+                path = [tuple(step) for step in found]
+            else:
+                path = [(location[0], location[1])]
+            self.__paths[key] = path
+        return path
+
+    def is_on_edge(self, location, target_edge):
+        """
+        Args:
+            location: An (x, y) location
+            target_edge: One of the game_map edge constants
+
+        Returns:
+            True if the location is on the given edge
+        """
+        edge = self.__edges.get(target_edge)
+        if edge is None:
+            edge = set(
+                (x, y)
+                for x, y in self.game_state.game_map.get_edge_locations(target_edge)
+            )
+            self.__edges[target_edge] = edge
+        return location in edge
+
+    def get_self_destruct(self, unit_type):
+        """
+        Args:
+            unit_type: A mobile unit type
+
+        Returns:
+            (steps required, range, damage to structures, damage to mobile units) of the unit's self destruct
+        """
+        settings = self.__self_destruct.get(unit_type)
+        if settings is None:
+            spec = self.registry.unit_specs[unit_type]
+            type_config = spec.type_config
+            settings = (
+                type_config.get("selfDestructStepsRequired", 5),
+                type_config.get("selfDestructRange", 1.5),
+                type_config.get("selfDestructDamageTower", spec.max_health),
+                type_config.get("selfDestructDamageWalker", spec.max_health),
+            )
+            self.__self_destruct[unit_type] = settings
+        return settings
+
+    def __remove_dead(self, frame, structures, supports, mobiles, destroyed, result):
+        """Removes destroyed units. Mobile units re-path on their next move if a structure was destroyed."""
+        if any(unit.health <= 0 for unit in mobiles):
+            mobiles = [unit for unit in mobiles if unit.health > 0]
+        if all(unit.health > 0 for unit in structures):
+            return structures, supports, mobiles, destroyed
+
+        survivors = []
+        for unit in structures:
+            if unit.health > 0:
+                survivors.append(unit)
+                continue
+            result.structures_destroyed.append(
+                (frame, unit.unit_type, [unit.x, unit.y], unit.player_index)
+            )
+            result.structure_cost_lost[unit.player_index] += unit.spec.cost[0]
+            destroyed = destroyed | {(unit.x, unit.y)}
+        for unit in mobiles:
+            unit.path = None
+        supports = [unit for unit in supports if unit.health > 0]
+        return survivors, supports, mobiles, destroyed
+
+    def __shield(self, supports, mobiles):
+        """Every support shields each friendly mobile unit in range once"""
+        hit_radius = self.registry.get_hit_radius
+        for support in supports:
+            reach = support.spec.shieldRange + hit_radius
+            for unit in mobiles:
+                if (
+                    unit.player_index != support.player_index
+                    or support in unit.shielded_by
+                    or math.hypot(unit.x - support.x, unit.y - support.y) >= reach
+                ):
+                    continue
+                unit.shielded_by.add(support)
+                unit.health += support.spec.shieldPerUnit
+
+    def __self_destruct_damage(self, unit, units, result):
+        """Applies the self destruct damage of a unit that could not move any further"""
+        steps_required, radius, damage_f, damage_i = self.get_self_destruct(
+            unit.unit_type
+        )
+        if unit.steps_moved < steps_required:
+            return
+        reach = radius + self.registry.get_hit_radius
+        for other in units:
+            if (
+                other.player_index == unit.player_index
+                or other.health <= 0
+                or math.hypot(other.x - unit.x, other.y - unit.y) >= reach
+            ):
+                continue
+            damage = damage_f if other.stationary else damage_i
+            result.damage_dealt[unit.player_index] += min(damage, other.health)
+            other.health -= damage
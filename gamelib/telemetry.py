@@ -0,0 +1,151 @@
+import json
+import os
+import threading
+
+from .config_registry import get_registry
+
+# The writer of the game being played in each thread, for annotate
+_local = threading.local()
+
+
+class TelemetryWriter:
+    """Appends one JSON Lines record per turn to a file, for charting many games.
+
+    A record is written when the next turn starts or the game ends, so it covers the turn and the action phase that follows it.
+    Records are written through a large buffer and flushed once, so a turn costs at most one flush. Each record holds:
+        * turn: The turn number
+        * my_time, enemy_time: The times reported in the turn message
+        * health, SP, MP: [yours, your opponent's] at the start of the turn
+        * structures: [yours, your opponent's], each mapping a structure type to the number on the board. UP counts upgrades.
+        * on_turn: The milliseconds on_turn took
+        * frames, on_action_frame, slowest_frame: The number of action frames, the total and the slowest milliseconds of on_action_frame
+        * breaches: [x, y, damage, player_index] for every breach of the action phase, player_index 0 being you
+        * Anything added with annotate during the turn
+
+    Attributes :
+        * path (str): The file records are appended to
+        * records (int): The number of records written
+
+    """
+
+    def __init__(self, path, buffer_size=65536):
+        self.path = path
+        self.records = 0
+        self.__file = open(path, "a", buffering=buffer_size)
+        self.__record = None
+        self.__types = []
+        self.__previous = None
+
+    @classmethod
+    def from_environment(cls, environ=None):
+        """Creates a writer appending to GAMELIB_TELEMETRY, or returns None if it is not set"""
+        environ = os.environ if environ is None else environ
+        path = environ.get("GAMELIB_TELEMETRY")
+        return cls(path) if path else None
+
+    def start_game(self, config):
+        """Reads the unit types from the game config and makes this the writer annotate adds to in the calling thread"""
+        registry = get_registry(config)
+        counted = set(registry.STRUCTURE_TYPES) | {registry.UPGRADE}
+        self.__types = [
+            (index, unit["shorthand"])
+            for index, unit in enumerate(config["unitInformation"])
+            if unit.get("shorthand") in counted
+        ]
+        self.__previous = getattr(_local, "writer", None)
+        _local.writer = self
+
+    def begin_turn(self, state):
+        """Writes the record of the previous turn and starts the record of a new one
+
+        Args:
+            state: The decoded turn message
+
+        """
+        self.end_turn()
+        stats = [state["p1Stats"], state["p2Stats"]]
+        self.__record = {
+            "turn": int(state["turnInfo"][1]),
+            "my_time": stats[0][3],
+            "enemy_time": stats[1][3],
+            "health": [stats[0][0], stats[1][0]],
+            "SP": [stats[0][1], stats[1][1]],
+            "MP": [stats[0][2], stats[1][2]],
+            "structures": [
+                {
+                    shorthand: len(units[index])
+                    for index, shorthand in self.__types
+                    if index < len(units)
+                }
+                for units in (state["p1Units"], state["p2Units"])
+            ],
+            "on_turn": 0.0,
+            "frames": 0,
+            "on_action_frame": 0.0,
+            "slowest_frame": 0.0,
+            "breaches": [],
+        }
+
+    def add_turn_time(self, seconds):
+        if self.__record is not None:
+            self.__record["on_turn"] += 1000 * seconds
+
+    def add_frame(self, state, seconds):
+        """Adds an action frame and the seconds on_action_frame took to the current record
+
+        Args:
+            state: The decoded frame message
+            seconds: The time on_action_frame took
+
+        """
+        record = self.__record
+        if record is None:
+            return
+        milliseconds = 1000 * seconds
+        record["frames"] += 1
+        record["on_action_frame"] += milliseconds
+        record["slowest_frame"] = max(record["slowest_frame"], milliseconds)
+        for breach in state.get("events", {}).get("breach", []):
+            # The engine numbers players from 1, you being player 1
+            location, damage, player = breach[0], breach[1], breach[4]
+            record["breaches"].append([location[0], location[1], damage, player - 1])
+
+    def annotate(self, name, value):
+        """Adds a field to the current record, which must be JSON serializable"""
+        if self.__record is not None:
+            self.__record[name] = value
+
+    def end_turn(self):
+        """Writes the current record, if any"""
+        record = self.__record
+        if record is None:
+            return
+        self.__record = None
+        for name in ("on_turn", "on_action_frame", "slowest_frame"):
+            record[name] = round(record[name], 3)
+        self.__file.write(json.dumps(record, separators=(",", ":")) + "\n")
+        self.__file.flush()
+        self.records += 1
+
+    def close(self):
+        """Writes the last record and closes the file"""
+        if self.__file.closed:
+            return
+        self.end_turn()
+        self.__file.close()
+        if getattr(_local, "writer", None) is self:
+            _local.writer = self.__previous
+
+
+def annotate(name, value):
+    """Adds a field, such as the attack your strategy chose, to this turn's telemetry record.
+    Does nothing unless telemetry is on.
+
+    Args:
+        name: The name of the field
+        value: A JSON serializable value
+
+    """
+    writer = getattr(_local, "writer", None)
+    if writer is not None:
+        writer.annotate(name, value)
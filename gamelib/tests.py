@@ -1,194 +1,44 @@
 import unittest
 import json
+import random
+import pickle
+import pstats
+import subprocess
+import sys
+import io
+import os
+import tempfile
+import tracemalloc
+import threading
+import time
+import weakref
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 from .game_state import GameState
-from .unit import GameUnit
+from .unit import GameUnit, get_unit_specs
+from .board_tracker import BoardTracker
+from .config_registry import REGISTRY_CACHE_SIZE, get_registry
+from .simulator import ActionSimulator
+from .rollout import RandomDeployPolicy, RolloutEngine
+from .tournament import LocalEngine, Tournament
+from .algocore import AlgoCore
+from .replay import FRAME, TURN, ReplayDriver, ReplayReader, ReplayWriter
+from .util import debug_write, redirect_streams
+from .board_generator import generate_board
+from .profiling import TurnProfiler
+from .memory import MemoryTracker
+from .telemetry import TelemetryWriter
+from . import precompute
+from . import counters, log, telemetry, timing
+from .fixtures import TEST_CONFIG, TURN_0, make_turn
 
 
 class BasicTests(unittest.TestCase):
     def make_turn_0_map(self):
-        config = """
-            {
-            "seasonCompatibilityModeP1": 5,
-            "seasonCompatibilityModeP2": 5,
-            "debug":{
-                "printMapString":false,
-                "printTStrings":false,
-                "printActStrings":false,
-                "printHitStrings":false,
-                "printPlayerInputStrings":false,
-                "printBotErrors":true,
-                "printPlayerGetHitStrings":false
-            },
-            "unitInformation": [
-                {
-                "icon": "S3_filter",
-                "iconxScale": 0.4,
-                "iconyScale": 0.4,
-                "cost1": 1.0,
-                "getHitRadius":0.01,
-                "display":"filter",
-                "shorthand":"FF",
-                "startHealth":75.0,
-                "unitCategory": 0,
-                "refundPercentage": 0.75,
-                "turnsRequiredToRemove": 1,
-                "upgrade": {
-                    "startHealth": 150.0
-                }
-                },
-                {
-                "icon": "S3_encryptor",
-                "iconxScale": 0.5,
-                "iconyScale": 0.5,
-                "cost1":4.0,
-                "getHitRadius":0.01,
-                "display":"encryptor",
-                "shieldRange":0,
-                "shorthand":"EF",
-                "startHealth":30.0,
-                "unitCategory": 0,
-                "refundPercentage": 0.75,
-                "turnsRequiredToRemove": 1,
-                "generatesResource1": 1,
-                "upgrade": {
-                    "generatesResource2": 1
-                }
-                },
-                {
-                "icon": "S3_destructor",
-                "iconxScale": 0.5,
-                "iconyScale": 0.5,
-                "attackDamageWalker":5.0,
-                "cost1":2.0,
-                "getHitRadius":0.01,
-                "display":"destructor",
-                "attackRange":2.5,
-                "shorthand":"DF",
-                "startHealth":90.0,
-                "unitCategory": 0,
-                "refundPercentage": 0.75,
-                "turnsRequiredToRemove": 1,
-                "upgrade": {
-                    "cost1": 4.0,
-                    "attackRange":3.5,
-                    "attackDamageWalker":15.0
-                }
-                },
-                {
-                "icon": "S3_ping",
-                "iconxScale": 0.7,
-                "iconyScale": 0.7,
-                "attackDamageTower":2.0,
-                "attackDamageWalker":2.0,
-                "playerBreachDamage":1.0,
-                "cost2":1.0,
-                "getHitRadius":0.01,
-                "display":"ping",
-                "attackRange":3.5,
-                "shorthand":"PI",
-                "startHealth":15.0,
-                "speed":1,
-                "unitCategory": 1,
-                "selfDestructDamageWalker": 15.0,
-                "selfDestructDamageTower": 15.0,
-                "metalForBreach": 1.0,
-                "selfDestructRange": 1.5,
-                "selfDestructStepsRequired": 5
-                },
-                {
-                "icon": "S3_emp",
-                "iconxScale": 0.47,
-                "iconyScale": 0.47,
-                "attackDamageWalker":6.0,
-                "attackDamageTower":6.0,
-                "playerBreachDamage":1.0,
-                "cost2":3.0,
-                "getHitRadius":0.01,
-                "display":"emp",
-                "attackRange":4.5,
-                "shorthand":"EI",
-                "startHealth":5.0,
-                "speed":0.5,
-                "unitCategory": 1,
-                "selfDestructDamageWalker": 5.0,
-                "selfDestructDamageTower": 5.0,
-                "metalForBreach": 1.0,
-                "selfDestructRange": 1.5,
-                "selfDestructStepsRequired": 5
-                },
-                {
-                "icon": "S3_scrambler",
-                "iconxScale": 0.5,
-                "iconyScale": 0.5,
-                "attackDamageWalker":20.0,
-                "playerBreachDamage":1.0,
-                "cost2":1.0,
-                "getHitRadius":0.01,
-                "display":"scrambler",
-                "attackRange":4.5,
-                "shorthand":"SI",
-                "startHealth":40.0,
-                "speed":0.25,
-                "unitCategory": 1,
-                "selfDestructDamageWalker": 40.0,
-                "selfDestructDamageTower": 40.0,
-                "metalForBreach": 1.0,
-                "selfDestructRange": 1.5,
-                "selfDestructStepsRequired": 5
-                },
-                {
-                "display":"Remove",
-                "shorthand":"RM",
-                "icon": "S3_removal",
-                "iconxScale": 0.4,
-                "iconyScale": 0.4
-                },
-                {
-                "display":"Upgrade",
-                "shorthand":"UP",
-                "icon": "S3_upgrade",
-                "iconxScale": 0.4,
-                "iconyScale": 0.4
-                }
-            ],
-            "timingAndReplay":{
-                "waitTimeBotMax":35000,
-                "playWaitTimeBotMax":40000,
-                "waitTimeManual":1820000,
-                "waitForever":false,
-                "waitTimeBotSoft":5000,
-                "playWaitTimeBotSoft":10000,
-                "replaySave":1,
-                "playReplaySave":0,
-                "storeBotTimes":true,
-                "waitTimeStartGame":3000,
-                "waitTimeEndGame":3000
-            },
-            "resources":{
-                "turnIntervalForBitCapSchedule":10,
-                "turnIntervalForBitSchedule":10,
-                "bitRampBitCapGrowthRate":5.0,
-                "roundStartBitRamp":10,
-                "bitGrowthRate":1.0,
-                "startingHP":40.0,
-                "maxBits":150.0,
-                "bitsPerRound":5.0,
-                "coresPerRound":5.0,
-                "coresForPlayerDamage":1.0,
-                "startingBits":5.0,
-                "bitDecayPerRound":0.25,
-                "startingCores":20.0
-            },
-            "misc":{
-                "numBlockedLocations": 0,
-                "blockedLocations": [
-                ]
-            }
-        }
-        """
-        turn_0 = """{"p2Units":[[],[],[],[],[],[],[]],"turnInfo":[0,0,-1],"p1Stats":[30.0,25.0,5.0,0],"p1Units":[[],[],[],[],[],[],[]],"p2Stats":[30.0,25.0,5.0,0],"events":{"selfDestruct":[],"breach":[],"damage":[],"shield":[],"move":[],"spawn":[],"death":[],"attack":[],"melee":[]}}"""
-
-        state = GameState(json.loads(config), turn_0)
+        state = GameState(json.loads(TEST_CONFIG), TURN_0)
         state.suppress_warnings(True)
         return state
 
@@ -355,6 +205,27 @@ class BasicTests(unittest.TestCase):
         self.future_turn_testing_function(game, 11.6, 2)
         self.future_turn_testing_function(game, 13.7, 3)
 
+    def test_MP_trajectory(self):
+        for turn_number in (0, 4, 9):
+            game = GameState(json.loads(TEST_CONFIG), make_turn(turn_number=turn_number))
+            trajectories = game.project_MP_trajectory(12, [7.5, 0])
+            self.assertEqual(2, len(trajectories))
+            for turns in range(1, 13):
+                self.assertEqual(
+                    game.project_future_MP(turns, 0, 7.5), trajectories[0][turns - 1]
+                )
+                self.assertEqual(
+                    game.project_future_MP(turns, 1), trajectories[1][turns - 1]
+                )
+
+    def test_SP_trajectory(self):
+        game = self.make_turn_0_map()
+        income = game.registry.cores_per_round
+        self.assertEqual(
+            [[25.0 + income, 25.0 + 2 * income], [10.0 + income, 10.0 + 2 * income]],
+            game.project_SP_trajectory(2, [25.0, 10.0]),
+        )
+
     def future_turn_testing_function(self, game, expected, turns):
         actual = game.project_future_MP(turns)
         self.assertAlmostEqual(
@@ -363,3 +234,1254 @@ class BasicTests(unittest.TestCase):
             0,
             "Expected {} MP {} turns from now, got {}".format(expected, turns, actual),
         )
+
+
+class BoardTrackerTests(unittest.TestCase):
+    def make_tracker(self):
+        return BoardTracker(json.loads(TEST_CONFIG))
+
+    def test_first_update_places_units(self):
+        tracker = self.make_tracker()
+        state = tracker.update(make_turn({0: [[13, 10, 75.0]]}, {2: [[13, 17, 90.0]]}))
+        self.assertIs(state.game_map, tracker.game_map)
+        self.assertEqual("FF", state.contains_stationary_unit([13, 10]).unit_type)
+        self.assertEqual(1, state.contains_stationary_unit([13, 17]).player_index)
+        self.assertEqual({(13, 10), (13, 17)}, tracker.changed_tiles)
+        self.assertEqual({(13, 10), (13, 17)}, tracker.blocking_changes)
+
+    def test_only_diff_is_applied(self):
+        tracker = self.make_tracker()
+        tracker.update(make_turn({0: [[13, 10, 75.0], [12, 10, 75.0]]}))
+        kept = tracker.game_map[12, 10][0]
+        damaged = tracker.game_map[13, 10][0]
+        state = tracker.update(make_turn({0: [[13, 10, 40.0]], 2: [[3, 12, 90.0]]}))
+        self.assertEqual({(13, 10), (12, 10), (3, 12)}, tracker.changed_tiles)
+        self.assertEqual({(12, 10), (3, 12)}, tracker.blocking_changes)
+        self.assertIs(damaged, state.game_map[13, 10][0], "Unit should be reused")
+        self.assertEqual(40.0, damaged.health)
+        self.assertEqual([], state.game_map[12, 10])
+        self.assertIsNot(kept, state.contains_stationary_unit([3, 12]))
+
+    def test_flags_and_local_changes_resync(self):
+        tracker = self.make_tracker()
+        state = tracker.update(make_turn({2: [[13, 10, 90.0]]}))
+        state.suppress_warnings(True)
+        state.attempt_spawn("FF", [12, 10])
+        state.attempt_spawn("PI", [13, 0], 2)
+        tracker.update(make_turn({2: [[13, 10, 90.0]], 7: [[13, 10, 0.0]]}))
+        self.assertEqual({(13, 10), (12, 10), (13, 0)}, tracker.changed_tiles)
+        self.assertEqual([], tracker.game_map[12, 10])
+        self.assertEqual([], tracker.game_map[13, 0])
+        self.assertTrue(tracker.game_map[13, 10][0].upgraded)
+        self.assertEqual(3.5, tracker.game_map[13, 10][0].attackRange)
+        tracker.update(make_turn({2: [[13, 10, 90.0]], 7: [[13, 10, 0.0]]}))
+        self.assertEqual(set(), tracker.changed_tiles)
+
+    def test_confirmed_spawn_is_a_change(self):
+        tracker = self.make_tracker()
+        state = tracker.update(make_turn({}))
+        state.attempt_spawn("FF", [13, 5])
+        health = state.contains_stationary_unit([13, 5]).health
+        tracker.update(make_turn({0: [[13, 5, health]]}))
+        self.assertEqual({(13, 5)}, tracker.changed_tiles)
+        self.assertEqual({(13, 5)}, tracker.blocking_changes)
+        tracker.update(make_turn({0: [[13, 5, health]]}))
+        self.assertEqual(set(), tracker.changed_tiles)
+
+
+class LazyGameStateTests(unittest.TestCase):
+    def make_states(self):
+        turn = make_turn(
+            {0: [[13, 10, 60.0]], 2: [[3, 12, 90.0]], 3: [[13, 0, 15.0]], 7: [[3, 12, 0.0]]},
+            {2: [[13, 17, 90.0]], 6: [[13, 17, 0.0]]},
+        )
+        config = json.loads(TEST_CONFIG)
+        return GameState(config, turn), GameState(config, turn, lazy=True)
+
+    def test_units_created_on_demand(self):
+        eager, lazy = self.make_states()
+        self.assertEqual(0, lazy.game_map.deferred_occupancy([20, 10]))
+        self.assertEqual(
+            lazy.game_map.OCCUPIED_MOBILE, lazy.game_map.deferred_occupancy([13, 0])
+        )
+        self.assertFalse(lazy.contains_stationary_unit([13, 0]))
+        self.assertEqual(
+            lazy.game_map.OCCUPIED_MOBILE,
+            lazy.game_map.deferred_occupancy([13, 0]),
+            "Checking for a structure should not create mobile units",
+        )
+        self.assertEqual(
+            lazy.game_map.OCCUPIED_STRUCTURE, lazy.game_map.deferred_occupancy([3, 12])
+        )
+        turret = lazy.contains_stationary_unit([3, 12])
+        self.assertEqual(0, lazy.game_map.deferred_occupancy([3, 12]))
+        self.assertIs(turret, lazy.game_map[3, 12][0])
+
+    def test_matches_eager_parsing(self):
+        eager, lazy = self.make_states()
+        for location in eager.game_map:
+            self.assertEqual(
+                [str(unit) for unit in eager.game_map[location]],
+                [str(unit) for unit in lazy.game_map[location]],
+            )
+        self.assertTrue(lazy.game_map[3, 12][0].upgraded)
+        self.assertTrue(lazy.game_map[13, 17][0].pending_removal)
+        self.assertEqual(eager.get_resources(1), lazy.get_resources(1))
+
+    def test_writes_replace_deferred_units(self):
+        _, lazy = self.make_states()
+        lazy.game_map.add_unit("PI", [13, 0], 0)
+        self.assertEqual(2, len(lazy.game_map[13, 0]))
+        lazy.game_map.remove_unit([13, 10])
+        self.assertEqual([], lazy.game_map[13, 10])
+        self.assertEqual(0, lazy.game_map.deferred_occupancy([13, 10]))
+
+
+class UnitSpecTests(unittest.TestCase):
+    def test_units_share_specs(self):
+        config = json.loads(TEST_CONFIG)
+        first = GameUnit("DF", config, 0, None, 3, 12)
+        second = GameUnit("DF", config, 1, 40.0, 24, 12)
+        self.assertIs(first.spec, second.spec)
+        self.assertIs(get_unit_specs(config)["DF"], first.spec)
+        self.assertEqual(90.0, first.health)
+        self.assertEqual(40.0, second.health)
+        self.assertEqual([2.0, 0], first.cost)
+        self.assertIs(config, first.config)
+        with self.assertRaises(AttributeError):
+            first.spec.attackRange = 10
+        with self.assertRaises(AttributeError):
+            first.some_new_attribute = True
+
+    def test_upgrade_switches_spec(self):
+        config = json.loads(TEST_CONFIG)
+        unit = GameUnit("DF", config, 0, None, 3, 12)
+        other = GameUnit("DF", config, 0, None, 4, 12)
+        unit.upgrade()
+        self.assertTrue(unit.upgraded)
+        self.assertEqual(3.5, unit.attackRange)
+        self.assertEqual(15.0, unit.damage_i)
+        self.assertEqual(0, unit.damage_f)
+        self.assertEqual(90.0, unit.max_health)
+        self.assertEqual([6.0, 0], unit.cost)
+        self.assertEqual(2.5, other.attackRange, "Upgrading must not leak to other units")
+        unit.upgrade()
+        self.assertEqual([6.0, 0], unit.cost)
+
+    def test_assigned_statistics(self):
+        config = json.loads(TEST_CONFIG)
+        unit = GameUnit("DF", config, 0, None, 3, 12)
+        other = GameUnit("DF", config, 0, None, 4, 12)
+        unit.attackRange = 3.0
+        unit.damage_i = 7.0
+        unit.damage_f = 1.0
+        unit.max_health = 100.0
+        unit.cost = [3.0, 1.0]
+        self.assertEqual(3.0, unit.attackRange)
+        self.assertEqual(7.0, unit.damage_i)
+        self.assertEqual(1.0, unit.damage_f)
+        self.assertEqual(100.0, unit.max_health)
+        self.assertEqual([3.0, 1.0], unit.cost)
+        self.assertIs(unit.cost, unit.cost)
+        self.assertEqual(2.5, other.attackRange, "Assignments must not leak to other units")
+        self.assertEqual([2.0, 0], other.cost)
+        unit.upgrade()
+        self.assertEqual(3.5, unit.attackRange)
+        self.assertEqual(15.0, unit.damage_i)
+        self.assertEqual(1.0, unit.damage_f)
+        self.assertEqual([7.0, 1.0], unit.cost)
+        unit.attackRange = 5.0
+        copy = pickle.loads(pickle.dumps(unit))
+        self.assertEqual(5.0, copy.attackRange)
+        self.assertEqual([7.0, 1.0], copy.cost)
+        self.assertTrue(copy.upgraded)
+
+
+class ConfigRegistryTests(unittest.TestCase):
+    def test_registry_is_compiled_once(self):
+        config = json.loads(TEST_CONFIG)
+        first = GameState(config, TURN_0)
+        second = GameState(config, TURN_0)
+        self.assertIs(first.registry, second.registry)
+        self.assertIs(get_registry(config), first.game_map.registry)
+        registry = first.registry
+        self.assertEqual("FF", registry.WALL)
+        self.assertEqual(2, registry.UNIT_TYPE_TO_INDEX["DF"])
+        self.assertEqual(["FF", "EF", "DF"], registry.STRUCTURE_TYPES)
+        self.assertEqual([4.0, 0], registry.upgrade_costs["DF"])
+        self.assertEqual(4.5, registry.max_attack_range)
+        self.assertEqual(0.01, registry.get_hit_radius)
+
+    def test_differently_configured_states(self):
+        config = json.loads(TEST_CONFIG)
+        other_config = json.loads(TEST_CONFIG)
+        other_config["unitInformation"][2]["shorthand"] = "TT"
+        other_config["unitInformation"][2]["cost1"] = 7.0
+        game = GameState(config, TURN_0)
+        other = GameState(other_config, TURN_0)
+        self.assertEqual([2.0, 0], game.type_cost("DF"))
+        self.assertEqual([7.0, 0], other.type_cost("TT"))
+        self.assertEqual(1, other.attempt_spawn("TT", [13, 10]))
+        self.assertEqual(1, game.attempt_spawn("DF", [13, 10]))
+        self.assertEqual(18.0, other.get_resource(other.SP))
+        self.assertEqual(23.0, game.get_resource(game.SP))
+        self.assertEqual("TT", other.contains_stationary_unit([13, 10]).unit_type)
+
+    def test_registries_of_unused_configs_are_freed(self):
+        config = json.loads(TEST_CONFIG)
+        registry = weakref.ref(get_registry(config))
+        del config
+        for _ in range(REGISTRY_CACHE_SIZE):
+            get_registry(json.loads(TEST_CONFIG))
+        self.assertIsNone(registry())
+
+
+@unittest.skipIf(numpy is None, "numpy is not installed")
+class UnitTableTests(unittest.TestCase):
+    def make_state(self):
+        turn = make_turn(
+            {0: [[13, 10, 60.0]], 2: [[3, 12, 90.0]], 7: [[3, 12, 0.0]]},
+            {2: [[13, 17, 90.0], [12, 16, 45.0]], 0: [[14, 16, 75.0]]},
+        )
+        state = GameState(json.loads(TEST_CONFIG), turn)
+        state.suppress_warnings(True)
+        return state
+
+    def test_columns_match_parsed_units(self):
+        state = self.make_state()
+        table = state.unit_table
+        self.assertEqual(5, len(table))
+        rows = sorted(zip(table.x.tolist(), table.y.tolist(), table.health.tolist()))
+        self.assertEqual(
+            [(3, 12, 90.0), (12, 16, 45.0), (13, 10, 60.0), (13, 17, 90.0), (14, 16, 75.0)],
+            rows,
+        )
+        upgraded = table.upgraded & (table.x == 3)
+        self.assertEqual([3.5], table.attack_range[upgraded].tolist())
+        self.assertEqual(3, int(table.select(player_index=1).sum()))
+        self.assertEqual(3, int(table.select(unit_type="DF").sum()))
+
+    def test_damage_matches_get_attackers(self):
+        state = self.make_state()
+        locations = [[13, 13], [12, 14], [13, 14], [3, 13], [20, 10]]
+        damage = state.unit_table.damage_at(locations, 0)
+        for location, total in zip(locations, damage.tolist()):
+            expected = sum(unit.damage_i for unit in state.get_attackers(location, 0))
+            self.assertEqual(expected, total, "Damage mismatch at {}".format(location))
+
+    def test_kept_in_sync_with_actions(self):
+        state = self.make_state()
+        state.attempt_spawn("DF", [10, 10])
+        table = state.unit_table
+        self.assertEqual(6, len(table))
+        state.attempt_spawn("PI", [13, 0], 3)
+        state.attempt_upgrade([10, 10])
+        self.assertEqual(9, len(table))
+        self.assertEqual(3, int(table.select(unit_type="PI").sum()))
+        row = (table.x == 10) & (table.y == 10)
+        self.assertEqual([True], table.upgraded[row].tolist())
+        histogram = table.health_histogram(bins=2, player_index=0)
+        self.assertEqual([0, 2], histogram["DF"][0].tolist())
+        self.assertEqual([3, 0], histogram["PI"][0].tolist())
+
+
+class ForkTests(unittest.TestCase):
+    def make_state(self, lazy=False):
+        turn = make_turn(
+            {2: [[13, 10, 60.0], [3, 12, 90.0]]},
+            {2: [[13, 17, 90.0]]},
+        )
+        state = GameState(json.loads(TEST_CONFIG), turn, lazy=lazy)
+        state.suppress_warnings(True)
+        return state
+
+    def test_fork_shares_untouched_units(self):
+        state = self.make_state()
+        fork = state.fork()
+        self.assertIs(state.game_map[13, 10][0], fork.game_map[13, 10][0])
+        self.assertIs(state.registry, fork.registry)
+
+    def test_fork_actions_do_not_leak(self):
+        state = self.make_state()
+        fork = state.fork()
+        self.assertEqual(1, fork.attempt_spawn("FF", [12, 10]))
+        self.assertEqual(2, fork.attempt_spawn("PI", [13, 0], 2))
+        self.assertEqual(1, fork.attempt_upgrade([13, 10]))
+        self.assertEqual(1, fork.attempt_remove([3, 12]))
+        self.assertEqual([], state.game_map[12, 10])
+        self.assertEqual([], state.game_map[13, 0])
+        self.assertFalse(state.game_map[13, 10][0].upgraded)
+        self.assertTrue(fork.game_map[13, 10][0].upgraded)
+        self.assertEqual([], state._build_stack)
+        self.assertEqual([], state._deploy_stack)
+        self.assertEqual([25.0, 5.0], state.get_resources())
+        self.assertEqual([20.0, 3.0], fork.get_resources())
+
+    def test_parent_changes_do_not_leak(self):
+        state = self.make_state()
+        fork = state.fork()
+        state.attempt_upgrade([13, 10])
+        state.game_map.add_unit("PI", [13, 0])
+        self.assertFalse(fork.game_map[13, 10][0].upgraded)
+        self.assertEqual([], fork.game_map[13, 0])
+        second = fork.fork()
+        second.game_map.remove_unit([3, 12])
+        self.assertEqual(1, len(fork.game_map[3, 12]))
+
+    def test_fork_of_lazy_state(self):
+        state = self.make_state(lazy=True)
+        fork = state.fork()
+        fork.attempt_upgrade([13, 10])
+        self.assertFalse(state.game_map[13, 10][0].upgraded)
+        self.assertTrue(fork.game_map[13, 10][0].upgraded)
+        self.assertEqual(90.0, fork.contains_stationary_unit([3, 12]).health)
+        self.assertEqual(
+            state.game_map.OCCUPIED_STRUCTURE,
+            state.game_map.deferred_occupancy([3, 12]),
+        )
+
+    @unittest.skipIf(numpy is None, "numpy is not installed")
+    def test_fork_unit_table(self):
+        state = self.make_state()
+        table = state.unit_table
+        fork = state.fork()
+        fork.attempt_spawn("FF", [12, 10])
+        self.assertEqual(3, len(state.unit_table))
+        self.assertEqual(4, len(fork.unit_table))
+        self.assertIs(table, state.unit_table)
+
+
+class TransactionTests(unittest.TestCase):
+    def make_state(self):
+        turn = make_turn({2: [[13, 10, 60.0], [3, 12, 90.0]]})
+        state = GameState(json.loads(TEST_CONFIG), turn)
+        state.suppress_warnings(True)
+        return state
+
+    def snapshot(self, state):
+        return (
+            [str(unit) for location in state.game_map for unit in state.game_map[location]],
+            list(state._build_stack),
+            list(state._deploy_stack),
+            state.get_resources(),
+        )
+
+    def test_rollback_undoes_plan(self):
+        state = self.make_state()
+        before = self.snapshot(state)
+        savepoint = state.savepoint()
+        state.attempt_spawn("FF", [[12, 10], [11, 10]])
+        state.attempt_spawn("PI", [13, 0], 3)
+        state.attempt_upgrade([13, 10])
+        state.attempt_remove([3, 12])
+        self.assertNotEqual(before, self.snapshot(state))
+        state.rollback(savepoint)
+        self.assertEqual(before, self.snapshot(state))
+        self.assertFalse(state.contains_stationary_unit([13, 10]).upgraded)
+        state.release(savepoint)
+        self.assertIsNone(state._journal)
+
+    def test_nested_savepoints(self):
+        state = self.make_state()
+        outer = state.savepoint()
+        state.attempt_spawn("FF", [12, 10])
+        after_wall = self.snapshot(state)
+        inner = state.savepoint()
+        state.attempt_upgrade([12, 10])
+        state.attempt_spawn("PI", [13, 0], 2)
+        state.rollback(inner)
+        self.assertEqual(after_wall, self.snapshot(state))
+        state.release(inner)
+        state.rollback(outer)
+        self.assertEqual([], state.game_map[12, 10])
+        self.assertEqual(25.0, state.get_resource(state.SP))
+
+    def test_rollback_of_fork_keeps_parent_intact(self):
+        state = self.make_state()
+        fork = state.fork()
+        savepoint = fork.savepoint()
+        fork.attempt_upgrade([13, 10])
+        fork.rollback(savepoint)
+        fork.attempt_upgrade([13, 10])
+        self.assertFalse(state.game_map[13, 10][0].upgraded)
+        self.assertTrue(fork.game_map[13, 10][0].upgraded)
+
+    def test_rollback_after_fork_keeps_fork_intact(self):
+        state = self.make_state()
+        savepoint = state.savepoint()
+        state.attempt_spawn("PI", [13, 0], 2)
+        state.attempt_upgrade([13, 10])
+        fork = state.fork()
+        after = self.snapshot(fork)
+        state.rollback(savepoint)
+        self.assertEqual(after, self.snapshot(fork))
+        self.assertEqual(2, len(fork.game_map[13, 0]))
+        self.assertTrue(fork.game_map[13, 10][0].upgraded)
+        self.assertEqual([], state.game_map[13, 0])
+        self.assertFalse(state.game_map[13, 10][0].upgraded)
+        fork.attempt_spawn("PI", [13, 0])
+        self.assertEqual([], state.game_map[13, 0])
+
+    @unittest.skipIf(numpy is None, "numpy is not installed")
+    def test_rollback_after_fork_keeps_fork_unit_table(self):
+        state = self.make_state()
+        state.unit_table
+        savepoint = state.savepoint()
+        state.attempt_spawn("DF", [12, 10])
+        state.attempt_upgrade([13, 10])
+        fork = state.fork()
+        state.rollback(savepoint)
+        self.assertEqual(2, len(state.unit_table))
+        self.assertFalse(state.unit_table.upgraded.any())
+        self.assertEqual(3, len(fork.unit_table))
+        self.assertEqual(1, fork.unit_table.upgraded.sum())
+
+    @unittest.skipIf(numpy is None, "numpy is not installed")
+    def test_rollback_unit_table_built_after_savepoint(self):
+        state = self.make_state()
+        savepoint = state.savepoint()
+        state.attempt_spawn("DF", [12, 10])
+        self.assertEqual(3, len(state.unit_table))
+        state.rollback(savepoint)
+        self.assertEqual(2, len(state.unit_table))
+
+    def test_transaction_rolls_back_on_error(self):
+        state = self.make_state()
+        before = self.snapshot(state)
+        with self.assertRaises(ValueError):
+            with state.transaction():
+                state.attempt_spawn("DF", [12, 10])
+                raise ValueError()
+        self.assertEqual(before, self.snapshot(state))
+        with state.transaction():
+            state.attempt_spawn("DF", [12, 10])
+        self.assertEqual("DF", state.contains_stationary_unit([12, 10]).unit_type)
+        self.assertIsNone(state._journal)
+
+    @unittest.skipIf(numpy is None, "numpy is not installed")
+    def test_rollback_unit_table(self):
+        state = self.make_state()
+        table = state.unit_table
+        savepoint = state.savepoint()
+        state.attempt_spawn("DF", [12, 10])
+        state.attempt_upgrade([[13, 10], [12, 10]])
+        self.assertEqual(3, len(table))
+        state.rollback(savepoint)
+        self.assertEqual(2, len(table))
+        self.assertFalse(table.upgraded.any())
+        self.assertEqual([2.5, 2.5], table.attack_range.tolist())
+        state.attempt_spawn("DF", [12, 10])
+        self.assertEqual(3, len(table))
+
+
+class SpawnManyTests(unittest.TestCase):
+    def make_state(self):
+        turn = make_turn({0: [[13, 3, 60.0]], 3: [[0, 13, 15.0]]})
+        state = GameState(json.loads(TEST_CONFIG), turn)
+        state.suppress_warnings(True)
+        return state
+
+    def test_spawn_mask(self):
+        state = self.make_state()
+        structures = state.get_spawn_mask("FF")
+        mobiles = state.get_spawn_mask("PI")
+        self.assertNotIn((13, 3), structures)
+        self.assertNotIn((0, 13), structures)
+        self.assertIn((0, 13), mobiles)
+        self.assertNotIn((13, 3), mobiles)
+        self.assertNotIn((13, 14), structures)
+        self.assertEqual(28, len(mobiles))
+        state.attempt_spawn("FF", [13, 0])
+        self.assertNotIn((13, 0), state.get_spawn_mask("PI"))
+        self.assertNotIn((13, 0), state.get_spawn_mask("FF"))
+
+    def test_can_spawn_many_matches_can_spawn(self):
+        state = self.make_state()
+        locations = [[13, 0], [13, 3], [0, 13], [5, 20], [10, 5], [14, 0]]
+        for unit_type in ("FF", "PI"):
+            expected = [state.can_spawn(unit_type, location) for location in locations]
+            self.assertEqual(expected, state.can_spawn_many(unit_type, locations))
+
+    def test_can_spawn_many_is_cumulative(self):
+        state = self.make_state()
+        self.assertEqual(
+            [True, True, False],
+            state.can_spawn_many("PI", [[13, 0], [14, 0], [0, 13]], [2, 3, 1]),
+        )
+        self.assertEqual([True, False], state.can_spawn_many("FF", [[10, 5], [10, 5]]))
+
+    def test_attempt_spawn_many_matches_attempt_spawn(self):
+        locations = [[13, 0], [13, 3], [0, 13], [14, 0], [27, 13]]
+        counts = [2, 1, 1, 2, 4]
+        for unit_type in ("PI", "DF"):
+            state = self.make_state()
+            many = state.fork()
+            expected = [
+                state.attempt_spawn(unit_type, location, count)
+                for location, count in zip(locations, counts)
+            ]
+            self.assertEqual(
+                expected, many.attempt_spawn_many(unit_type, locations, counts)
+            )
+            self.assertEqual(state.get_resources(), many.get_resources())
+            self.assertEqual(state._build_stack, many._build_stack)
+            self.assertEqual(state._deploy_stack, many._deploy_stack)
+
+    def test_attempt_spawn_many_with_duplicates_and_zero_counts(self):
+        locations = [[5, 8], [5, 8], [13, 0], [6, 7], [13, 0], [6, 7]]
+        counts = [0, 1, 0, 1, 2, 1]
+        for unit_type in ("FF", "PI"):
+            state = self.make_state()
+            state.suppress_warnings(True)
+            many = state.fork()
+            # attempt_spawn returns None rather than 0 when asked for no units
+            expected = [
+                state.attempt_spawn(unit_type, location, count) or 0
+                for location, count in zip(locations, counts)
+            ]
+            self.assertEqual(
+                expected, many.attempt_spawn_many(unit_type, locations, counts)
+            )
+            self.assertEqual(state._build_stack, many._build_stack)
+            self.assertEqual(state._deploy_stack, many._deploy_stack)
+
+    def test_attempt_spawn_many_rolls_back(self):
+        state = self.make_state()
+        savepoint = state.savepoint()
+        self.assertEqual(
+            [2, 2, 1], state.attempt_spawn_many("PI", [[13, 0], [14, 0], [0, 13]], 2)
+        )
+        self.assertEqual(0.0, state.get_resource(state.MP))
+        state.rollback(savepoint)
+        self.assertEqual(5.0, state.get_resource(state.MP))
+        self.assertEqual([], state.game_map[13, 0])
+        self.assertEqual([], state._deploy_stack)
+
+
+class BatchedTargetingTests(unittest.TestCase):
+    def make_random_state(self, seed):
+        rng = random.Random(seed)
+        config = json.loads(TEST_CONFIG)
+        state = GameState(config, TURN_0)
+        registry = state.registry
+        for _ in range(120):
+            x, y = rng.randrange(28), rng.randrange(28)
+            if not state.game_map.in_arena_bounds([x, y]):
+                continue
+            player_index = 0 if y < 14 else 1
+            if rng.random() < 0.2:
+                player_index = 1 - player_index
+            units = state.game_map[x, y]
+            if rng.random() < 0.5:
+                if units:
+                    continue
+                unit_type = rng.choice(registry.STRUCTURE_TYPES)
+            else:
+                if any(unit.stationary for unit in units):
+                    continue
+                unit_type = rng.choice([registry.SCOUT, registry.DEMOLISHER, registry.INTERCEPTOR])
+            state.game_map.add_unit(unit_type, [x, y], player_index)
+            unit = state.game_map[x, y][-1]
+            unit.health = rng.choice([1.0, 5.0, 15.0, 40.0])
+            if unit.stationary and rng.random() < 0.3:
+                unit.upgrade()
+        return state
+
+    def test_matches_get_target(self):
+        for seed in range(10):
+            state = self.make_random_state(seed)
+            results = state.get_targets()
+            self.assertTrue(results)
+            for attacker, target in results:
+                self.assertIs(state.get_target(attacker), target)
+
+    def test_explicit_attackers(self):
+        state = self.make_random_state(3)
+        wall = GameUnit("FF", state.config, 0, None, 13, 0)
+        scouts = [unit for unit in state.game_map.get_all_units() if unit.unit_type == "PI"]
+        results = state.get_targets([wall] + scouts)
+        self.assertEqual([wall] + scouts, [attacker for attacker, _ in results])
+        self.assertIsNone(results[0][1])
+
+
+class SimulatorTests(unittest.TestCase):
+    def make_simulator(self, p1_units=None, p2_units=None):
+        state = GameState(json.loads(TEST_CONFIG), make_turn(p1_units, p2_units))
+        state.suppress_warnings(True)
+        return state, ActionSimulator(state)
+
+    def test_breach_on_empty_board(self):
+        state, simulator = self.make_simulator()
+        result = simulator.simulate([("PI", 13, 0)] * 3)
+        self.assertEqual(3, result.count_breaches(0))
+        self.assertEqual(0, result.count_breaches(1))
+        self.assertEqual([3.0, 0.0], result.breach_damage)
+        self.assertEqual([27, 14], result.breaches[0][2])
+        self.assertEqual(28, result.frames)
+        result = simulator.simulate([], [("PI", 13, 27)])
+        self.assertEqual([(28, "PI", [27, 13], 1)], result.breaches)
+
+    def test_turrets_damage_units(self):
+        turrets = {2: [[x, 14, 90.0] for x in range(0, 28, 3)]}
+        state, simulator = self.make_simulator(None, turrets)
+        result = simulator.simulate([("PI", 13, 0)])
+        self.assertEqual(0, result.count_breaches(0))
+        self.assertEqual(15.0, result.damage_dealt[1])
+        self.assertEqual([], state.game_map[13, 0])
+        self.assertEqual(90.0, state.contains_stationary_unit([27, 14]).health)
+
+    def test_self_destruct(self):
+        state, simulator = self.make_simulator({0: [[x, 1, 75.0] for x in range(12, 16)]})
+        result = simulator.simulate([("PI", 13, 0)])
+        self.assertEqual([(2, "PI", [14, 0], 0)], result.self_destructs)
+        self.assertEqual([0.0, 0.0], result.damage_dealt)
+
+        walls = {0: [[x, 14, 75.0] for x in range(28)]}
+        state, simulator = self.make_simulator(None, walls)
+        result = simulator.simulate([("PI", 13, 0)])
+        self.assertEqual([27, 13], result.self_destructs[0][2])
+        self.assertGreaterEqual(result.damage_dealt[0], 30.0)
+
+    def test_repath_after_structure_destroyed(self):
+        walls = {0: [[x, 14, 75.0] for x in range(27)] + [[27, 14, 2.0]]}
+        state, simulator = self.make_simulator(None, walls)
+        result = simulator.simulate([("PI", 13, 0)] * 2)
+        self.assertEqual(
+            [("FF", [27, 14], 1)],
+            [entry[1:] for entry in result.structures_destroyed],
+        )
+        self.assertEqual(2, result.count_breaches(0))
+        self.assertEqual(1.0, result.structure_cost_lost[1])
+
+
+@unittest.skipIf(numpy is None, "numpy is not installed")
+class BatchSimulatorTests(unittest.TestCase):
+    def summarize(self, result):
+        return (
+            result.frames,
+            result.breaches,
+            result.self_destructs,
+            result.structures_destroyed,
+            result.breach_damage,
+            result.damage_dealt,
+            result.structure_cost_lost,
+        )
+
+    def test_matches_action_simulator(self):
+        from .batch_simulator import BatchSimulator
+
+        turn = make_turn(
+            {0: [[12, 5, 75.0], [13, 5, 20.0]], 2: [[10, 6, 90.0], [18, 8, 30.0]]},
+            {0: [[x, 14, 75.0] for x in range(20, 28)], 2: [[6, 15, 90.0], [20, 15, 40.0]]},
+        )
+        state = GameState(json.loads(TEST_CONFIG), turn)
+        state.suppress_warnings(True)
+        simulator = ActionSimulator(state)
+        batch = BatchSimulator(state, simulator=simulator)
+        rng = random.Random(7)
+        edges = [[13 - i, i] for i in range(14)] + [[14 + i, i] for i in range(14)]
+        enemy_edges = [[x, 27 - y] for x, y in edges]
+        stacks = []
+        enemy_stacks = []
+        for _ in range(16):
+            stack = []
+            for _ in range(rng.randrange(5)):
+                stack.append((rng.choice(["PI", "EI", "SI"]),) + tuple(rng.choice(edges)))
+            stacks.append(stack)
+            enemy_stack = []
+            for _ in range(rng.randrange(3)):
+                enemy_stack.append((rng.choice(["PI", "SI"]),) + tuple(rng.choice(enemy_edges)))
+            enemy_stacks.append(enemy_stack)
+        expected = [
+            self.summarize(simulator.simulate(stack, enemy_stack))
+            for stack, enemy_stack in zip(stacks, enemy_stacks)
+        ]
+        results = batch.simulate(stacks, enemy_stacks)
+        self.assertEqual(expected, [self.summarize(result) for result in results])
+        self.assertTrue(any(result.structures_destroyed for result in results))
+
+    def test_empty_scenarios(self):
+        from .batch_simulator import BatchSimulator
+
+        state = GameState(json.loads(TEST_CONFIG), make_turn())
+        results = BatchSimulator(state).simulate([[], [("PI", 13, 0)]])
+        self.assertEqual(0, results[0].frames)
+        self.assertEqual(1, results[1].count_breaches(0))
+
+
+class RolloutTests(unittest.TestCase):
+    def make_state(self):
+        state = GameState(json.loads(TEST_CONFIG), make_turn())
+        state.suppress_warnings(True)
+        state.attempt_spawn("DF", [[13, 10], [14, 10], [6, 10], [21, 10]])
+        return state
+
+    def test_pickled_state_shares_specs(self):
+        state = self.make_state()
+        state.attempt_upgrade([[13, 10]])
+        copy = pickle.loads(pickle.dumps(state))
+        turret = copy.contains_stationary_unit([13, 10])
+        self.assertIs(copy.registry.unit_specs["DF"].upgraded_spec, turret.spec)
+        self.assertEqual(3.5, turret.attackRange)
+
+    def test_policy_respects_budget(self):
+        state = self.make_state()
+        policy = RandomDeployPolicy()
+        for seed in range(20):
+            deploy_stack = policy(state, 8.8, random.Random(seed))
+            spent = sum(state.type_cost(unit[0])[1] for unit in deploy_stack)
+            self.assertLessEqual(spent, 8.8)
+            for unit_type, x, y in deploy_stack:
+                self.assertGreaterEqual(y, 14)
+            self.assertEqual(deploy_stack, policy(state, 8.8, random.Random(seed)))
+
+    def test_rollouts_are_reproducible(self):
+        state = self.make_state()
+        engine = RolloutEngine(state, processes=0)
+        self.assertEqual(state.project_future_MP(1, player_index=1), engine.budget)
+        distribution = engine.run(12, seed=5)
+        self.assertTrue(distribution.complete)
+        self.assertEqual(12, len(distribution))
+        self.assertAlmostEqual(1.0, sum(distribution.breach_distribution().values()))
+        pooled = RolloutEngine(state, processes=2).run(12, seed=5)
+        self.assertEqual(distribution.breaches, pooled.breaches)
+        self.assertEqual(distribution.SP_lost, pooled.SP_lost)
+
+    def test_time_budget(self):
+        distribution = RolloutEngine(self.make_state(), processes=0).run(
+            10000, seed=1, time_budget=0.2
+        )
+        self.assertFalse(distribution.complete)
+        self.assertLess(len(distribution), 10000)
+        self.assertIsNone(RolloutEngine(self.make_state()).run(0).quantile([], 0.5))
+
+
+class ScoutRushAlgo(AlgoCore):
+    """Sends every scout it can afford from the same location, and counts its breaches in action frames"""
+
+    def __init__(self):
+        super().__init__()
+        self.breaches = 0
+
+    def on_turn(self, turn_state):
+        state = GameState(self.config, turn_state)
+        state.suppress_warnings(True)
+        state.attempt_spawn(state.registry.SCOUT, [13, 0], 1000)
+        state.submit_turn()
+
+    def on_action_frame(self, turn_string):
+        events = json.loads(turn_string)["events"]
+        self.breaches += sum(1 for breach in events["breach"] if breach[4] == 1)
+
+
+class PackageTests(unittest.TestCase):
+    def test_tools_are_not_imported_with_the_package(self):
+        modules = ["multiprocessing", "cProfile", "tracemalloc", "mmap"]
+        modules += ["gamelib." + name for name in ("memory", "profiling", "replay")]
+        modules += ["gamelib." + name for name in ("rollout", "telemetry", "tournament")]
+        script = "import sys, gamelib; print([m for m in {!r} if m in sys.modules])"
+        output = subprocess.check_output(
+            [sys.executable, "-c", script.format(modules)],
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        )
+        self.assertEqual("[]", output.decode().strip())
+
+
+class TournamentTests(unittest.TestCase):
+    def test_local_game(self):
+        config = json.loads(TEST_CONFIG)
+        for seat in (0, 1):
+            algos = [AlgoCore(), AlgoCore()]
+            algos[seat] = ScoutRushAlgo()
+            engine = LocalEngine(config, max_turns=5)
+            self.assertEqual(seat, engine.play(algos))
+            self.assertEqual(5, engine.turn_number)
+            self.assertEqual(40.0, engine.health[seat])
+            self.assertEqual(40.0 - algos[seat].breaches, engine.health[1 - seat])
+            self.assertEqual([5, 5], [len(latencies) for latencies in engine.latencies])
+            self.assertEqual([None, None], engine.errors)
+
+    def test_tournament(self):
+        config = json.loads(TEST_CONFIG)
+        for processes in (0, 2):
+            tournament = Tournament(
+                ScoutRushAlgo, AlgoCore, config, processes, max_turns=3, action_frames=False
+            )
+            report = tournament.run(4, seed=1)
+            self.assertEqual([4, 0], report.wins)
+            self.assertEqual(1.0, report.win_rate(0))
+            self.assertEqual([3] * 4, report.turns)
+            self.assertEqual(12, len(report.latencies[1]))
+            self.assertGreater(report.games_per_second, 0)
+
+
+class ReplayTests(unittest.TestCase):
+    def make_messages(self, turns=3, frames=4):
+        messages = [TEST_CONFIG.replace("\n", " ")]
+        for turn in range(turns):
+            messages.append(make_turn(turn_number=turn))
+            for frame in range(frames):
+                message = json.loads(make_turn(turn_number=turn))
+                message["turnInfo"] = [1, turn, frame]
+                messages.append(json.dumps(message))
+        messages.append(json.dumps({"turnInfo": [2, turns, -1]}))
+        return messages
+
+    def test_record_algo(self):
+        messages = self.make_messages()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "game.replay")
+            stream = io.StringIO("\n".join(messages) + "\n")
+            redirect_streams(stream, io.StringIO(), io.StringIO())
+            try:
+                AlgoCore().start(path)
+            finally:
+                redirect_streams()
+            with ReplayReader(path) as reader:
+                self.assertEqual(len(messages), len(reader))
+                self.assertEqual(messages, [entry[3] for entry in reader.messages()])
+                self.assertEqual([0, 1, 2], reader.turns)
+                self.assertEqual(messages[0], reader.get_config())
+                self.assertEqual(messages[6], reader.get_turn(1))
+                self.assertEqual(4, reader.frame_count(1))
+                self.assertEqual(messages[15], reader.get_frame(2, 3))
+                self.assertEqual(messages[15], reader.get_frame(2, -1))
+                self.assertEqual((FRAME, 2, 3), reader.get_kind(15))
+
+    def test_unclosed_log(self):
+        messages = self.make_messages(turns=2, frames=0)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "game.replay")
+            for compress in (True, False):
+                writer = ReplayWriter(path, compress)
+                for message in messages[:3]:
+                    writer.write(message)
+                with ReplayReader(path) as reader:
+                    self.assertEqual(3, len(reader))
+                    self.assertEqual(compress, reader.compressed)
+                    self.assertEqual(messages[2], reader.get_turn(1))
+                    self.assertEqual((TURN, 1, -1), reader.get_kind(2))
+                writer.close()
+
+    def test_replay_driver(self):
+        messages = self.make_messages()
+        report = ReplayDriver(messages).run(ScoutRushAlgo())
+        self.assertEqual([0, 1, 2], sorted(report.turn_latencies))
+        self.assertEqual(12, len(report.frame_latencies))
+        self.assertEqual((2, 3), report.frame_latencies[-1][:2])
+        self.assertEqual(["[]", json.dumps([["PI", 13, 0]] * 5)], report.commands[1])
+        self.assertEqual(3, len(report.get_turn_summary()))
+        self.assertEqual(4, report.get_turn_summary()[0][2])
+        self.assertIn("on_turn: 3 calls", str(report))
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "game.replay")
+            with ReplayWriter(path) as writer:
+                for message in messages:
+                    writer.write(message)
+            replayed = ReplayDriver(path).run(ScoutRushAlgo())
+            self.assertEqual([], report.diff_commands(replayed))
+            default = ReplayDriver(path).run(AlgoCore())
+            self.assertEqual([0, 1, 2], report.diff_commands(default))
+
+
+class BenchmarkTests(unittest.TestCase):
+    def test_fixture_boards(self):
+        from . import benchmarks
+
+        config = json.loads(TEST_CONFIG)
+        for name, board in benchmarks.BOARDS.items():
+            state = GameState(config, board(config))
+            self.assertEqual(name == "empty", not state.game_map.get_all_units())
+        state = GameState(config, benchmarks.walled_pockets_board(config))
+        path = state.find_path_to_edge([6, 11])
+        self.assertNotIn(path[-1], state.game_map.get_edge_locations(state.game_map.TOP_RIGHT))
+
+    def test_run(self):
+        from . import benchmarks
+
+        report = benchmarks.run(["dense_maze"], ["get_attackers", "GameState"], 0.001, 1)
+        report = json.loads(json.dumps(report))
+        self.assertEqual(2, len(report["results"]))
+        for result in report["results"]:
+            self.assertGreater(result["ops_per_sec"], 0)
+            self.assertGreaterEqual(result["peak_bytes"], 0)
+        ratios = benchmarks.compare(report, report)
+        self.assertEqual([1.0, 1.0], [ratio for _, _, ratio in ratios])
+
+
+class BoardGeneratorTests(unittest.TestCase):
+    def count_structures(self, state):
+        return sum(1 for unit in state.game_map.get_all_units() if unit.stationary)
+
+    def test_valid_boards(self):
+        config = json.loads(TEST_CONFIG)
+        registry = get_registry(config)
+        for seed in range(10):
+            turn = generate_board(config, seed, 0.3, 0.5, 2, (6, 4))
+            self.assertEqual(turn, generate_board(config, seed, 0.3, 0.5, 2, (6, 4)))
+            state = GameState(config, turn)
+            locations = set()
+            for unit in state.game_map.get_all_units():
+                location = (unit.x, unit.y)
+                if unit.player_index == 1:
+                    location = (27 - unit.x, 27 - unit.y)
+                self.assertIn(location, registry.my_side_locations)
+                if unit.stationary:
+                    self.assertNotIn((unit.x, unit.y), locations)
+                    locations.add((unit.x, unit.y))
+            units = state.game_map.get_all_units()
+            self.assertEqual(10, sum(1 for unit in units if not unit.stationary))
+
+    def test_controls(self):
+        config = json.loads(TEST_CONFIG)
+        sparse = GameState(config, generate_board(config, 1, density=0.05))
+        dense = GameState(config, generate_board(config, 1, density=0.5))
+        self.assertLess(self.count_structures(sparse), self.count_structures(dense))
+
+        open_board = GameState(config, generate_board(config, 1, density=0))
+        maze = GameState(config, generate_board(config, 1, density=0, maze=1))
+        self.assertEqual(0, self.count_structures(open_board))
+        open_path = open_board.find_path_to_edge([13, 0])
+        self.assertGreater(len(maze.find_path_to_edge([13, 0])), 2 * len(open_path))
+
+        # Every free location of your half is reachable from your edges, except inside pockets
+        state = GameState(config, generate_board(config, 2, density=0, pockets=2))
+        free = set(get_registry(config).my_side_locations)
+        free -= {(unit.x, unit.y) for unit in state.game_map.get_all_units()}
+        reached = set(get_registry(config).my_edge_locations) & free
+        frontier = list(reached)
+        while frontier:
+            x, y = frontier.pop()
+            for neighbor in ((x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1)):
+                if neighbor in free and neighbor not in reached:
+                    reached.add(neighbor)
+                    frontier.append(neighbor)
+        self.assertGreaterEqual(len(free - reached), 2)
+
+    def test_full_half(self):
+        config = json.loads(TEST_CONFIG)
+        state = GameState(config, generate_board(config, 1, density=1.0))
+        half = get_registry(config).my_side_locations
+        self.assertEqual(2 * len(half), self.count_structures(state))
+        with self.assertRaises(ValueError):
+            generate_board(config, seed=1, density=1.0, units_per_player=(3, 3))
+
+
+class TimingTests(unittest.TestCase):
+    def test_algo_timing(self):
+        messages = ReplayTests().make_messages()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "timing.txt")
+            stream = io.StringIO("\n".join(messages) + "\n")
+            redirect_streams(stream, io.StringIO(), io.StringIO())
+            try:
+                ScoutRushAlgo().start(timing_output=path)
+            finally:
+                redirect_streams()
+            with open(path) as file:
+                lines = file.read().splitlines()
+        self.assertEqual(3, len(lines))
+        self.assertTrue(lines[2].startswith("timing turn 2: read="))
+        for stage in ("decode=", "GameState=", "on_turn=", "submit_turn=", "x4 ms"):
+            self.assertIn(stage, lines[1])
+        self.assertFalse(timing.is_enabled())
+
+    def test_spans(self):
+        @timing.timed("decorated")
+        def work():
+            with timing.span("inner"):
+                return 1
+
+        self.assertEqual(1, work())
+        self.assertIsNone(timing.start_clock())
+        timing.enable(os.devnull)
+        try:
+            timing.begin_turn(7)
+            work()
+            work()
+            timing.add("manual", (0.5, 0.25))
+            timing.begin_turn(8)
+            turn = timing.get_last_turn()
+        finally:
+            timing.disable()
+        self.assertEqual(7, turn.turn_number)
+        self.assertEqual(["inner", "decorated", "manual"], list(turn.stages))
+        self.assertEqual(2, turn.stages["inner"][0])
+        self.assertIn("manual=500.00/250.00 ms", str(turn))
+        self.assertEqual(8, timing.get_last_turn().turn_number)
+
+
+class CountersTests(unittest.TestCase):
+    def setUp(self):
+        counters.enable()
+        self.addCleanup(counters.disable)
+
+    def test_disabled(self):
+        counters.disable()
+        GameUnit("DF", json.loads(TEST_CONFIG))
+        counters.record_lookup("cache", True)
+        self.assertFalse(counters.is_enabled())
+        self.assertEqual({}, counters.get_counts())
+        counters.enable()
+        GameUnit("DF", json.loads(TEST_CONFIG))
+        self.assertEqual({"GameUnit": 1}, counters.get_counts())
+
+    def test_hot_path_counts(self):
+        turn = make_turn({0: [[13, 5, 60.0], [14, 5, 60.0]], 2: [[3, 12, 75.0]]})
+        game_state = GameState(json.loads(TEST_CONFIG), turn)
+        self.assertEqual(3, game_state.get_counters()["GameUnit"])
+
+        self.assertTrue(game_state.find_path_to_edge([13, 0]))
+        game_state.get_attackers([3, 13], 0)
+        counts = game_state.reset_counters()
+        self.assertEqual(1, counts["navigate_multiple_endpoints"])
+        self.assertGreater(counts["idealness_search_nodes"], 100)
+        self.assertGreater(counts["validate_nodes"], 100)
+        self.assertEqual(1, counts["get_attackers"])
+        self.assertEqual(1, counts["get_locations_in_range"])
+        self.assertEqual(121, counts["get_locations_in_range_cells"])
+        self.assertEqual({}, game_state.get_counters())
+
+    def test_hit_rate(self):
+        self.assertIsNone(counters.get_hit_rate("cache"))
+        for hit in (False, True, True, True):
+            counters.record_lookup("cache", hit)
+        self.assertEqual(0.75, counters.get_hit_rate("cache"))
+
+        other = []
+        thread = threading.Thread(target=lambda: other.append(counters.get_counts()))
+        thread.start()
+        thread.join()
+        self.assertEqual([{}], other)
+        self.assertEqual(3, counters.reset()["cache.hits"])
+
+
+class ProfilingTests(unittest.TestCase):
+    def test_slowest_turns(self):
+        messages = ReplayTests().make_messages()
+        with tempfile.TemporaryDirectory() as directory:
+            profiler = TurnProfiler(directory, slowest=2, frames=True)
+            output = io.StringIO()
+            stream = io.StringIO("\n".join(messages) + "\n")
+            redirect_streams(stream, output, io.StringIO())
+            try:
+                ScoutRushAlgo().start(profiler=profiler)
+            finally:
+                redirect_streams()
+            files = sorted(os.listdir(directory))
+            stats = pstats.Stats(os.path.join(directory, files[0]))
+        self.assertEqual(2, len(files))
+        self.assertTrue(all(name.endswith(".prof") for name in files))
+        self.assertTrue(any(function[2] == "on_turn" for function in stats.stats))
+        self.assertEqual(6, len(output.getvalue().splitlines()))
+
+    def test_sample_slow_turns_only(self):
+        def busy(seconds):
+            end = time.perf_counter() + seconds
+            while time.perf_counter() < end:
+                pass
+
+        with tempfile.TemporaryDirectory() as directory:
+            profiler = TurnProfiler(directory, "sample", threshold=0.02)
+            profiler.run_turn(0, busy, 0.001)
+            profiler.run_turn(1, busy, 0.08)
+            profiler.run_frame(busy, 0.05)
+            profiler.run_turn(2, busy, 0.001)
+            self.assertEqual([1], [turn for turn, _ in profiler.get_kept_turns()])
+            paths = profiler.close()
+            with open(paths[0]) as file:
+                lines = file.read().splitlines()
+        self.assertTrue(paths[0].endswith("turn_1.collapsed"))
+        self.assertTrue(lines)
+        # The most sampled stack, written first, is the busy loop
+        self.assertTrue(lines[0].rsplit(" ", 1)[0].endswith("tests.py:busy"))
+
+    def test_from_environment(self):
+        self.assertIsNone(TurnProfiler.from_environment({}))
+        profiler = TurnProfiler.from_environment(
+            {
+                "GAMELIB_PROFILE": "profiles",
+                "GAMELIB_PROFILE_MODE": "sample",
+                "GAMELIB_PROFILE_THRESHOLD": "500",
+                "GAMELIB_PROFILE_FRAMES": "1",
+            }
+        )
+        self.assertEqual(
+            ("sample", 0.5, True), (profiler.mode, profiler.threshold, profiler.frames)
+        )
+
+
+class MemoryTests(unittest.TestCase):
+    def test_turn_memory(self):
+        config = json.loads(TEST_CONFIG)
+        turn = make_turn({0: [[x, 13, 60.0] for x in range(28)]})
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "memory.txt")
+            tracker = MemoryTracker(path, top=3)
+            tracker.begin_turn(1)
+            kept = [GameState(config, turn) for _ in range(5)]
+            tracker.begin_turn(2)
+            tracker.close()
+            with open(path) as file:
+                lines = file.read().splitlines()
+        self.assertFalse(tracemalloc.is_tracing())
+        self.assertEqual([1, 2], [memory.turn_number for memory in tracker.turns])
+        first = tracker.turns[0]
+        self.assertGreaterEqual(first.live_units, 5 * 28)
+        self.assertGreater(first.peak, 0)
+        self.assertGreater(first.net, 0)
+        self.assertLessEqual(len(first.retained), 3)
+        self.assertIn(first.retained[0][0], ("game_map.py", "game_state.py", "unit.py"))
+        self.assertIn(" retained {}=+".format(first.retained[0][0]), lines[0])
+        self.assertTrue(lines[0].startswith("memory turn 1: peak="))
+        self.assertEqual(2, len(lines))
+        del kept
+
+    def test_from_environment(self):
+        self.assertIsNone(MemoryTracker.from_environment({}))
+        tracker = MemoryTracker.from_environment({"GAMELIB_MEMORY": "stderr"})
+        self.assertEqual("stderr", tracker.output)
+
+
+class _Unformattable:
+    def __format__(self, spec):
+        raise AssertionError("formatted a suppressed message")
+
+
+class LogTests(unittest.TestCase):
+    def setUp(self):
+        self.stream = io.StringIO()
+        redirect_streams(None, None, self.stream)
+
+    def tearDown(self):
+        redirect_streams()
+
+    def test_buffered_log(self):
+        debug_log = log.Log(log.INFO, capacity=3).install()
+        try:
+            log.debug("{}", _Unformattable())
+            log.warning("warning {}", 1)
+            debug_write("written")
+            self.assertEqual("", self.stream.getvalue())
+            log.flush()
+            self.assertEqual("warning 1\nwritten\n", self.stream.getvalue())
+
+            game_state = GameState(json.loads(TEST_CONFIG), make_turn())
+            game_state.suppress_warnings(True)
+            game_state.attempt_spawn("PI", [0, 0], 1)
+            for number in range(4):
+                log.info("info {}", number)
+        finally:
+            debug_log.close()
+        self.assertEqual({log.DEBUG: 1, log.WARNING: 1}, dict(debug_log.suppressed))
+        lines = self.stream.getvalue().splitlines()
+        self.assertEqual("1 log messages were dropped, the buffer was full", lines[2])
+        self.assertEqual(["info 1", "info 2", "info 3"], lines[3:6])
+        self.assertEqual("Suppressed log messages: 1 WARNING, 1 DEBUG", lines[6])
+        debug_write("direct")
+        self.assertTrue(self.stream.getvalue().endswith("direct\n"))
+
+    def test_unbuffered_and_background_flush(self):
+        log.warning("at once {}", [1, 2])
+        self.assertEqual("at once [1, 2]\n", self.stream.getvalue())
+
+        debug_log = log.Log(capacity=10, flush_interval=0.01).install()
+        try:
+            log.error("later")
+            for _ in range(100):
+                if "later" in self.stream.getvalue():
+                    break
+                time.sleep(0.01)
+            self.assertIn("later\n", self.stream.getvalue())
+        finally:
+            debug_log.close()
+
+    def test_from_environment(self):
+        self.assertIsNone(log.Log.from_environment({}))
+        debug_log = log.Log.from_environment(
+            {"GAMELIB_LOG_LEVEL": "debug", "GAMELIB_LOG_BUFFER": "0"}
+        )
+        self.assertEqual((log.DEBUG, 0), (debug_log.level, debug_log.capacity))
+
+
+class AnnotatingAlgo(ScoutRushAlgo):
+    def on_turn(self, turn_state):
+        telemetry.annotate("plan", "scouts")
+        super().on_turn(turn_state)
+
+
+class TelemetryTests(unittest.TestCase):
+    def test_turn_records(self):
+        messages = ReplayTests().make_messages()
+        frame = json.loads(messages[7])
+        frame["events"]["breach"] = [[[20, 26], 1, 3, "id", 1], [[5, 8], 2, 3, "id", 2]]
+        messages[7] = json.dumps(frame)
+        units = {0: [[0, 13, 60.0]], 2: [[3, 12, 75.0]]}
+        turn = json.loads(make_turn(units, turn_number=1))
+        turn["p2Units"][7] = [[0, 13, 0, "id"]]
+        messages[6] = json.dumps(turn)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "telemetry.jsonl")
+            stream = io.StringIO("\n".join(messages) + "\n")
+            redirect_streams(stream, io.StringIO(), io.StringIO())
+            try:
+                AnnotatingAlgo().start(telemetry=TelemetryWriter(path))
+            finally:
+                redirect_streams()
+            with open(path) as file:
+                records = [json.loads(line) for line in file]
+        self.assertEqual([0, 1, 2], [record["turn"] for record in records])
+        record = records[1]
+        self.assertEqual([30.0, 30.0], record["health"])
+        self.assertEqual([25.0, 25.0], record["SP"])
+        self.assertEqual({"FF": 1, "EF": 0, "DF": 1, "UP": 0}, record["structures"][0])
+        self.assertEqual({"FF": 0, "EF": 0, "DF": 0, "UP": 1}, record["structures"][1])
+        self.assertEqual(4, record["frames"])
+        self.assertGreater(record["on_turn"], 0)
+        self.assertEqual([[20, 26, 1, 0], [5, 8, 2, 1]], record["breaches"])
+        self.assertEqual("scouts", record["plan"])
+        self.assertEqual([], records[2]["breaches"])
+        telemetry.annotate("plan", "ignored")
+
+
+class PrecomputeTests(unittest.TestCase):
+    def test_tables(self):
+        config = json.loads(TEST_CONFIG)
+        tables = get_registry(config).precomputed
+        self.assertEqual((13, 0), tables.edges[2][0])
+        self.assertEqual((27, 14), tables.edges[0][-1])
+        self.assertEqual(420, len(tables.arena_locations))
+        self.assertEqual(28 * 13 + 27, tables.idealness[1, 1][27, 13])
+        self.assertEqual(28 * 27 + 27, tables.idealness[-1, -1][0, 0])
+        for radius, stencil in tables.range_stencils.items():
+            self.assertEqual(precompute.get_range_stencil(radius, 0.01), stencil)
+        self.assertIs(tables, get_registry(json.loads(TEST_CONFIG)).precomputed)
+
+    def test_cache_file(self):
+        config = json.loads(TEST_CONFIG)
+        config["unitInformation"][2]["attackRange"] = 3.25
+        key = precompute.get_key(config, 28)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "precompute.json")
+            messages = [json.dumps(config), json.dumps({"turnInfo": [2, 0, -1]})]
+            stream = io.StringIO("\n".join(messages) + "\n")
+            redirect_streams(stream, None, io.StringIO())
+            try:
+                AlgoCore().start(precompute_cache=path)
+            finally:
+                redirect_streams()
+            built = precompute._precomputed.pop(key)
+            self.assertIn(3.25, built.range_stencils)
+
+            loaded = precompute.get_precomputed(config, 28, path)
+            self.assertIsNot(built, loaded)
+            self.assertEqual(built.to_json(), loaded.to_json())
+            self.assertEqual(built.arena_locations, loaded.arena_locations)
+            self.assertEqual(built.idealness, loaded.idealness)
+
+            # A file made for another config is replaced
+            other = json.loads(TEST_CONFIG)
+            precompute.get_precomputed(other, 28, path)
+            with open(path) as file:
+                self.assertEqual(precompute.get_key(other, 28), json.load(file)["key"])
@@ -0,0 +1,207 @@
+import functools
+import threading
+import time
+
+from .util import debug_write
+
+# The number of threads with timing enabled, checked first so disabled timing costs a single global lookup
+_active = 0
+_local = threading.local()
+
+
+class TurnTimings:
+    """The wall and CPU time spent in each named stage during one turn and the action phase that follows it
+
+    Attributes :
+        * turn_number (int): The turn
+        * stages (dict): Maps a stage name to [calls, wall seconds, CPU seconds], in the order stages were first seen
+
+    """
+
+    def __init__(self, turn_number):
+        self.turn_number = turn_number
+        self.stages = {}
+
+    def add(self, name, wall, cpu):
+        stage = self.stages.get(name)
+        if stage is None:
+            self.stages[name] = [1, wall, cpu]
+        else:
+            stage[0] += 1
+            stage[1] += wall
+            stage[2] += cpu
+
+    def __str__(self):
+        """A one line summary: every stage as name=wall/cpu in milliseconds, followed by xcalls if it ran more than once"""
+        parts = ["timing turn {}:".format(self.turn_number)]
+        for name, (calls, wall, cpu) in self.stages.items():
+            part = "{}={:.2f}/{:.2f}".format(name, 1000 * wall, 1000 * cpu)
+            if calls > 1:
+                part += "x{}".format(calls)
+            parts.append(part)
+        return " ".join(parts) + " ms"
+
+
+class _Span:
+    __slots__ = ("name", "wall", "cpu")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.wall = time.perf_counter()
+        self.cpu = time.thread_time()
+        return self
+
+    def __exit__(self, *exc_info):
+        turn = getattr(_local, "turn", None)
+        if turn is not None:
+            turn.add(
+                self.name,
+                time.perf_counter() - self.wall,
+                time.thread_time() - self.cpu,
+            )
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name):
+    """Times a stage of your strategy while timing is enabled, for example
+        with gamelib.span("build_structures"):
+            self.build_structures(game_state)
+
+    Args:
+        name: The name of the stage in the per-turn summary. Stages with the same name are added up.
+
+    Returns:
+        A context manager, which does nothing while timing is disabled
+
+    """
+    if not _active or getattr(_local, "output", None) is None:
+        return _NULL_SPAN
+    return _Span(name)
+
+
+def timed(name):
+    """The decorator form of span. Timing can be enabled after the function was decorated.
+
+    Args:
+        name: The name of the stage in the per-turn summary
+
+    """
+
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+def start_clock():
+    """
+    Returns:
+        The current wall and CPU times, or None while timing is disabled. Pass it to stop_clock.
+    """
+    if not _active or getattr(_local, "output", None) is None:
+        return None
+    return time.perf_counter(), time.thread_time()
+
+
+def stop_clock(started):
+    """
+    Args:
+        started: A value returned by start_clock
+
+    Returns:
+        The (wall, CPU) seconds elapsed since start_clock, or None if timing was disabled
+    """
+    if started is None:
+        return None
+    return time.perf_counter() - started[0], time.thread_time() - started[1]
+
+
+def add(name, elapsed):
+    """Adds a duration measured with start_clock and stop_clock to a stage of the current turn
+
+    Args:
+        name: The name of the stage
+        elapsed: A value returned by stop_clock
+
+    """
+    turn = getattr(_local, "turn", None)
+    if elapsed is not None and turn is not None:
+        turn.add(name, *elapsed)
+
+
+def enable(output="stderr"):
+    """Enables timing in the calling thread. AlgoCore.start calls this when timing is requested.
+
+    Args:
+        output: "stderr" to write the summaries with debug_write, or the path of a file to append them to
+
+    """
+    global _active
+    if getattr(_local, "output", None) is None:
+        _active += 1
+    _local.output = output
+    _local.turn = None
+    _local.last_turn = None
+
+
+def disable():
+    """Writes the summary of the current turn and disables timing in the calling thread"""
+    global _active
+    if getattr(_local, "output", None) is None:
+        return
+    end_turn()
+    _local.output = None
+    _active -= 1
+
+
+def is_enabled():
+    return bool(_active) and getattr(_local, "output", None) is not None
+
+
+def begin_turn(turn_number):
+    """Writes the summary of the previous turn and starts timing a new one"""
+    if not is_enabled():
+        return
+    end_turn()
+    _local.turn = TurnTimings(turn_number)
+
+
+def end_turn():
+    """Writes the summary of the current turn, if any"""
+    turn = getattr(_local, "turn", None)
+    if turn is None:
+        return
+    _local.turn = None
+    _local.last_turn = turn
+    if _local.output == "stderr":
+        debug_write(str(turn))
+    else:
+        with open(_local.output, "a") as file:
+            file.write(str(turn) + "\n")
+
+
+def get_last_turn():
+    """
+    Returns:
+        The TurnTimings of the last turn whose summary was written in the calling thread, or None
+    """
+    return getattr(_local, "last_turn", None)
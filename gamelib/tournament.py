@@ -0,0 +1,584 @@
+import collections
+import json
+import math
+import multiprocessing
+import random
+import threading
+import time
+import traceback
+
+from .config_registry import get_registry
+from .game_state import GameState
+from .simulator import ActionSimulator
+from .util import redirect_streams
+
+
+class _Pipe:
+    """An in-memory line pipe between the engine and one algo thread.
+    It records when the reader took the last line, and whether the reader is waiting for more.
+    """
+
+    def __init__(self):
+        self.__lines = collections.deque()
+        self.__partial = ""
+        self.__condition = threading.Condition()
+        self.__closed = False
+        self.__waiting = False
+        self.last_read = None
+
+    def write(self, data):
+        with self.__condition:
+            data = self.__partial + data
+            *lines, self.__partial = data.split("\n")
+            self.__lines.extend(line + "\n" for line in lines)
+            self.__condition.notify_all()
+
+    def flush(self):
+        pass
+
+    def close(self):
+        with self.__condition:
+            self.__closed = True
+            self.__condition.notify_all()
+
+    def readline(self, timeout=None):
+        """Returns the next line, "" once the pipe is closed and empty, or None if the timeout runs out"""
+        with self.__condition:
+            self.__waiting = True
+            self.__condition.notify_all()
+            ready = self.__condition.wait_for(
+                lambda: self.__lines or self.__closed, timeout
+            )
+            self.__waiting = False
+            if not ready:
+                return None
+            if not self.__lines:
+                return ""
+            self.last_read = time.perf_counter()
+            return self.__lines.popleft()
+
+    def wait_until_idle(self, timeout=None):
+        """Waits until the reader has handled every line and is waiting for the next one"""
+        with self.__condition:
+            return self.__condition.wait_for(
+                lambda: self.__closed or (self.__waiting and not self.__lines), timeout
+            )
+
+
+class _NullStream:
+    def write(self, data):
+        pass
+
+    def flush(self):
+        pass
+
+
+class LocalEngine:
+    """A local stand-in for the game engine that plays one game between two algos running in threads.
+
+    Each algo runs its AlgoCore.start loop in its own thread, with get_command, send_command and debug_write
+    redirected to in-memory pipes. The engine sends the config, turn messages and action frames in the game's JSON format,
+    with the board flipped for the second player so that both algos see themselves as player 1.
+    Builds and deploys are validated with GameState, and the action phase is simulated with ActionSimulator.
+
+    Compared to the real engine, only breach and death events are reported in action frames,
+    removed structures are refunded at the end of the action phase, and a game that reaches max_turns is won on health.
+    Algos take their turns one after the other, so one algo's computation does not slow down the other's timings.
+
+    Attributes :
+        * config (JSON): The game config
+        * registry (:obj: ConfigRegistry): The compiled config
+        * max_turns (int): The game is decided on health after this many turns
+        * turn_timeout (float): An algo that takes longer than this many seconds to answer a turn loses
+        * action_frames (bool): Whether action frames are sent to the algos
+        * health, SP, MP ([float, float]): The resources of each player
+        * turn_number (int): The current turn
+        * latencies ([list, list]): The seconds each algo took to answer each turn
+        * errors ([str, str]): Why an algo failed, or None
+
+    """
+
+    def __init__(self, config, max_turns=100, turn_timeout=10.0, action_frames=True):
+        self.config = config
+        self.registry = get_registry(config)
+        self.max_turns = max_turns
+        self.turn_timeout = turn_timeout
+        self.action_frames = action_frames
+        resources = config["resources"]
+        self.health = [float(resources.get("startingHP", 30))] * 2
+        self.SP = [float(resources.get("startingCores", 0))] * 2
+        self.MP = [float(resources.get("startingBits", 0))] * 2
+        self.turn_number = 0
+        self.latencies = [[], []]
+        self.errors = [None, None]
+        self.__structures = {}
+        self.__last_time = [0, 0]
+        self.__unit_id = 0
+
+    def play(self, algos):
+        """Plays a game to the end
+
+        Args:
+            algos: Two AlgoCore instances, the first one playing as player 1
+
+        Returns:
+            0 or 1 for the winning algo, or None for a draw
+
+        """
+        inputs = [_Pipe(), _Pipe()]
+        outputs = [_Pipe(), _Pipe()]
+        threads = [
+            threading.Thread(
+                target=self.__run_algo,
+                args=(algo, inputs[index], outputs[index], index),
+                daemon=True,
+            )
+            for index, algo in enumerate(algos)
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            for pipe in inputs:
+                pipe.write(json.dumps(self.config) + "\n")
+            winner = self.__play_turns(inputs, outputs)
+            end = {"turnInfo": [2, self.turn_number, -1]}
+            for player_index, pipe in enumerate(inputs):
+                pipe.write(self.__message(player_index, end) + "\n")
+        finally:
+            for pipe in inputs:
+                pipe.close()
+        for thread in threads:
+            thread.join(self.turn_timeout)
+        return winner
+
+    def __run_algo(self, algo, input_pipe, output_pipe, index):
+        redirect_streams(input_pipe, output_pipe, _NullStream())
+        try:
+            algo.start()
+        except SystemExit:
+            pass
+        except Exception:
+            self.errors[index] = traceback.format_exc()
+        finally:
+            output_pipe.close()
+
+    def __play_turns(self, inputs, outputs):
+        """Plays turns until a player runs out of health, fails, or max_turns is reached"""
+        while True:
+            commands = []
+            for player_index in (0, 1):
+                for pipe in inputs:
+                    pipe.wait_until_idle(self.turn_timeout)
+                message = self.__message(
+                    player_index, {"turnInfo": [0, self.turn_number, -1]}
+                )
+                inputs[player_index].write(message + "\n")
+                lines = []
+                while len(lines) < 2:
+                    line = outputs[player_index].readline(self.turn_timeout)
+                    if not line:
+                        if self.errors[player_index] is None:
+                            self.errors[player_index] = (
+                                "timed out" if line is None else "exited"
+                            )
+                        return 1 - player_index
+                    lines.append(line)
+                latency = time.perf_counter() - inputs[player_index].last_read
+                self.latencies[player_index].append(latency)
+                self.__last_time[player_index] = int(latency * 1000)
+                commands.append(self.__validate(player_index, message, lines))
+
+            self.__action_phase(inputs, commands)
+            self.turn_number += 1
+            if min(self.health) <= 0 or self.turn_number >= self.max_turns:
+                if self.health[0] == self.health[1]:
+                    return None
+                return 0 if self.health[0] > self.health[1] else 1
+            for player_index in (0, 1):
+                self.SP[player_index] += self.registry.cores_per_round
+                self.MP[player_index] = round(
+                    self.MP[player_index] * self.registry.MP_decay_factor
+                    + self.registry.get_MP_income(self.turn_number),
+                    1,
+                )
+
+    def __flip(self, player_index, x, y):
+        """Converts a location between the board and the view of a player"""
+        if player_index == 0:
+            return int(x), int(y)
+        last = self.registry.ARENA_SIZE - 1
+        return last - int(x), last - int(y)
+
+    def __message(self, player_index, message, units=None):
+        """Fills in the stats and units of a turn or frame message from the view of a player"""
+        registry = self.registry
+        type_count = len(self.config["unitInformation"])
+        players = [[[] for _ in range(type_count)] for _ in (0, 1)]
+        if units is None:
+            units = [
+                (owner, unit_type, x, y, health, upgraded, removing, unit_id)
+                for (x, y), (
+                    owner,
+                    unit_type,
+                    health,
+                    upgraded,
+                    removing,
+                    unit_id,
+                ) in self.__structures.items()
+            ]
+        for owner, unit_type, x, y, health, upgraded, removing, unit_id in units:
+            entries = players[owner if player_index == 0 else 1 - owner]
+            x, y = self.__flip(player_index, x, y)
+            entries[registry.UNIT_TYPE_TO_INDEX[unit_type]].append(
+                [x, y, health, unit_id]
+            )
+            if upgraded:
+                entries[registry.UNIT_TYPE_TO_INDEX[registry.UPGRADE]].append(
+                    [x, y, 0, unit_id]
+                )
+            if removing:
+                entries[registry.UNIT_TYPE_TO_INDEX[registry.REMOVE]].append(
+                    [x, y, 0, unit_id]
+                )
+        stats = [
+            [
+                self.health[index],
+                self.SP[index],
+                self.MP[index],
+                self.__last_time[index],
+            ]
+            for index in (0, 1)
+        ]
+        if player_index == 1:
+            players.reverse()
+            stats.reverse()
+        message = dict(message)
+        message.setdefault(
+            "events",
+            {
+                name: []
+                for name in (
+                    "selfDestruct",
+                    "breach",
+                    "damage",
+                    "shield",
+                    "move",
+                    "spawn",
+                    "death",
+                    "attack",
+                    "melee",
+                )
+            },
+        )
+        message.update(
+            p1Stats=stats[0], p2Stats=stats[1], p1Units=players[0], p2Units=players[1]
+        )
+        return json.dumps(message)
+
+    def __validate(self, player_index, message, lines):
+        """Replays the commands of an algo on a GameState of its view and returns the accepted ones in board coordinates"""
+        state = GameState(self.config, message)
+        state.suppress_warnings(True)
+        try:
+            builds, deploys = json.loads(lines[0]), json.loads(lines[1])
+        except ValueError:
+            return [], []
+        for unit_type, x, y in builds:
+            if unit_type == self.registry.REMOVE:
+                state.attempt_remove([x, y])
+            elif unit_type == self.registry.UPGRADE:
+                state.attempt_upgrade([x, y])
+            elif self.registry.is_stationary(unit_type):
+                state.attempt_spawn(unit_type, [x, y])
+        for unit_type, x, y in deploys:
+            if not self.registry.is_stationary(unit_type):
+                state.attempt_spawn(unit_type, [x, y])
+        resources = state.get_resources()
+        self.SP[player_index], self.MP[player_index] = resources
+        return (
+            [
+                (unit_type,) + self.__flip(player_index, x, y)
+                for unit_type, x, y in state._build_stack
+            ],
+            [
+                (unit_type,) + self.__flip(player_index, x, y)
+                for unit_type, x, y in state._deploy_stack
+            ],
+        )
+
+    def __action_phase(self, inputs, commands):
+        """Applies both players' builds, simulates the action phase and updates the board and resources"""
+        for player_index, (builds, _) in enumerate(commands):
+            for unit_type, x, y in builds:
+                structure = self.__structures.get((x, y))
+                if unit_type == self.registry.REMOVE:
+                    structure[4] = True
+                elif unit_type == self.registry.UPGRADE:
+                    spec = self.registry.unit_specs[structure[1]].upgraded_spec
+                    structure[2] = spec.max_health
+                    structure[3] = True
+                else:
+                    self.__unit_id += 1
+                    spec = self.registry.unit_specs[unit_type]
+                    self.__structures[x, y] = [
+                        player_index,
+                        unit_type,
+                        spec.max_health,
+                        False,
+                        False,
+                        str(self.__unit_id),
+                    ]
+
+        state = GameState(self.config, self.__message(0, {"turnInfo": [1, 0, 0]}))
+        state.suppress_warnings(True)
+        simulator = ActionSimulator(state)
+        remaining = {}
+
+        def on_frame(frame, units, result):
+            remaining.clear()
+            for unit in units:
+                if unit.stationary:
+                    remaining[unit.x, unit.y] = unit.health
+            if not self.action_frames:
+                return
+            frame_units = [
+                (
+                    unit.player_index,
+                    unit.unit_type,
+                    unit.x,
+                    unit.y,
+                    unit.health,
+                    unit.spec.upgraded,
+                    False,
+                    "",
+                )
+                for unit in units
+            ]
+            for player_index, pipe in enumerate(inputs):
+                events = self.__frame_events(player_index, frame, result)
+                message = {"turnInfo": [1, self.turn_number, frame], "events": events}
+                pipe.write(self.__message(player_index, message, frame_units) + "\n")
+
+        result = simulator.simulate(commands[0][1], commands[1][1], on_frame)
+        if result.frames:
+            for location in list(self.__structures):
+                if location in remaining:
+                    self.__structures[location][2] = remaining[location]
+                else:
+                    del self.__structures[location]
+
+        for location, structure in list(self.__structures.items()):
+            if structure[4]:
+                spec = self.registry.unit_specs[structure[1]]
+                if structure[3]:
+                    spec = spec.upgraded_spec
+                refund = spec.type_config.get("refundPercentage", 0.75)
+                self.SP[structure[0]] += round(
+                    spec.cost[0] * refund * structure[2] / spec.max_health, 1
+                )
+                del self.__structures[location]
+
+        damage_reward = self.config["resources"].get("coresForPlayerDamage", 0)
+        for player_index in (0, 1):
+            self.health[1 - player_index] -= result.breach_damage[player_index]
+            self.SP[player_index] += damage_reward * result.breach_damage[player_index]
+
+    def __frame_events(self, player_index, frame, result):
+        """The breach and death events of a frame from the view of a player, who is player 1 in the events"""
+        events = {
+            name: []
+            for name in (
+                "selfDestruct",
+                "breach",
+                "damage",
+                "shield",
+                "move",
+                "spawn",
+                "death",
+                "attack",
+                "melee",
+            )
+        }
+        for event_frame, unit_type, (x, y), owner in result.breaches:
+            if event_frame == frame:
+                spec = self.registry.unit_specs[unit_type]
+                events["breach"].append(
+                    [
+                        list(self.__flip(player_index, x, y)),
+                        spec.type_config.get("playerBreachDamage", 1),
+                        self.registry.UNIT_TYPE_TO_INDEX[unit_type],
+                        "",
+                        1 if owner == player_index else 2,
+                    ]
+                )
+        for event_frame, unit_type, (x, y), owner in result.structures_destroyed:
+            if event_frame == frame:
+                events["death"].append(
+                    [
+                        list(self.__flip(player_index, x, y)),
+                        self.registry.UNIT_TYPE_TO_INDEX[unit_type],
+                        "",
+                        1 if owner == player_index else 2,
+                        False,
+                    ]
+                )
+        return events
+
+
+class TournamentReport:
+    """The results of a tournament between two algos
+
+    Attributes :
+        * games (int): The number of games played
+        * elapsed (float): The wall-clock time of the tournament, in seconds
+        * wins ([int, int]): The games each algo won
+        * draws (int): The games that ended on equal health
+        * turns (list): The number of turns of each game
+        * latencies ([list, list]): The seconds each algo took to answer every turn of every game
+        * errors ([list, list]): The error messages of each algo, one per failed game
+
+    """
+
+    def __init__(self, games, elapsed):
+        self.games = games
+        self.elapsed = elapsed
+        self.wins = [0, 0]
+        self.draws = 0
+        self.turns = []
+        self.latencies = [[], []]
+        self.errors = [[], []]
+
+    def __str__(self):
+        lines = [
+            "{} games in {:.1f}s ({:.2f} games/s), wins: {} draws: {}".format(
+                self.games,
+                self.elapsed,
+                self.games_per_second,
+                self.wins,
+                self.draws,
+            )
+        ]
+        for index in (0, 1):
+            lines.append(
+                "algo {}: turn latency p50 {:.1f}ms p95 {:.1f}ms p99 {:.1f}ms max {:.1f}ms, {} errors".format(
+                    index,
+                    1000 * self.latency_percentile(index, 50),
+                    1000 * self.latency_percentile(index, 95),
+                    1000 * self.latency_percentile(index, 99),
+                    1000 * self.latency_percentile(index, 100),
+                    len(self.errors[index]),
+                )
+            )
+        return "\n".join(lines)
+
+    @property
+    def games_per_second(self):
+        return self.games / self.elapsed if self.elapsed else 0.0
+
+    def win_rate(self, index=0):
+        """
+        Args:
+            index: The algo, 0 or 1
+
+        Returns:
+            The fraction of games the algo won, counting draws as half a win
+        """
+        if not self.games:
+            return 0.0
+        return (self.wins[index] + self.draws / 2) / self.games
+
+    def latency_percentile(self, index, percentile):
+        """
+        Args:
+            index: The algo, 0 or 1
+            percentile: Between 0 and 100
+
+        Returns:
+            The turn latency in seconds that the given percentage of turns did not exceed
+        """
+        latencies = sorted(self.latencies[index])
+        if not latencies:
+            return 0.0
+        return latencies[max(0, math.ceil(percentile / 100 * len(latencies)) - 1)]
+
+
+class Tournament:
+    """Plays many local games between two algos across a process pool, to measure win rate and speed.
+
+    The algos are given as AlgoCore subclasses and instantiated fresh for every game, in the worker process.
+    They must be importable by the workers, so define them in a module rather than in __main__ on platforms that spawn processes.
+    The algos alternate between playing as player 1 and player 2.
+
+    Attributes :
+        * algos (list): The two AlgoCore subclasses
+        * config (JSON): The game config
+        * processes (int): The number of worker processes, 0 to play every game in this process
+        * engine_options (dict): Keyword arguments for LocalEngine
+
+    """
+
+    def __init__(self, algo, opponent, config, processes=None, **engine_options):
+        """
+        Args:
+            algo: An AlgoCore subclass
+            opponent: The AlgoCore subclass it plays against
+            config: The game config
+            processes: The number of worker processes, defaulting to the number of CPUs
+            engine_options: max_turns, turn_timeout and action_frames for LocalEngine
+
+        """
+        self.algos = [algo, opponent]
+        self.config = config
+        self.processes = multiprocessing.cpu_count() if processes is None else processes
+        self.engine_options = engine_options
+
+    def run(self, games, seed=None):
+        """Plays the games and gathers the results
+
+        Args:
+            games: The number of games to play
+            seed: Seeds the random module before each game, so algos that use it replay the same games
+
+        Returns:
+            A TournamentReport
+
+        """
+        start = time.perf_counter()
+        tasks = [
+            (self.algos, self.config, self.engine_options, index, seed)
+            for index in range(games)
+        ]
+        if self.processes == 0:
+            outcomes = [_play_game(task) for task in tasks]
+        else:
+            with multiprocessing.Pool(self.processes) as pool:
+                outcomes = pool.map(_play_game, tasks, chunksize=1)
+
+        report = TournamentReport(games, time.perf_counter() - start)
+        for winner, turns, latencies, errors in outcomes:
+            if winner is None:
+                report.draws += 1
+            else:
+                report.wins[winner] += 1
+            report.turns.append(turns)
+            for index in (0, 1):
+                report.latencies[index].extend(latencies[index])
+                if errors[index] is not None:
+                    report.errors[index].append(errors[index])
+        return report
+
+
+def _play_game(task):
+    """Plays one game of a tournament, swapping sides on odd games. Results are indexed by algo, not by side."""
+    algos, config, engine_options, index, seed = task
+    if seed is not None:
+        random.seed(seed * 1000003 + index)
+    sides = [1, 0] if index % 2 else [0, 1]
+    engine = LocalEngine(config, **engine_options)
+    winner = engine.play([algos[side]() for side in sides])
+    return (
+        None if winner is None else sides[winner],
+        engine.turn_number,
+        [engine.latencies[sides.index(algo)] for algo in (0, 1)],
+        [engine.errors[sides.index(algo)] for algo in (0, 1)],
+    )
@@ -1,3 +1,7 @@
+from . import counters
+from .config_registry import UnitSpec, get_registry
+
+
 def is_stationary(unit_type, structure_types):
     """
     Args:
@@ -9,8 +13,23 @@ def is_stationary(unit_type, structure_types):
     return unit_type in structure_types
 
 
+def get_unit_specs(config):
+    """Gets the base UnitSpec of every unit type in a config
+
+    Args:
+        config: A json object containing information about the game
+
+    Returns:
+        A dict mapping each unit type shorthand to its base UnitSpec
+
+    """
+    return get_registry(config).unit_specs
+
+
 class GameUnit:
     """Holds information about a Unit.
+    Type statistics live in a UnitSpec shared between all units of the same type and upgrade level.
+    Assigning a statistic, such as unit.attackRange = 4, gives this unit its own copy of the spec with the new value.
 
     Attributes :
         * unit_type (string): This unit's type
@@ -30,54 +49,128 @@ class GameUnit:
         * shieldPerUnit (float): how much shield is given per unit
         * pending_removal (boolean): If this unit is marked for removal by its owner
         * upgraded (boolean): If this unit is upgraded
+        * spec (:obj: UnitSpec): The shared statistics of this unit's type and upgrade level
 
     """
 
+    __slots__ = (
+        "unit_type",
+        "player_index",
+        "health",
+        "x",
+        "y",
+        "pending_removal",
+        "upgraded",
+        "spec",
+        "_cost",
+    )
+
     def __init__(self, unit_type, config, player_index=None, health=None, x=-1, y=-1):
         """Initialize unit variables using args passed"""
+        counters.increment("GameUnit")
         self.unit_type = unit_type
-        self.config = config
+        self.spec = get_registry(config).unit_specs[unit_type]
         self.player_index = player_index
         self.pending_removal = False
         self.upgraded = False
         self.x = x
         self.y = y
-        self.__serialize_type()
-        self.health = self.max_health if not health else health
-
-    def __serialize_type(self):
-        from .game_state import STRUCTURE_TYPES, UNIT_TYPE_TO_INDEX, SUPPORT
-
-        type_config = self.config["unitInformation"][UNIT_TYPE_TO_INDEX[self.unit_type]]
-        self.stationary = type_config["unitCategory"] == 0
-        self.speed = type_config.get("speed", 0)
-        self.damage_f = type_config.get("attackDamageTower", 0)
-        self.damage_i = type_config.get("attackDamageWalker", 0)
-        self.attackRange = type_config.get("attackRange", 0)
-        self.shieldRange = type_config.get("shieldRange", 0)
-        self.max_health = type_config.get("startHealth", 0)
-        self.shieldPerUnit = type_config.get("shieldPerUnit", 0)
-        self.cost = [type_config.get("cost1", 0), type_config.get("cost2", 0)]
+        self._cost = None
+        self.health = self.spec.max_health if not health else health
+
+    @property
+    def config(self):
+        return self.spec.config
+
+    @property
+    def stationary(self):
+        return self.spec.stationary
+
+    @stationary.setter
+    def stationary(self, value):
+        self.spec = self.spec.replace("stationary", value)
+
+    @property
+    def speed(self):
+        return self.spec.speed
+
+    @speed.setter
+    def speed(self, value):
+        self.spec = self.spec.replace("speed", value)
+
+    @property
+    def damage_f(self):
+        return self.spec.damage_f
+
+    @damage_f.setter
+    def damage_f(self, value):
+        self.spec = self.spec.replace("damage_f", value)
+
+    @property
+    def damage_i(self):
+        return self.spec.damage_i
+
+    @damage_i.setter
+    def damage_i(self, value):
+        self.spec = self.spec.replace("damage_i", value)
+
+    @property
+    def attackRange(self):
+        return self.spec.attackRange
+
+    @attackRange.setter
+    def attackRange(self, value):
+        self.spec = self.spec.replace("attackRange", value)
+
+    @property
+    def shieldRange(self):
+        return self.spec.shieldRange
+
+    @shieldRange.setter
+    def shieldRange(self, value):
+        self.spec = self.spec.replace("shieldRange", value)
+
+    @property
+    def max_health(self):
+        return self.spec.max_health
+
+    @max_health.setter
+    def max_health(self, value):
+        self.spec = self.spec.replace("max_health", value)
+
+    @property
+    def shieldPerUnit(self):
+        return self.spec.shieldPerUnit
+
+    @shieldPerUnit.setter
+    def shieldPerUnit(self, value):
+        self.spec = self.spec.replace("shieldPerUnit", value)
+
+    @property
+    def cost(self):
+        # The list is kept until the spec changes, so reading the cost does not build a new list every time
+        cached = self._cost
+        if cached is None or cached[0] is not self.spec:
+            cached = self._cost = (self.spec, list(self.spec.cost))
+        return cached[1]
+
+    @cost.setter
+    def cost(self, value):
+        self.spec = self.spec.replace("cost", (value[0], value[1]))
 
     def upgrade(self):
-        from .game_state import UNIT_TYPE_TO_INDEX
-
-        type_config = self.config["unitInformation"][
-            UNIT_TYPE_TO_INDEX[self.unit_type]
-        ].get("upgrade", {})
-        self.speed = type_config.get("speed", self.speed)
-        self.damage_f = type_config.get("attackDamageTower", self.damage_f)
-        self.damage_i = type_config.get("attackDamageWalker", self.damage_i)
-        self.attackRange = type_config.get("attackRange", self.attackRange)
-        self.shieldRange = type_config.get("shieldRange", self.shieldRange)
-        self.max_health = type_config.get("startHealth", self.max_health)
-        self.shieldPerUnit = type_config.get("shieldPerUnit", self.shieldPerUnit)
-        self.cost = [
-            type_config.get("cost1", 0) + self.cost[0],
-            type_config.get("cost2", 0) + self.cost[1],
-        ]
+        self.spec = self.spec.upgraded_spec
         self.upgraded = True
 
+    def __copy__(self):
+        counters.increment("GameUnit")
+        unit = GameUnit.__new__(GameUnit)
+        for name in GameUnit.__slots__:
+            setattr(unit, name, getattr(self, name))
+        # The copy gets its own cost list
+        unit._cost = None
+        return unit
+
     def __toString(self):
         owner = "Friendly" if self.player_index == 0 else "Enemy"
         removal = ", pending removal" if self.pending_removal else ""
@@ -0,0 +1,284 @@
+import numpy as np
+
+
+class UnitTable:
+    """Columnar (struct of arrays) view of every unit in a GameState, for vectorized queries.
+    Requires numpy. Use GameState.unit_table to get the table of a state; it is built
+    from the turn message and kept in sync with attempt_spawn and attempt_upgrade.
+    Units added directly through GameMap.add_unit are not tracked.
+
+    Every column is a numpy array with one entry per unit.
+
+    Attributes :
+        * registry (:obj: ConfigRegistry): The compiled config of the units
+        * x, y (int array): The unit locations
+        * type_index (int array): The index of each unit's type in config["unitInformation"]
+        * owner (int array): The player_index of each unit, 0 for you 1 for the enemy
+        * health (float array): The current health of each unit
+        * upgraded (bool array): Whether each unit is upgraded
+        * stationary (bool array): Whether each unit is a structure
+        * damage_f (float array): The damage each unit deals to structures
+        * damage_i (float array): The damage each unit deals to mobile units
+        * attack_range (float array): The attack range of each unit
+
+    """
+
+    COLUMNS = [
+        ("x", np.int16),
+        ("y", np.int16),
+        ("type_index", np.int8),
+        ("owner", np.int8),
+        ("health", np.float64),
+        ("upgraded", np.bool_),
+        ("stationary", np.bool_),
+        ("damage_f", np.float64),
+        ("damage_i", np.float64),
+        ("attack_range", np.float64),
+    ]
+
+    def __init__(self, registry, capacity=64):
+        """Creates an empty table
+
+        Args:
+            registry: The ConfigRegistry of the game
+            capacity: The number of units to allocate space for
+
+        """
+        self.registry = registry
+        self.size = 0
+        self.__columns = {
+            name: np.zeros(capacity, dtype=dtype) for name, dtype in self.COLUMNS
+        }
+        self.__structure_rows = {}
+
+    @classmethod
+    def from_raw_units(cls, registry, raw_units):
+        """Builds a table in one pass over the p1Units and p2Units arrays of a turn message
+
+        Args:
+            registry: The ConfigRegistry of the game
+            raw_units: [p1Units, p2Units] as found in the turn message
+
+        Returns:
+            A new UnitTable
+
+        """
+        rows = {name: [] for name, _ in cls.COLUMNS}
+        structure_rows = {}
+        upgrades = []
+        for owner, units in enumerate(raw_units):
+            for type_index, entries in enumerate(units):
+                unit_type = registry.config["unitInformation"][type_index]["shorthand"]
+                if unit_type == registry.UPGRADE:
+                    upgrades.extend(entries)
+                    continue
+                spec = registry.unit_specs.get(unit_type)
+                if spec is None:
+                    continue
+                for entry in entries:
+                    x, y = int(entry[0]), int(entry[1])
+                    if spec.stationary:
+                        structure_rows[x, y] = len(rows["x"])
+                    cls.__append_row(rows, x, y, type_index, owner, entry[2], spec)
+
+        table = cls(registry, max(64, 2 * len(rows["x"])))
+        table.size = len(rows["x"])
+        for name, _ in cls.COLUMNS:
+            table.__columns[name][: table.size] = rows[name]
+        table.__structure_rows = structure_rows
+        for entry in upgrades:
+            table.upgrade([int(entry[0]), int(entry[1])])
+        return table
+
+    @staticmethod
+    def __append_row(rows, x, y, type_index, owner, health, spec):
+        rows["x"].append(x)
+        rows["y"].append(y)
+        rows["type_index"].append(type_index)
+        rows["owner"].append(owner)
+        rows["health"].append(float(health) if health else spec.max_health)
+        rows["upgraded"].append(spec.upgraded)
+        rows["stationary"].append(spec.stationary)
+        rows["damage_f"].append(spec.damage_f)
+        rows["damage_i"].append(spec.damage_i)
+        rows["attack_range"].append(spec.attackRange)
+
+    def copy(self):
+        """
+        Returns:
+            An independent copy of this table
+        """
+        table = UnitTable(self.registry, 0)
+        table.size = self.size
+        table.__columns = {
+            name: column.copy() for name, column in self.__columns.items()
+        }
+        table.__structure_rows = dict(self.__structure_rows)
+        return table
+
+    def __len__(self):
+        return self.size
+
+    def __getattr__(self, name):
+        columns = self.__dict__.get("_UnitTable__columns")
+        if columns is not None and name in columns:
+            return columns[name][: self.size]
+        raise AttributeError(name)
+
+    def add(self, unit_type, location, player_index=0):
+        """Appends a newly spawned unit at full health
+
+        Args:
+            unit_type: The type of the unit
+            location: The [x, y] location of the unit
+            player_index: The player controlling the unit
+
+        """
+        if self.size == len(self.__columns["x"]):
+            for name, column in self.__columns.items():
+                self.__columns[name] = np.concatenate([column, np.zeros_like(column)])
+        spec = self.registry.unit_specs[unit_type]
+        x, y = int(location[0]), int(location[1])
+        row = self.size
+        if spec.stationary:
+            self.__structure_rows[x, y] = row
+        self.size += 1
+        columns = self.__columns
+        columns["x"][row] = x
+        columns["y"][row] = y
+        columns["type_index"][row] = self.registry.UNIT_TYPE_TO_INDEX[unit_type]
+        columns["owner"][row] = player_index
+        columns["health"][row] = spec.max_health
+        columns["upgraded"][row] = spec.upgraded
+        columns["stationary"][row] = spec.stationary
+        columns["damage_f"][row] = spec.damage_f
+        columns["damage_i"][row] = spec.damage_i
+        columns["attack_range"][row] = spec.attackRange
+
+    def upgrade(self, location):
+        """Marks the structure at a location as upgraded and updates its statistics
+
+        Args:
+            location: The [x, y] location of the structure
+
+        """
+        row = self.__structure_rows.get((int(location[0]), int(location[1])))
+        if row is None:
+            return
+        unit_type = self.registry.config["unitInformation"][
+            int(self.__columns["type_index"][row])
+        ]["shorthand"]
+        spec = self.registry.unit_specs[unit_type].upgraded_spec
+        self.__columns["upgraded"][row] = True
+        self.__columns["damage_f"][row] = spec.damage_f
+        self.__columns["damage_i"][row] = spec.damage_i
+        self.__columns["attack_range"][row] = spec.attackRange
+
+    def truncate(self, size):
+        """Removes every unit added after the table had the given size
+
+        Args:
+            size: The number of units to keep
+
+        """
+        columns = self.__columns
+        for row in range(size, self.size):
+            key = (int(columns["x"][row]), int(columns["y"][row]))
+            if self.__structure_rows.get(key) == row:
+                del self.__structure_rows[key]
+        self.size = min(size, self.size)
+
+    def save_row(self, location):
+        """Captures the upgrade state of the structure at a location, see restore_row
+
+        Args:
+            location: The [x, y] location of the structure
+
+        Returns:
+            An opaque value to pass to restore_row, or None if there is no structure at the location
+
+        """
+        row = self.__structure_rows.get((int(location[0]), int(location[1])))
+        if row is None:
+            return None
+        return row, [
+            (name, self.__columns[name][row])
+            for name in ("upgraded", "damage_f", "damage_i", "attack_range")
+        ]
+
+    def restore_row(self, saved):
+        """Undoes the changes made to a structure since save_row
+
+        Args:
+            saved: A value returned by save_row
+
+        """
+        if saved is None:
+            return
+        row, values = saved
+        for name, value in values:
+            self.__columns[name][row] = value
+
+    def select(self, player_index=None, unit_type=None, stationary=None):
+        """Builds a boolean mask over the rows of the table
+
+        Args:
+            player_index: Only keep units of this player
+            unit_type: Only keep units of this type
+            stationary: If True only keep structures, if False only keep mobile units
+
+        Returns:
+            A boolean numpy array with one entry per unit
+
+        """
+        mask = np.ones(self.size, dtype=np.bool_)
+        if player_index is not None:
+            mask &= self.owner == player_index
+        if unit_type is not None:
+            mask &= self.type_index == self.registry.UNIT_TYPE_TO_INDEX[unit_type]
+        if stationary is not None:
+            mask &= self.stationary == stationary
+        return mask
+
+    def damage_at(self, locations, player_index):
+        """Total damage per frame that structures would deal to a mobile unit at each location.
+        Uses the same range rule as GameState.get_attackers.
+
+        Args:
+            locations: A list of [x, y] locations
+            player_index: The player controlling the hypothetical mobile unit
+
+        Returns:
+            A numpy array with the total damage for each location
+
+        """
+        attackers = self.select(player_index=1 - player_index, stationary=True)
+        attackers &= self.damage_i + self.damage_f > 0
+        points = np.asarray(locations, dtype=np.float64).reshape(-1, 2)
+        dx = points[:, 0:1] - self.x[attackers]
+        dy = points[:, 1:2] - self.y[attackers]
+        in_range = np.sqrt(dx * dx + dy * dy) <= self.attack_range[attackers]
+        return in_range.astype(np.float64) @ self.damage_i[attackers]
+
+    def health_histogram(self, bins=10, player_index=None):
+        """Histogram of unit health for every unit type present in the table
+
+        Args:
+            bins: The number of bins
+            player_index: Only count units of this player if given
+
+        Returns:
+            A dict mapping each unit type to (counts, bin_edges), sharing the same bin edges
+
+        """
+        mask = self.select(player_index=player_index)
+        health = self.health[mask]
+        type_index = self.type_index[mask]
+        upper = float(health.max()) if len(health) else 1.0
+        edges = np.linspace(0.0, upper, bins + 1)
+        histograms = {}
+        for index in np.unique(type_index):
+            unit_type = self.registry.config["unitInformation"][int(index)]["shorthand"]
+            counts, _ = np.histogram(health[type_index == index], bins=edges)
+            histograms[unit_type] = (counts, edges)
+        return histograms
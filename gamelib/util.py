@@ -1,13 +1,32 @@
 import sys
+import threading
 
 
 BANNER_TEXT = "---------------- Starting Your Algo --------------------"
 
+_streams = threading.local()
+
+
+def redirect_streams(input_stream=None, output_stream=None, debug_stream=None):
+    """Makes get_command, send_command and debug_write use other streams than stdin, stdout and stderr
+    in the calling thread only, so several algos can run in one process. Passing None restores the standard stream.
+
+    Args:
+        input_stream: Read by get_command, needs a readline method
+        output_stream: Written by send_command, needs write and flush methods
+        debug_stream: Written by debug_write, needs write and flush methods
+
+    """
+    _streams.input = input_stream
+    _streams.output = output_stream
+    _streams.debug = debug_stream
+
 
 def get_command():
     """Gets input from stdin"""
     try:
-        ret = sys.stdin.readline()
+        stream = getattr(_streams, "input", None)
+        ret = (sys.stdin if stream is None else stream).readline()
     except EOFError:
         # Game parent process terminated so exit
         debug_write("Got EOF, parent game process must have died, exiting for cleanup")
@@ -25,8 +44,35 @@ def send_command(cmd):
     Should usually only be called by 'GameState.submit_turn()'
 
     """
-    sys.stdout.write(cmd.strip() + "\n")
-    sys.stdout.flush()
+    stream = getattr(_streams, "output", None)
+    if stream is None:
+        stream = sys.stdout
+    stream.write(cmd.strip() + "\n")
+    stream.flush()
+
+
+def get_debug_stream():
+    """
+    Returns:
+        The stream debug_write writes to in the calling thread, stderr unless redirect_streams changed it
+    """
+    stream = getattr(_streams, "debug", None)
+    return sys.stderr if stream is None else stream
+
+
+def set_debug_stream(stream):
+    """Changes the stream debug_write writes to in the calling thread, leaving the other streams alone
+
+    Args:
+        stream: Needs write and flush methods, or None for stderr
+
+    Returns:
+        The stream that was set before, None meaning stderr
+
+    """
+    previous = getattr(_streams, "debug", None)
+    _streams.debug = stream
+    return previous
 
 
 def debug_write(*msg):
@@ -37,5 +83,6 @@ def debug_write(*msg):
 
     """
     # Printing to STDERR is okay and printed out by the game but doesn't effect turns.
-    sys.stderr.write(", ".join(map(str, msg)).strip() + "\n")
-    sys.stderr.flush()
+    stream = get_debug_stream()
+    stream.write(", ".join(map(str, msg)).strip() + "\n")
+    stream.flush()